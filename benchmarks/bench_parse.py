@@ -0,0 +1,58 @@
+"""Benchmarks parsing a proq with many test cases.
+
+Usage: python benchmarks/bench_parse.py [N_TEST_CASES] [REPEAT]
+"""
+
+import sys
+import time
+
+from proqtor.core import ProQ
+
+
+def generate_proq(n_test_cases: int) -> str:
+    test_cases = "".join(
+        f"## Input {i}\n\n```\n{i} {i + 1}\n```\n\n"
+        f"## Output {i}\n\n```\n{2 * i + 1}\n```\n\n"
+        for i in range(1, n_test_cases + 1)
+    )
+    return f"""---
+title: Sum of two numbers
+---
+
+# Problem Statement
+
+Print the sum of the two numbers in the input.
+
+# Solution
+
+```python test.py -r 'python test.py'
+<template>
+a, b = map(int, input().split())
+<sol>print(a + b)</sol>
+</template>
+```
+
+# Public Test Cases
+
+{test_cases}
+# Private Test Cases
+
+{test_cases}"""
+
+
+def main(n_test_cases: int = 1000, repeat: int = 5):
+    content = generate_proq(n_test_cases)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proq = ProQ.from_str(content)
+        timings.append(time.perf_counter() - start)
+    assert len(proq.public_test_cases) == n_test_cases
+    print(
+        f"ProQ.from_str with {2 * n_test_cases} test cases: "
+        f"best {min(timings) * 1000:.1f} ms of {repeat}"
+    )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,53 @@
+"""Benchmarks the startup latency of the proq command.
+
+Usage: python benchmarks/bench_startup.py [REPEAT]
+
+Reports the best wall-clock time of `proq --help` (time-to-help) and of
+`proq evaluate` on a small python proq (time-to-first-evaluate).
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+PROQ = [sys.executable, "-c", "from proqtor.cli import main; main()"]
+EXAMPLE = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "examples",
+    "python",
+    "io_type_problems",
+    "sum_even_numbers.md",
+)
+
+
+def best_time(args: list[str], repeat: int, cwd: str) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            PROQ + args,
+            cwd=cwd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(repeat: int = 5):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        shutil.copy(EXAMPLE, tmpdir)
+        proq_file = os.path.basename(EXAMPLE)
+        help_time = best_time(["--help"], repeat, tmpdir)
+        evaluate_time = best_time(["evaluate", proq_file], repeat, tmpdir)
+    print(f"time-to-help: best {help_time * 1000:.1f} ms of {repeat}")
+    print(f"time-to-first-evaluate: best {evaluate_time * 1000:.1f} ms of {repeat}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,273 @@
+"""Benchmarks parsing, rendering, evaluation and export on synthetic proqs.
+
+Usage:
+    python benchmarks/bench_suite.py [-o RESULTS.json] [-k NAME] [--quick]
+    python benchmarks/bench_suite.py --compare BASELINE.json [RESULTS.json]
+
+Each benchmark is run over a range of synthetic proqs varying the number and
+the size of the test cases, the size of the solution, the depth of the proq
+sets and the number of included files. The best and the median time of each
+run is printed and saved as JSON, by default to
+`benchmarks/results/<commit>.json`, for comparing the timings across commits.
+"""
+
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+
+from generators import generate_proq, write_includes, write_proq_set
+
+from proqtor.cache_utils import get_package_version
+from proqtor.core import ProQ, load_nested_proq_from_file
+from proqtor.export_utils import HtmlExporter
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def bench_from_str(n_test_cases=10, test_size=1, solution_lines=5):
+    content = generate_proq(n_test_cases, test_size, solution_lines)
+    return lambda: ProQ.from_str(content)
+
+
+def bench_from_file(n_includes=1, directory=None):
+    write_includes(directory, n_includes)
+    proq_file = Path(directory) / "proqs" / "proq.md"
+    proq_file.parent.mkdir(exist_ok=True)
+    proq_file.write_text(generate_proq(n_includes=n_includes))
+    return lambda: ProQ.from_file(proq_file)
+
+
+def bench_to_str(n_test_cases=10, test_size=1, solution_lines=5):
+    proq = ProQ.from_str(generate_proq(n_test_cases, test_size, solution_lines))
+    return proq.to_str
+
+
+def bench_code_block(solution_lines=5):
+    proq = ProQ.from_str(generate_proq(solution_lines=solution_lines))
+    return lambda: proq.solution.code_block
+
+
+def bench_evaluate(n_test_cases=10, test_size=1):
+    proq = ProQ.from_str(generate_proq(n_test_cases, test_size))
+
+    def evaluate():
+        with contextlib.redirect_stdout(io.StringIO()):
+            proq.evaluate()
+
+    return evaluate
+
+
+def bench_load_nested(depth=2, fan_out=3, n_includes=0, directory=None):
+    config_file = write_proq_set(directory, depth, fan_out, n_includes)
+    return lambda: load_nested_proq_from_file(config_file)
+
+
+def bench_export_html(depth=2, fan_out=3, n_test_cases=10, directory=None):
+    config_file = write_proq_set(directory, depth, fan_out, n_test_cases=n_test_cases)
+    nested_proq = load_nested_proq_from_file(config_file)
+    exporter = HtmlExporter()
+    return lambda: exporter.render(nested_proq)
+
+
+def bench_export_json(depth=2, fan_out=3, n_test_cases=10, directory=None):
+    config_file = write_proq_set(directory, depth, fan_out, n_test_cases=n_test_cases)
+    nested_proq = load_nested_proq_from_file(config_file)
+    return lambda: nested_proq.model_dump_json(indent=2)
+
+
+# The benchmarks with the parameters of each run, the first one is the quick run
+BENCHMARKS: list[tuple[str, Callable, list[dict]]] = [
+    (
+        "ProQ.from_str",
+        bench_from_str,
+        [
+            {"n_test_cases": 10},
+            {"n_test_cases": 100},
+            {"n_test_cases": 1000},
+            {"n_test_cases": 10, "test_size": 1000},
+            {"n_test_cases": 10, "solution_lines": 1000},
+        ],
+    ),
+    ("ProQ.from_file", bench_from_file, [{"n_includes": 1}, {"n_includes": 50}]),
+    (
+        "ProQ.to_str",
+        bench_to_str,
+        [
+            {"n_test_cases": 10},
+            {"n_test_cases": 1000},
+            {"n_test_cases": 10, "test_size": 1000},
+        ],
+    ),
+    (
+        "Solution.code_block",
+        bench_code_block,
+        [{"solution_lines": 5}, {"solution_lines": 1000}],
+    ),
+    (
+        "ProQ.evaluate",
+        bench_evaluate,
+        [
+            {"n_test_cases": 2},
+            {"n_test_cases": 20},
+            {"n_test_cases": 2, "test_size": 10000},
+        ],
+    ),
+    (
+        "load_nested_proq_from_file",
+        bench_load_nested,
+        [
+            {"depth": 1, "fan_out": 4},
+            {"depth": 2, "fan_out": 10},
+            {"depth": 4, "fan_out": 3},
+            {"depth": 1, "fan_out": 20, "n_includes": 20},
+        ],
+    ),
+    (
+        "export html",
+        bench_export_html,
+        [{"depth": 1, "fan_out": 4}, {"depth": 2, "fan_out": 10}],
+    ),
+    (
+        "export json",
+        bench_export_json,
+        [{"depth": 1, "fan_out": 4}, {"depth": 2, "fan_out": 10}],
+    ),
+]
+
+
+def get_case_name(name: str, params: dict) -> str:
+    return f"{name}[{','.join(f'{key}={value}' for key, value in params.items())}]"
+
+
+def measure(function: Callable, repeat: int) -> dict:
+    """Returns the timings of a call in seconds, called enough times to be precise."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    times = [total / number for total in timer.repeat(repeat, number)]
+    return {
+        "number": number,
+        "best": min(times),
+        "median": statistics.median(times),
+        "times": times,
+    }
+
+
+def get_commit() -> tuple[str | None, bool]:
+    """Returns the current commit and whether the working tree has changes."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, dirty
+
+
+def run(pattern: str | None = None, quick: bool = False, repeat: int = 5) -> dict:
+    results = {}
+    for name, setup, params_list in BENCHMARKS:
+        for params in params_list[:1] if quick else params_list:
+            case_name = get_case_name(name, params)
+            if pattern is not None and pattern.lower() not in case_name.lower():
+                continue
+            with tempfile.TemporaryDirectory() as directory:
+                if "directory" in inspect.signature(setup).parameters:
+                    function = setup(**params, directory=directory)
+                else:
+                    function = setup(**params)
+                result = measure(function, repeat)
+            results[case_name] = {"name": name, "params": params, **result}
+            print(
+                f"{case_name:<70} best {format_time(result['best']):>10}  "
+                f"median {format_time(result['median']):>10}",
+                flush=True,
+            )
+    commit, dirty = get_commit()
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "version": get_package_version(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in [("s", 1), ("ms", 1e-3), ("us", 1e-6)]:
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def compare(baseline: dict, current: dict):
+    """Prints the ratio of the best times of the benchmarks run in both."""
+    print(f"Baseline {baseline['commit']}, current {current['commit']}")
+    for case_name, result in current["results"].items():
+        if (baseline_result := baseline["results"].get(case_name)) is None:
+            continue
+        ratio = result["best"] / baseline_result["best"]
+        print(
+            f"{case_name:<70} {format_time(baseline_result['best']):>10} -> "
+            f"{format_time(result['best']):>10}  x{ratio:.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", help="The JSON file to save the results to.")
+    parser.add_argument("-k", "--filter", help="Runs the benchmarks with the text.")
+    parser.add_argument(
+        "--quick", action="store_true", help="Runs only the smallest benchmarks."
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--compare",
+        nargs="+",
+        metavar="RESULTS",
+        help="Compares the results saved in the baseline JSON file with another "
+        "results file, or with a new run when only the baseline is given.",
+    )
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) > 1:
+        baseline, current = (
+            json.loads(Path(file).read_text()) for file in args.compare
+        )
+        compare(baseline, current)
+        return
+
+    results = run(args.filter, args.quick, args.repeat)
+    output = Path(
+        args.output or RESULTS_DIR / f"{(results['commit'] or 'results')[:12]}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Results saved to {output}")
+    if args.compare:
+        compare(json.loads(Path(args.compare[0]).read_text()), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Generates synthetic proqs and proq sets for the benchmarks.
+
+The proqs are solved by `cat`, which echoes each input as its output, so
+evaluating them measures proqtor itself rather than an interpreter.
+"""
+
+import os
+from pathlib import Path
+
+import yaml
+
+INCLUDES_DIR = "includes"
+PROQS_DIR = "proqs"
+
+
+def generate_test_cases(n_test_cases: int, test_size: int, kind: str) -> str:
+    test_cases = []
+    for i in range(1, n_test_cases + 1):
+        data = "\n".join(f"{kind} {i} line {j}" for j in range(test_size))
+        test_cases.append(
+            f"## Input {i}\n\n```\n{data}\n```\n\n## Output {i}\n\n```\n{data}\n```\n\n"
+        )
+    return "".join(test_cases)
+
+
+def generate_proq(
+    n_test_cases: int = 10,
+    test_size: int = 1,
+    solution_lines: int = 5,
+    n_includes: int = 0,
+    index: int = 0,
+) -> str:
+    """Returns the markdown of a synthetic proq.
+
+    Args:
+        n_test_cases (int): The number of public and of private test cases.
+        test_size (int): The number of lines of each input and output.
+        solution_lines (int): The number of lines of the solution.
+        n_includes (int): The number of files included in the hidden suffix
+            from the includes folder next to the folder of the proq.
+        index (int): The number of the proq, used in its title.
+    """
+    solution = "\n".join(f"x_{i} = {i}" for i in range(solution_lines))
+    includes = "".join(
+        f"{{% include '../{INCLUDES_DIR}/include_{j}.py.jinja' %}}\n"
+        for j in range(n_includes)
+    )
+    return f"""---
+title: Synthetic proq {index}
+tags: [synthetic, benchmark]
+---
+
+# Problem Statement
+
+Print the input as it is. This is the synthetic proq number {index}.
+
+# Solution
+
+```python test.py -r 'cat'
+<template>
+import sys
+<los>...</los>
+<sol>{solution}</sol>
+</template>
+<suffix_invisible>
+{includes}```
+
+# Public Test Cases
+
+{generate_test_cases(n_test_cases, test_size, "public")}
+# Private Test Cases
+
+{generate_test_cases(n_test_cases, test_size, "private")}"""
+
+
+def write_includes(directory: str | os.PathLike, n_includes: int):
+    includes_dir = Path(directory) / INCLUDES_DIR
+    includes_dir.mkdir(parents=True, exist_ok=True)
+    for j in range(n_includes):
+        (includes_dir / f"include_{j}.py.jinja").write_text(
+            f"def helper_{j}():\n    return {j}\n"
+        )
+
+
+def write_proq_set(
+    directory: str | os.PathLike,
+    depth: int = 2,
+    fan_out: int = 3,
+    n_includes: int = 0,
+    **proq_options,
+) -> Path:
+    """Writes a proq set config file with the proqs it refers to.
+
+    Args:
+        directory (str|PathLike): The directory to write the files to.
+        depth (int): The number of section levels above the proqs.
+        fan_out (int): The number of items in each section.
+        n_includes (int): The number of files each proq includes.
+        proq_options: The options of `generate_proq`.
+
+    Returns:
+        config_file (Path): The proq set config file, with
+            `fan_out ** depth` proqs.
+    """
+    directory = Path(directory)
+    (directory / PROQS_DIR).mkdir(parents=True, exist_ok=True)
+    write_includes(directory, n_includes)
+    n_proqs = 0
+
+    def build_section(title: str, level: int) -> dict:
+        nonlocal n_proqs
+        if level == depth:
+            n_proqs += 1
+            proq_file = f"{PROQS_DIR}/proq_{n_proqs:04}.md"
+            (directory / proq_file).write_text(
+                generate_proq(n_includes=n_includes, index=n_proqs, **proq_options)
+            )
+            return {"title": title, "content": proq_file}
+        return {
+            "title": title,
+            "content": [
+                build_section(f"{title} {i}", level + 1) for i in range(1, fan_out + 1)
+            ],
+        }
+
+    config_file = directory / "proq_set.yaml"
+    config_file.write_text(yaml.safe_dump(build_section("Section", 0), sort_keys=False))
+    return config_file
@@ -1,3 +1,3 @@
-from .md2json import dictify, fold_level, undictify
+from .md2json import Section, dictify, fold_level, get_sections, undictify
 
-__all__ = [dictify, undictify, fold_level]
+__all__ = [Section, dictify, fold_level, get_sections, undictify]
@@ -1,4 +1,5 @@
-from typing import Literal
+import re
+from typing import Literal, NamedTuple
 
 from marko import Markdown
 from marko.md_renderer import MarkdownRenderer
@@ -70,3 +71,79 @@ def undictify(nested_dict, level=1):
         else:
             markdown_text += f"{content}\n\n"
     return markdown_text
+
+
+class Section(NamedTuple):
+    """A heading section as offsets into the markdown text it was split from.
+
+    The section spans `content[start:end]`, the heading line included, and its
+    body, the text after the heading line, spans `content[body_start:end]`.
+    The root section returned by `get_sections` has the level 0, no heading
+    and spans the whole text.
+    """
+
+    heading: str | None
+    level: int
+    start: int
+    body_start: int
+    end: int
+    children: list["Section"]
+
+    def text(self, content: str) -> str:
+        return content[self.start : self.end]
+
+    def body(self, content: str) -> str:
+        return content[self.body_start : self.end]
+
+    def fold(self, level: int) -> list["Section"]:
+        """Returns the sections of the given level nested in this one in order."""
+        sections = []
+        for child in self.children:
+            if child.level == level:
+                sections.append(child)
+            elif child.level < level:
+                sections.extend(child.fold(level))
+        return sections
+
+
+FENCE_PATTERN = re.compile(r" {0,3}(`{3,}|~{3,})")
+HEADING_PATTERN = re.compile(r" {0,3}(#{1,6})(?:[ \t]+(.*))?$")
+CLOSING_SEQUENCE_PATTERN = re.compile(r"(?:^|[ \t]+)#+$")
+
+
+def get_sections(content: str) -> Section:
+    """Splits the markdown text into the tree of its heading sections.
+
+    The text is scanned once, line by line, and the sections only hold
+    offsets, so the text of a section is an exact slice of the content rather
+    than a rendering of its parsed blocks. ATX headings (`# Heading`) outside
+    fenced code blocks start the sections. Setext headings and the headings
+    nested in block quotes or lists are part of the body of their section.
+    """
+    root = [None, 0, 0, 0, []]
+    stack = [root]
+
+    def close(end):
+        heading, level, start, body_start, children = stack.pop()
+        stack[-1][-1].append(Section(heading, level, start, body_start, end, children))
+
+    fence = None
+    offset = 0
+    for line in content.split("\n"):
+        line_start, offset = offset, min(offset + len(line) + 1, len(content))
+        line = line.rstrip("\r")
+        if fence is not None:
+            stripped = line.strip()
+            if stripped.startswith(fence) and not stripped.strip(fence[0]):
+                fence = None
+        elif match := FENCE_PATTERN.match(line):
+            fence = match.group(1)
+        elif match := HEADING_PATTERN.match(line):
+            level = len(match.group(1))
+            heading = CLOSING_SEQUENCE_PATTERN.sub("", (match.group(2) or "").strip())
+            while stack[-1][1] >= level:
+                close(line_start)
+            stack.append([heading.strip(), level, line_start, offset, []])
+    while len(stack) > 1:
+        close(len(content))
+    return Section(None, 0, 0, 0, len(content), root[-1])
@@ -1,13 +1,37 @@
-from .core import NestedContent, ProQ, load_nested_proq_from_file
-from .prog_langs import ProgLang, alias_map, get_lang_code
+from importlib import import_module
 
-NestedProq = NestedContent[ProQ]
+# The public names are loaded on first access (PEP 562), so that importing
+# a submodule such as `proqtor.cli` does not import the whole package.
+_lazy_imports = {
+    "ProQ": ".core",
+    "NestedContent": ".core",
+    "load_nested_proq_from_file": ".core",
+    "ProgLang": ".prog_langs",
+    "alias_map": ".prog_langs",
+    "get_lang_code": ".prog_langs",
+}
 
 __all__ = [
-    ProQ,
-    ProgLang,
-    load_nested_proq_from_file,
-    get_lang_code,
-    alias_map,
-    NestedContent,
+    "ProQ",
+    "ProgLang",
+    "load_nested_proq_from_file",
+    "get_lang_code",
+    "alias_map",
+    "NestedContent",
+    "NestedProq",
 ]
+
+
+def __getattr__(name):
+    if name == "NestedProq":
+        value = __getattr__("NestedContent")[__getattr__("ProQ")]
+    elif name in _lazy_imports:
+        value = getattr(import_module(_lazy_imports[name], __name__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
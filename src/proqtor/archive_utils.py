@@ -0,0 +1,145 @@
+import io
+import json
+import os
+import shutil
+import tarfile
+import time
+import zipfile
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+ARCHIVE_EXTENSIONS = {
+    ".zip": "zip",
+    ".tar": "tar",
+    ".tar.gz": "tar.gz",
+    ".tgz": "tar.gz",
+}
+MANIFEST_FILE = "manifest.json"
+
+
+def get_archive_format(archive_file: str | os.PathLike) -> str:
+    """Returns the archive format, zip, tar or tar.gz, from the file extension."""
+    name = str(archive_file).lower()
+    for extension, format in ARCHIVE_EXTENSIONS.items():
+        if name.endswith(extension):
+            return format
+    raise ValueError(
+        f"Unknown archive extension of {archive_file}. Use one of "
+        f"{', '.join(ARCHIVE_EXTENSIONS)}."
+    )
+
+
+def iter_test_case_files(proq) -> Iterator[tuple[str, str]]:
+    """Yields the relative file names and the contents of the test case files."""
+    for test_cases, set_name in [
+        (proq.public_test_cases, "public"),
+        (proq.private_test_cases, "private"),
+    ]:
+        for i, test_case in enumerate(test_cases, 1):
+            yield f"{set_name}/input_{i:03}.txt", test_case.input
+            yield f"{set_name}/output_{i:03}.txt", test_case.output
+
+
+class ArchiveWriter:
+    """Writes files straight into a zip or tar archive.
+
+    The files are streamed into the archive from memory, so no folder is
+    written to disk and archived afterwards.
+
+    Args:
+        archive_file (str|PathLike): The archive to write.
+        format (str): The archive format, zip, tar or tar.gz. Inferred from
+            the extension of the archive file by default.
+    """
+
+    def __init__(self, archive_file: str | os.PathLike, format: str | None = None):
+        self.format = format or get_archive_format(archive_file)
+        self._mtime = time.time()
+        if self.format == "zip":
+            self._archive = zipfile.ZipFile(
+                archive_file, "w", compression=zipfile.ZIP_DEFLATED
+            )
+        else:
+            self._archive = tarfile.open(
+                archive_file, "w:gz" if self.format == "tar.gz" else "w"
+            )
+
+    def add(self, name: str, content: str):
+        data = content.encode()
+        if self.format == "zip":
+            self._archive.writestr(name, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = self._mtime
+            self._archive.addfile(info, io.BytesIO(data))
+
+    def add_test_cases(self, proq, prefix: str = ""):
+        """Adds the test case files of the proq under the prefix folder."""
+        for name, content in iter_test_case_files(proq):
+            self.add(f"{prefix}/{name}" if prefix else name, content)
+
+    def close(self):
+        self._archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_test_cases(proq, output: str | os.PathLike, format: str | None = None):
+    """Writes the test cases of the proq to a folder or an archive.
+
+    Args:
+        proq (ProQ): The proq.
+        output (str|PathLike): The folder or the archive file to write.
+        format (str): The archive format, zip, tar or tar.gz, or None to
+            write a folder with the public and private test case folders.
+    """
+    if format is not None:
+        with ArchiveWriter(output, format) as archive:
+            archive.add_test_cases(proq)
+        return
+    output = Path(output)
+    if output.exists():
+        shutil.rmtree(output)
+    for set_name in ["public", "private"]:
+        (output / set_name).mkdir(parents=True)
+    for name, content in iter_test_case_files(proq):
+        (output / name).write_text(content)
+
+
+def write_combined_archive(
+    entries: Iterable[tuple[str, dict, object]], archive_file: str | os.PathLike
+) -> list[dict]:
+    """Writes the test cases of many proqs into one archive with a manifest.
+
+    The test cases of each proq are written to a folder of their own and
+    the archive ends with a `manifest.json` listing the folder, the title
+    and the test case counts of each proq along with the given metadata.
+
+    Args:
+        entries (Iterable[tuple[str, dict, ProQ]]): The folder name, the
+            metadata and the proq of each proq, written in the order given.
+        archive_file (str|PathLike): The archive to write.
+
+    Returns:
+        manifest (list[dict]): The entries of the manifest.
+    """
+    manifest = []
+    with ArchiveWriter(archive_file) as archive:
+        for name, metadata, proq in entries:
+            archive.add_test_cases(proq, prefix=name)
+            manifest.append(
+                {
+                    "folder": name,
+                    "title": proq.title,
+                    **metadata,
+                    "public": len(proq.public_test_cases),
+                    "private": len(proq.private_test_cases),
+                }
+            )
+        archive.add(MANIFEST_FILE, json.dumps({"proqs": manifest}, indent=2))
+    return manifest
@@ -0,0 +1,193 @@
+import json
+import os
+import select
+import shutil
+import signal
+import subprocess
+import tempfile
+from importlib.resources import files
+from pathlib import Path
+
+from .core_components import ResourceLimits
+from .execute_utils import (
+    READ_CHUNK_SIZE,
+    CancelToken,
+    CommandCancelledError,
+    CommandFailedError,
+    CommandTimeoutError,
+    OutputCapture,
+    OutputDivergedError,
+    OutputLimitExceededError,
+    get_rlimits,
+    kill_process,
+    wrap_command,
+)
+from .fork_server_utils import get_python_script_args
+
+HARNESS_SCRIPT = str(files("proqtor.data").joinpath("batch_harness.py"))
+
+
+class BatchRunner:
+    """Runs a python script for many inputs in a single harness process.
+
+    The harness is started once and runs the script as `__main__` for each
+    input with the module state reset in between, which saves the interpreter
+    startup of every run. The stdin, stdout and stderr of each run go through
+    files in a private capture directory, so the output of a run that crashes
+    the harness is still returned. A crashed, killed or timed out harness is
+    restarted for the next input.
+
+    The memory and output limits of the given limits apply to the whole
+    harness, while the time and CPU time limits apply to each run.
+
+    Args:
+        command (str): The `python script.py [args]` command to run.
+        cwd (str|PathLike): The working directory of the runs.
+        limits (ResourceLimits): The limits of the runs.
+    """
+
+    def __init__(
+        self,
+        command: str,
+        cwd: str | os.PathLike | None = None,
+        limits: ResourceLimits | None = None,
+    ):
+        script_args = get_python_script_args(command)
+        if script_args is None or not self.is_supported():
+            raise ValueError(f"Command {command!r} can not be run in batches.")
+        self.command = command
+        self.python, self.args = script_args
+        self.cwd = cwd
+        self.limits = limits or ResourceLimits()
+        self.capture_dir = Path(tempfile.mkdtemp(prefix="proq-batch-"))
+        self.process: subprocess.Popen | None = None
+        self._cancel_token: CancelToken | None = None
+
+    @staticmethod
+    def is_supported() -> bool:
+        return os.name == "posix"
+
+    @staticmethod
+    def supports(command: str) -> bool:
+        return (
+            BatchRunner.is_supported() and get_python_script_args(command) is not None
+        )
+
+    def _start(self, cancel_token: CancelToken | None):
+        process_limits = self.limits.model_copy(update={"cpu_time": None})
+        self.process = subprocess.Popen(
+            wrap_command(
+                [self.python, HARNESS_SCRIPT, str(self.capture_dir), *self.args],
+                get_rlimits(process_limits),
+            ),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0,
+            cwd=self.cwd,
+            start_new_session=True,
+        )
+        self._cancel_token = cancel_token
+        if cancel_token is not None:
+            cancel_token.add_process(self.process)
+
+    def _stop(self) -> int | None:
+        """Kills the harness and returns its return code."""
+        if self.process is None:
+            return None
+        process, self.process = self.process, None
+        if self._cancel_token is not None:
+            self._cancel_token.remove_process(process)
+        if process.poll() is None:
+            kill_process(process)
+        returncode = process.wait()
+        process.stdin.close()
+        process.stdout.close()
+        return returncode
+
+    def _read_output(self, capture: OutputCapture) -> bool:
+        """Streams the captured output of the run into the capture.
+
+        Returns:
+            keep_running (bool): False if the capture asked to stop.
+        """
+        for stream in ("stderr", "stdout"):
+            try:
+                with open(self.capture_dir / stream, "rb") as f:
+                    while chunk := f.read(READ_CHUNK_SIZE):
+                        if not capture.write(stream, chunk):
+                            return False
+            except OSError:
+                pass
+        return True
+
+    def get_command_output(
+        self,
+        command: str,
+        stdin: str = "",
+        raise_on_fail: bool = False,
+        cwd: str | os.PathLike | None = None,
+        cancel_token: CancelToken | None = None,
+        limits: ResourceLimits | None = None,
+        capture: OutputCapture | None = None,
+    ):
+        """Runs the script with the stdin on the harness and returns the output.
+
+        The signature matches `execute_utils.get_command_output` and so do the
+        raised exceptions. The command and the working directory are the ones
+        the runner was created with.
+        """
+        limits = limits or self.limits
+        if cancel_token is not None and cancel_token.cancelled:
+            raise CommandCancelledError(self.command)
+        if self.process is None or self._cancel_token is not cancel_token:
+            self._stop()
+            self._start(cancel_token)
+
+        (self.capture_dir / "stdin").write_bytes(stdin.encode())
+        request = json.dumps({"cpu_time": limits.cpu_time}).encode() + b"\n"
+        try:
+            self.process.stdin.write(request)
+            readable, _, _ = select.select([self.process.stdout], [], [], limits.time)
+        except OSError:
+            readable = [self.process.stdout]
+        if not readable:
+            self._stop()
+            raise CommandTimeoutError(
+                command_output=f"Time limit of {limits.time} seconds exceeded."
+            )
+        response = self.process.stdout.readline()
+        capture = capture or OutputCapture()
+        keep_running = self._read_output(capture)
+        output = capture.getvalue()
+        if response:
+            exit_code = json.loads(response)["exit_code"]
+        else:
+            # The run crashed the harness
+            exit_code = self._stop()
+        if cancel_token is not None and cancel_token.cancelled:
+            raise CommandCancelledError(self.command)
+        if exit_code == -signal.SIGXCPU:
+            raise CommandTimeoutError(
+                command_output=output
+                + f"CPU time limit of {limits.cpu_time} seconds exceeded."
+            )
+        if exit_code == -signal.SIGXFSZ or (
+            limits.output is not None and len(output.encode()) > limits.output * 1024
+        ):
+            raise OutputLimitExceededError(command_output=output)
+        if not keep_running:
+            raise OutputDivergedError(command_output=output)
+        if raise_on_fail and exit_code != 0:
+            raise CommandFailedError(command_output=output)
+        return output
+
+    def close(self):
+        self._stop()
+        shutil.rmtree(self.capture_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
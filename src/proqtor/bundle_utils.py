@@ -0,0 +1,258 @@
+import heapq
+import json
+import mmap
+import os
+import struct
+import zlib
+from collections.abc import Iterable, Iterator, Sequence
+from typing import NamedTuple
+
+from .core import NestedContent, ProQ
+
+BUNDLE_MAGIC = b"PROQBDL1"
+# The magic, the offset of the index and the length of the index
+BUNDLE_HEADER = struct.Struct("<8sQQ")
+COMPRESSION_LEVEL = 6
+
+
+class ProqRecord(NamedTuple):
+    """A proq of a proq set along with its position in the set.
+
+    Args:
+        index (tuple[int, ...]): The positions of the proq and its ancestors
+            in the content of their parents, empty for an unnested proq.
+        path (tuple[str, ...]): The titles from the root of the set down to
+            the proq.
+        proq (ProQ): The proq.
+    """
+
+    index: tuple[int, ...]
+    path: tuple[str, ...]
+    proq: ProQ
+
+
+class BundleEntry(NamedTuple):
+    index: tuple[int, ...]
+    path: tuple[str, ...]
+    title: str
+    offset: int
+    length: int
+
+
+def iter_proq_records(
+    nested_proq: NestedContent[ProQ],
+    index: tuple[int, ...] = (),
+    path: tuple[str, ...] = (),
+) -> Iterator[ProqRecord]:
+    """Yields the records of the proqs at the leaves of the nested proq in order."""
+    path = (*path, nested_proq.title)
+    if isinstance(nested_proq.content, list):
+        for position, item in enumerate(nested_proq.content):
+            yield from iter_proq_records(item, (*index, position), path)
+    else:
+        yield ProqRecord(index, path, nested_proq.content)
+
+
+def iter_empty_sections(
+    nested_proq: NestedContent[ProQ],
+    index: tuple[int, ...] = (),
+    path: tuple[str, ...] = (),
+) -> Iterator[tuple[tuple[int, ...], tuple[str, ...]]]:
+    """Yields the index and the path of the sections without any content in order."""
+    path = (*path, nested_proq.title)
+    if nested_proq.content == []:
+        yield index, path
+    elif isinstance(nested_proq.content, list):
+        for position, item in enumerate(nested_proq.content):
+            yield from iter_empty_sections(item, (*index, position), path)
+
+
+def build_nested_proq(
+    records: Iterable[ProqRecord],
+    empty_sections: Iterable[tuple[tuple[int, ...], tuple[str, ...]]] = (),
+) -> NestedContent[ProQ]:
+    """Builds the nested proq back from its records and empty sections in order."""
+    root = None
+    for index, path, proq in heapq.merge(
+        records,
+        ((index, path, None) for index, path in empty_sections),
+        key=lambda record: record[0],
+    ):
+        if len(path) != len(index) + 1:
+            raise ValueError(f"Record path {path} does not match index {index}.")
+        # The empty sections are the records without a proq
+        content = [] if proq is None else proq
+        if not index:
+            return NestedContent[ProQ].model_construct(title=path[0], content=content)
+        if root is None:
+            root = NestedContent[ProQ].model_construct(title=path[0], content=[])
+        node = root
+        for depth, position in enumerate(index, 1):
+            if position == len(node.content):
+                node.content.append(
+                    NestedContent[ProQ].model_construct(
+                        title=path[depth],
+                        content=content if depth == len(index) else [],
+                    )
+                )
+            elif position > len(node.content):
+                raise ValueError(f"Record {path} is out of order.")
+            node = node.content[position]
+    if root is None:
+        raise ValueError("No proqs found.")
+    return root
+
+
+def write_ndjson(nested_proq: NestedContent[ProQ], output_file: str | os.PathLike):
+    """Writes each proq of the nested proq as a json line.
+
+    Each line holds the `index` and the `path` of the proq in the set along
+    with the `proq` itself, so the file can be read a proq at a time.
+    """
+    with open(output_file, "w") as f:
+        for index, path, proq in iter_proq_records(nested_proq):
+            f.write(
+                f'{{"index": {json.dumps(index)}, "path": {json.dumps(path)}, '
+                f'"proq": {proq.model_dump_json()}}}\n'
+            )
+
+
+def iter_ndjson(ndjson_file: str | os.PathLike) -> Iterator[ProqRecord]:
+    """Yields the proq records of a ndjson export a line at a time."""
+    with open(ndjson_file) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield ProqRecord(
+                tuple(record["index"]),
+                tuple(record["path"]),
+                ProQ.model_validate(record["proq"]),
+            )
+
+
+def load_nested_proq_from_ndjson(ndjson_file: str | os.PathLike):
+    """Loads the nested proq from a ndjson export without parsing markdown."""
+    return build_nested_proq(iter_ndjson(ndjson_file))
+
+
+def write_bundle(nested_proq: NestedContent[ProQ], output_file: str | os.PathLike):
+    """Writes the nested proq as an indexed binary bundle.
+
+    The bundle is a fixed size header followed by the compressed json of
+    each proq and a compressed json index locating the proqs by their path
+    and title, along with the empty sections of the set. Any proq can be read
+    without reading the rest.
+    """
+    entries = []
+    with open(output_file, "wb") as f:
+        f.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, 0, 0))
+        for index, path, proq in iter_proq_records(nested_proq):
+            data = zlib.compress(proq.model_dump_json().encode(), COMPRESSION_LEVEL)
+            entries.append((index, path, proq.title, f.tell(), len(data)))
+            f.write(data)
+        index_offset = f.tell()
+        index = {"proqs": entries, "sections": list(iter_empty_sections(nested_proq))}
+        index_data = zlib.compress(json.dumps(index).encode(), COMPRESSION_LEVEL)
+        f.write(index_data)
+        f.seek(0)
+        f.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, index_offset, len(index_data)))
+
+
+class ProqBundle:
+    """Random access reader of a binary proq bundle.
+
+    The bundle is memory mapped and only the index is read upfront. The
+    proqs are decompressed and validated when they are accessed.
+
+    Args:
+        bundle_file (str|PathLike): The bundle written by `write_bundle`.
+    """
+
+    def __init__(self, bundle_file: str | os.PathLike):
+        with open(bundle_file, "rb") as f:
+            header = f.read(BUNDLE_HEADER.size)
+            if (
+                len(header) < BUNDLE_HEADER.size
+                or BUNDLE_HEADER.unpack(header)[0] != BUNDLE_MAGIC
+            ):
+                raise ValueError(f"{bundle_file} is not a proq bundle.")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _, index_offset, index_length = BUNDLE_HEADER.unpack(header)
+        index_data = self._mmap[index_offset : index_offset + index_length]
+        index = json.loads(zlib.decompress(index_data))
+        if isinstance(index, list):
+            # Written before the empty sections were kept
+            index = {"proqs": index, "sections": []}
+        self.entries = [
+            BundleEntry(tuple(index), tuple(path), title, offset, length)
+            for index, path, title, offset, length in index["proqs"]
+        ]
+        self.empty_sections = [
+            (tuple(index), tuple(path)) for index, path in index["sections"]
+        ]
+        # Proqs with the same title in a section share their path
+        self._paths: dict[tuple[str, ...], list[BundleEntry]] = {}
+        self._titles: dict[str, list[BundleEntry]] = {}
+        for entry in self.entries:
+            self._paths.setdefault(entry.path, []).append(entry)
+            self._titles.setdefault(entry.title, []).append(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[ProqRecord]:
+        for entry in self.entries:
+            yield ProqRecord(entry.index, entry.path, self.load(entry))
+
+    def load(self, entry: BundleEntry) -> ProQ:
+        data = self._mmap[entry.offset : entry.offset + entry.length]
+        return ProQ.model_validate_json(zlib.decompress(data))
+
+    def get_all(self, path: str | Sequence[str]) -> list[ProQ]:
+        """Returns the proqs at the path of titles, given as a `/` separated str."""
+        if isinstance(path, str):
+            path = path.split("/")
+        return [self.load(entry) for entry in self._paths.get(tuple(path), [])]
+
+    def get(self, path: str | Sequence[str]) -> ProQ:
+        """Returns the only proq at the path of titles.
+
+        Raises:
+            KeyError: if there is no proq at the path.
+            ValueError: if several proqs of a section share the path, which
+                are returned by `get_all`.
+        """
+        if isinstance(path, str):
+            path = path.split("/")
+        entries = self._paths.get(tuple(path), [])
+        if not entries:
+            raise KeyError(f"No proq at {'/'.join(path)} in the bundle.")
+        if len(entries) > 1:
+            raise ValueError(
+                f"{len(entries)} proqs at {'/'.join(path)} in the bundle. "
+                "Use get_all to read all of them."
+            )
+        return self.load(entries[0])
+
+    def find(self, title: str) -> list[ProQ]:
+        """Returns the proqs with the given title."""
+        return [self.load(entry) for entry in self._titles.get(title, [])]
+
+    def to_nested_proq(self) -> NestedContent[ProQ]:
+        return build_nested_proq(self, self.empty_sections)
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_nested_proq_from_bundle(bundle_file: str | os.PathLike):
+    """Loads the nested proq from a binary bundle without parsing markdown."""
+    with ProqBundle(bundle_file) as bundle:
+        return bundle.to_nested_proq()
@@ -0,0 +1,395 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from functools import cache
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # Only annotated, so that the caches load without pydantic and jinja
+    from .core_components import ResourceLimits
+
+DEFAULT_BUILD_CACHE_SIZE = 512 * 1024 * 1024
+DEFAULT_RESULT_CACHE_SIZE = 256 * 1024 * 1024
+DEFAULT_PROQ_CACHE_SIZE = 64 * 1024 * 1024
+DEFAULT_FRAGMENT_CACHE_SIZE = 64 * 1024 * 1024
+PROJECT_CACHE_DIR = ".proq_cache"
+
+
+def get_cache_dir(name: str) -> Path:
+    """Returns the directory for the cache with the given name.
+
+    The cache root is taken from the `PROQ_CACHE_DIR` environment variable
+    and defaults to `$XDG_CACHE_HOME/proqtor` (`~/.cache/proqtor`).
+    """
+    cache_root = os.environ.get("PROQ_CACHE_DIR")
+    if not cache_root:
+        xdg_cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        cache_root = os.path.join(xdg_cache_home, "proqtor")
+    return Path(cache_root) / name
+
+
+def hash_parts(*parts: str | None) -> str:
+    """Returns a hex digest that uniquely identifies the sequence of parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        part = (part or "").encode()
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+@cache
+def get_compiler_version(build_command: str) -> str:
+    """Returns an identifier of the compiler used by the build command.
+
+    The identifier is the resolved executable path along with the output of
+    `--version`, so that upgrading the compiler invalidates cached builds.
+    """
+    executable = build_command.split()[0]
+    executable_path = shutil.which(executable) or executable
+    try:
+        result = subprocess.run(
+            [executable_path, "--version"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            timeout=30,
+        )
+        version = result.stdout
+    except (OSError, subprocess.SubprocessError):
+        version = ""
+    return f"{executable_path}\n{version}"
+
+
+@cache
+def get_package_version() -> str:
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("proqtor")
+    except PackageNotFoundError:
+        return ""
+
+
+def hash_file(path: str | os.PathLike) -> str | None:
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def get_tree_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+def evict_lru(cache_dir: Path, max_size: int) -> None:
+    """Removes least recently used entries until the cache fits max_size bytes.
+
+    Entries are the files and directories directly under the cache directory.
+    Entries starting with a dot are in-progress writes and are skipped.
+    """
+    entries = []
+    for entry in cache_dir.iterdir():
+        if not entry.name.startswith("."):
+            try:
+                entries.append((entry.stat().st_mtime, get_tree_size(entry), entry))
+            except OSError:
+                continue
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries, key=lambda x: x[0]):
+        if total_size <= max_size:
+            break
+        if entry.is_dir():
+            shutil.rmtree(entry, ignore_errors=True)
+        else:
+            entry.unlink(missing_ok=True)
+        total_size -= size
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Writes the file through a temporary file so readers never see partial data."""
+    fd, temp_path = tempfile.mkstemp(prefix=".", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except OSError:
+        os.unlink(temp_path)
+        raise
+
+
+class BuildCache:
+    """Content addressed on-disk cache of build artifacts.
+
+    Each entry holds the files produced by a build command in the workspace,
+    keyed by the hash of the source code, the source filename, the build
+    command and the compiler version. Entries are evicted in least recently
+    used order once the total size exceeds `max_size` bytes.
+    """
+
+    def __init__(self, cache_dir=None, max_size: int = DEFAULT_BUILD_CACHE_SIZE):
+        self.cache_dir = Path(cache_dir or get_cache_dir("build"))
+        self.max_size = max_size
+
+    def key(self, code: str, source_filename: str, build_command: str) -> str:
+        return hash_parts(
+            code, source_filename, build_command, get_compiler_version(build_command)
+        )
+
+    def restore(self, key: str, workspace: str | os.PathLike) -> bool:
+        """Copies the cached artifacts into the workspace.
+
+        Returns:
+            hit (bool): whether an entry was found for the key.
+        """
+        entry = self.cache_dir / key
+        if not entry.is_dir():
+            return False
+        try:
+            shutil.copytree(entry, workspace, dirs_exist_ok=True)
+        except (OSError, shutil.Error):
+            return False
+        # Recency for LRU eviction
+        now = time.time()
+        os.utime(entry, (now, now))
+        return True
+
+    def store(
+        self, key: str, workspace: str | os.PathLike, source_filename: str
+    ) -> None:
+        """Stores the files in the workspace other than the source as artifacts."""
+        workspace = Path(workspace)
+        entry = self.cache_dir / key
+        if entry.is_dir():
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=self.cache_dir))
+        try:
+            source_path = (workspace / source_filename).resolve()
+            for file in workspace.rglob("*"):
+                if not file.is_file() or file.resolve() == source_path:
+                    continue
+                destination = staging / file.relative_to(workspace)
+                destination.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(file, destination)
+            # Atomic publish so concurrent readers never see partial entries
+            os.rename(staging, entry)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        evict_lru(self.cache_dir, self.max_size)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+class ResultCache:
+    """Persistent cache of the outputs of a program for each test input.
+
+    The outputs of a program are stored in a single entry keyed by the hash
+    of the code, the source filename, the run and build commands, the
+    compiler version and the resource limits. Within an entry the outputs are
+    keyed by the hash of the test input. Only the actual outputs are cached,
+    so editing the expected outputs of a test case does not invalidate its
+    result.
+
+    Args:
+        cache_dir (str|PathLike): The directory to store the results in.
+        max_size (int): The size in bytes beyond which least recently used
+            entries are evicted.
+        refresh (bool): Whether to ignore the cached results. The fresh
+            results are still stored for later runs.
+    """
+
+    def __init__(
+        self,
+        cache_dir=None,
+        max_size: int = DEFAULT_RESULT_CACHE_SIZE,
+        refresh: bool = False,
+    ):
+        self.cache_dir = Path(cache_dir or get_cache_dir("results"))
+        self.max_size = max_size
+        self.refresh = refresh
+        self._update_lock = threading.Lock()
+
+    def key(
+        self,
+        code: str,
+        source_filename: str,
+        run_command: str,
+        build_command: str | None = None,
+        limits: "ResourceLimits | None" = None,
+    ) -> str:
+        return hash_parts(
+            code,
+            source_filename,
+            run_command,
+            build_command,
+            get_compiler_version(build_command) if build_command else "",
+            limits.model_dump_json() if limits else "",
+        )
+
+    @staticmethod
+    def input_key(stdin: str, time_limit: float | None = None) -> str:
+        if time_limit is None:
+            return hash_parts(stdin)
+        return hash_parts(stdin, str(time_limit))
+
+    def load(self, key: str) -> dict[str, str]:
+        """Returns the cached outputs of the program by the input keys."""
+        if self.refresh:
+            return {}
+        entry = self.cache_dir / key
+        try:
+            outputs = json.loads(entry.read_text())
+            now = time.time()
+            os.utime(entry, (now, now))
+        except (OSError, ValueError):
+            return {}
+        return outputs
+
+    def update(self, key: str, outputs: dict[str, str]) -> None:
+        """Adds the outputs by the input keys to the entry of the program."""
+        if not outputs:
+            return
+        entry = self.cache_dir / key
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Concurrent evaluations of the same program must not drop outputs
+        with self._update_lock:
+            try:
+                existing = json.loads(entry.read_text())
+            except (OSError, ValueError):
+                existing = {}
+            try:
+                atomic_write_text(entry, json.dumps(existing | outputs))
+            except OSError:
+                return
+            evict_lru(self.cache_dir, self.max_size)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+class ProqCache:
+    """Project local on-disk cache of parsed proqs.
+
+    Each entry holds a validated proq as json, keyed by the hash of the proq
+    file content, its directory, whether it was rendered and the proqtor
+    version. The entry also records the hashes of the files the rendering
+    pulled in through `{% include %}`, `{% import %}` and `{% extends %}`,
+    and is only used while all of them are unchanged. Editing a shared
+    include therefore invalidates exactly the proqs that include it.
+
+    Args:
+        cache_dir (str|PathLike): The directory to store the proqs in.
+            Defaults to `.proq_cache/proqs` in the current directory.
+        max_size (int): The size in bytes beyond which least recently used
+            entries are evicted.
+    """
+
+    def __init__(self, cache_dir=None, max_size: int = DEFAULT_PROQ_CACHE_SIZE):
+        self.cache_dir = Path(cache_dir or Path(PROJECT_CACHE_DIR) / "proqs")
+        self.max_size = max_size
+
+    def key(self, content: str, base: str, render_template: bool) -> str:
+        return hash_parts(
+            content, os.path.abspath(base), str(render_template), get_package_version()
+        )
+
+    def load(self, key: str, dependencies: set[str] | None = None) -> str | None:
+        """Returns the cached proq json if its dependencies are unchanged.
+
+        Args:
+            key (str): The key of the proq.
+            dependencies (set[str]): The set to add the paths of the
+                dependencies of the cached proq to.
+        """
+        entry = self.cache_dir / key
+        try:
+            entry_dependencies, _, proq_json = entry.read_text().partition("\n")
+            entry_dependencies = json.loads(entry_dependencies)
+        except (OSError, ValueError):
+            return None
+        for path, digest in entry_dependencies.items():
+            if hash_file(path) != digest:
+                return None
+        if dependencies is not None:
+            dependencies.update(entry_dependencies)
+        now = time.time()
+        try:
+            os.utime(entry, (now, now))
+        except OSError:
+            pass
+        return proq_json
+
+    def store(self, key: str, proq_json: str, dependencies: set[str]) -> None:
+        """Stores the proq json along with the hashes of its dependencies."""
+        dependencies = {path: hash_file(path) for path in sorted(dependencies)}
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            atomic_write_text(
+                self.cache_dir / key, json.dumps(dependencies) + "\n" + proq_json
+            )
+        except OSError:
+            return
+        evict_lru(self.cache_dir, self.max_size)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+class FragmentCache:
+    """Project local on-disk cache of the html fragments of exported proqs.
+
+    Each entry holds the html rendered for a single proq, keyed by the hash
+    of the proq, its heading, the export options and the export templates,
+    so re-exporting a proq set renders only the proqs that changed.
+
+    Args:
+        cache_dir (str|PathLike): The directory to store the fragments in.
+            Defaults to `.proq_cache/fragments` in the current directory.
+        max_size (int): The size in bytes beyond which least recently used
+            entries are evicted.
+    """
+
+    def __init__(self, cache_dir=None, max_size: int = DEFAULT_FRAGMENT_CACHE_SIZE):
+        self.cache_dir = Path(cache_dir or Path(PROJECT_CACHE_DIR) / "fragments")
+        self.max_size = max_size
+        self._stored = False
+
+    def load(self, key: str) -> str | None:
+        entry = self.cache_dir / key
+        try:
+            fragment = entry.read_text()
+            now = time.time()
+            os.utime(entry, (now, now))
+        except OSError:
+            return None
+        return fragment
+
+    def store(self, key: str, fragment: str) -> None:
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            atomic_write_text(self.cache_dir / key, fragment)
+        except OSError:
+            return
+        self._stored = True
+
+    def evict(self) -> None:
+        """Evicts the least recently used fragments if any were stored."""
+        if self._stored:
+            evict_lru(self.cache_dir, self.max_size)
+            self._stored = False
+
+    def clear(self) -> None:
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
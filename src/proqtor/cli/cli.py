@@ -1,28 +1,33 @@
 import os
-from contextlib import contextmanager
+import sys
+from contextlib import contextmanager, nullcontext
 from functools import wraps
-from pathlib import Path
+from importlib.util import find_spec
 from typing import Literal
 
 import fire
 from termcolor import cprint
 
-from proqtor.core import ProQ, ProqParseError
-from proqtor.evaluate_utils import ProqCheck
-from proqtor.utils import color_diff
-
 from . import export
 
-try:
-    from proqtor.gen_ai_utils import generate_proq
+# The proqtor modules are imported by the commands using them, so that
+# resolving the command tree and printing the help stay fast.
+gen_ai_features = all(
+    find_spec(name) is not None
+    for name in ["langchain", "langchain_groq", "langchain_openai"]
+)
+
+DEFAULT_TIME_LIMIT = 10
 
-    gen_ai_features = True
-except ImportError:
-    gen_ai_features = False
+
+class CliError(Exception):
+    """An error in the usage of a command, printed without a traceback."""
 
 
 @contextmanager
 def ignore_parse_errors():
+    from proqtor.core import ProqParseError
+
     try:
         yield
     except FileNotFoundError as e:
@@ -42,6 +47,57 @@ def ignore_parse_error_wrapper(func):
     return wrapper
 
 
+def expand_selectors(files) -> list[str]:
+    """Replaces the `@key=value,...` index query selectors by the proq files."""
+    selectors = [str(file) for file in files if str(file).startswith("@")]
+    if not selectors:
+        return list(files)
+    from proqtor.index_utils import ProqIndex, get_default_index_path, parse_selector
+
+    # Opening the index creates it, so a missing index is reported instead
+    if not get_default_index_path().is_file():
+        raise CliError(
+            f"No index found for the selector {selectors[0]}. "
+            "Run `proq index` first to create one."
+        )
+    for selector in selectors:
+        try:
+            parse_selector(selector)
+        except ValueError as e:
+            raise CliError(str(e)) from None
+
+    expanded = []
+    with ProqIndex() as index:
+        for file in files:
+            if str(file).startswith("@"):
+                expanded.extend(
+                    os.path.relpath(path, os.curdir) for path in index.select(file)
+                )
+            else:
+                expanded.append(file)
+    return list(dict.fromkeys(expanded))
+
+
+def print_summary(proq_checks):
+    n_proqs = len(proq_checks)
+    cprint(
+        f"Total of {n_proqs} proq{'s' if n_proqs > 1 else ''} evaluated.",
+        attrs=["bold"],
+    )
+    for file_path, proq_check in proq_checks:
+        cprint(
+            ("✓" if proq_check.solution_check else "✗") + " solution",
+            "green" if proq_check.solution_check else "red",
+            end=" ",
+        )
+        cprint(
+            ("✓" if proq_check.template_check else "✗") + " template",
+            "green" if proq_check.template_check else "red",
+            end=" ",
+        )
+        print(os.path.relpath(file_path, os.curdir))
+
+
 class ProqCli:
     """A Command-line suite for authoring Programming Questions.
 
@@ -70,6 +126,8 @@ class ProqCli:
             n_private (int) : Number of private test cases
             force (bool) : Overwrite file if exists
         """
+        from proqtor.core import ProQ
+
         if not force and os.path.isfile(output_file):
             raise FileExistsError(
                 f"A file with the name '{output_file}' already exists."
@@ -83,25 +141,70 @@ class ProqCli:
         """Formats the given files according to the proq template.
 
         Args:
-            proq_files (list[str]): List of proq files to format.
+            proq_files (list[str]): List of proq files to format or index query
+                selectors like `@tag=loops`, see `proq query`.
         """
-        for proq_file in proq_files:
+        from proqtor.core import ProQ
+
+        for proq_file in expand_selectors(proq_files):
             with ignore_parse_errors():
                 ProQ.from_file(proq_file, render_template=False).to_file(proq_file)
 
-    def correct(self, *proq_files: list[str]):
+    def correct(
+        self,
+        *proq_files: list[str],
+        no_build_cache: bool = False,
+        no_proq_cache: bool = False,
+        time_limit: float = DEFAULT_TIME_LIMIT,
+        cpu_time_limit: float = None,
+        memory_limit: int = None,
+        output_limit: int = None,
+        fork_server: bool = False,
+    ):
         """Corrects the test case outputs according to the solution.
 
         Args:
-            proq_files (list[str]): List of proq files to correct.
+            proq_files (list[str]): List of proq files to correct or index
+                query selectors like `@tag=loops`, see `proq query`.
+            no_build_cache (bool): Whether to always rebuild instead of reusing
+                cached build artifacts.
+            no_proq_cache (bool): Whether to always parse the proq files instead
+                of reusing the proqs cached in `.proq_cache`.
+            time_limit (float): The default wall-clock seconds for each test case.
+            cpu_time_limit (float): The default CPU seconds for each test case.
+            memory_limit (int): The default memory limit in MB for each test case.
+            output_limit (int): The default output limit in KB for each test case.
+            fork_server (bool): Whether to run python solutions by forking a
+                warm interpreter instead of starting one for each test case.
         """
-        for proq_file in proq_files:
-            with ignore_parse_errors():
-                proq = ProQ.from_file(proq_file).correct_outputs(inplace=True)
-                unrendered_proq = ProQ.from_file(proq_file, render_template=False)
-                unrendered_proq.public_test_cases = proq.public_test_cases
-                unrendered_proq.private_test_cases = proq.private_test_cases
-                unrendered_proq.to_file(proq_file)
+        from proqtor.cache_utils import BuildCache, ProqCache
+        from proqtor.core import ProQ
+        from proqtor.core_components import ResourceLimits
+        from proqtor.fork_server_utils import ForkServerPool
+
+        build_cache = None if no_build_cache else BuildCache()
+        proq_cache = None if no_proq_cache else ProqCache()
+        limits = ResourceLimits(
+            time=time_limit,
+            cpu_time=cpu_time_limit,
+            memory=memory_limit,
+            output=output_limit,
+        )
+        with ForkServerPool() if fork_server else nullcontext() as fork_servers:
+            for proq_file in expand_selectors(proq_files):
+                with ignore_parse_errors():
+                    proq = ProQ.from_file(
+                        proq_file, proq_cache=proq_cache
+                    ).correct_outputs(
+                        inplace=True,
+                        build_cache=build_cache,
+                        limits=limits,
+                        fork_servers=fork_servers,
+                    )
+                    unrendered_proq = ProQ.from_file(proq_file, render_template=False)
+                    unrendered_proq.public_test_cases = proq.public_test_cases
+                    unrendered_proq.private_test_cases = proq.private_test_cases
+                    unrendered_proq.to_file(proq_file)
 
     @ignore_parse_error_wrapper
     def show_code(self, proq_file: str, render: bool = False):
@@ -111,6 +214,9 @@ class ProqCli:
             proq_file (str): The proq file.
             render (bool): Whether to render the jinja template
         """
+        from proqtor.core import ProQ
+        from proqtor.utils import color_diff
+
         proq = ProQ.from_file(proq_file, render_template=render)
         cprint(proq.solution.prefix, color="grey", end="")
         color_diff(proq.solution.template, proq.solution.solution)
@@ -119,19 +225,126 @@ class ProqCli:
         if proq.solution.suffix_invisible:
             cprint(proq.solution.suffix_invisible, on_color="on_light_grey")
 
-    @ignore_parse_error_wrapper
-    def export_test_cases(self, proq_file, zip: bool = False):
-        """Exports the test cases into a folder.
+    def export_test_cases(
+        self,
+        *proq_files: str,
+        zip: bool = False,
+        tar: bool = False,
+        output: str = None,
+        jobs: int = None,
+        no_proq_cache: bool = False,
+    ):
+        """Exports the test cases of the proqs into folders or archives.
+
+        The test cases of each proq file are exported to a folder named after
+        it, with the public and private subfolders holding the inputs and the
+        outputs as text files. The proqs of a proq set config file are
+        exported to numbered folders inside a folder named after it. The
+        archives are written directly, without writing the folders first.
 
         Args:
-            proq_file (str): The proq file
-            zip (bool): Whether to zip archive instead of a folder.
+            proq_files (str): The proq files, proq set config files or index
+                query selectors like `@tag=loops`, see `proq query`.
+            zip (bool): Whether to write a zip archive for each proq instead of
+                a folder.
+            tar (bool): Whether to write a gzipped tar archive for each proq
+                instead of a folder.
+            output (str): A single archive, `.zip`, `.tar`, `.tar.gz` or `.tgz`,
+                to export the test cases of all the proqs to. Each proq gets a
+                numbered folder and the archive has a `manifest.json` with the
+                title, the source and the test case counts of each folder.
+            jobs (int): The maximum number of proqs loaded and written at once.
+            no_proq_cache (bool): Whether to always parse the proq files instead
+                of reusing the proqs cached in `.proq_cache`.
         """
-        proq = ProQ.from_file(proq_file)
-        folder = Path(os.path.splitext(proq_file)[0])
-        proq.export_test_cases(folder, zip)
+        from concurrent.futures import ThreadPoolExecutor
+
+        from proqtor.archive_utils import write_combined_archive, write_test_cases
+        from proqtor.bundle_utils import iter_proq_records
+        from proqtor.cache_utils import ProqCache
+        from proqtor.core import ProQ, load_nested_proq_from_file
+        from proqtor.utils import get_file_stem
+
+        proq_cache = None if no_proq_cache else ProqCache()
+        format = "zip" if zip else "tar.gz" if tar else None
+        extension = f".{format}" if format else ""
+
+        def load(proq_file):
+            """Returns the output path, the metadata and the proq of each proq."""
+            stem = os.path.splitext(proq_file)[0]
+            if proq_file.endswith(".yaml"):
+                nested_proq = load_nested_proq_from_file(
+                    proq_file, proq_cache=proq_cache
+                )
+                return [
+                    (
+                        os.path.join(stem, get_file_stem(i, proq.title)),
+                        {"source": proq_file, "path": list(path)},
+                        proq,
+                    )
+                    for i, (_, path, proq) in enumerate(
+                        iter_proq_records(nested_proq), 1
+                    )
+                ]
+            proq = ProQ.from_file(proq_file, proq_cache=proq_cache)
+            return [(stem, {"source": proq_file}, proq)]
+
+        def write(entry):
+            output_path, _, proq = entry
+            os.makedirs(os.path.dirname(output_path) or os.curdir, exist_ok=True)
+            write_test_cases(proq, output_path + extension, format)
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            loads = [
+                (proq_file, executor.submit(load, proq_file))
+                for proq_file in expand_selectors(proq_files)
+            ]
+
+            def iter_entries():
+                # The proqs are loaded concurrently but used in the given order
+                for proq_file, future in loads:
+                    if not os.path.isfile(proq_file):
+                        print(f"{proq_file} is not a valid file")
+                        continue
+                    entries = []
+                    with ignore_parse_errors():
+                        entries = future.result()
+                    yield from entries
+
+            if output:
+                manifest = write_combined_archive(
+                    (
+                        (get_file_stem(i, proq.title), metadata, proq)
+                        for i, (_, metadata, proq) in enumerate(iter_entries(), 1)
+                    ),
+                    output,
+                )
+                n_proqs = len(manifest)
+            else:
+                n_proqs = len(list(executor.map(write, iter_entries())))
+        print(
+            f"Test cases of {n_proqs} proq{'s' if n_proqs != 1 else ''} exported"
+            + (f" to {output}." if output else ".")
+        )
 
-    def evaluate(self, *files: str | os.PathLike, verbose=False, diff_mode=False):
+    def evaluate(
+        self,
+        *files: str | os.PathLike,
+        verbose=False,
+        diff_mode=False,
+        no_build_cache=False,
+        no_proq_cache=False,
+        fresh=False,
+        jobs: int = None,
+        concurrent_checks=False,
+        fail_fast=False,
+        time_limit: float = DEFAULT_TIME_LIMIT,
+        cpu_time_limit: float = None,
+        memory_limit: int = None,
+        output_limit: int = None,
+        fork_server=False,
+        watch=False,
+    ):
         """Evaluates the testcases in the proq files locally.
 
         It uses the local installed compilers and interpreters
@@ -143,43 +356,199 @@ class ProqCli:
         ```{lang_id} {filename} -r '{run_command}' -b '{build_command}'
 
         Args:
-            files (str|PathLike): The file names of the proqs to be evaluated.
+            files (str|PathLike): The file names of the proqs to be evaluated
+                or index query selectors like `@verdict=failed,lang=python`,
+                see `proq query`. The verdicts are recorded in the index when
+                `proq index` was run in the current directory.
             verbose (bool): Whether to print the test results.
             diff_mode (bool):
-                Whether to display expected-actual diff instead of separate
-                expected and actual outputs
+                Whether to display a bounded expected-actual diff instead of
+                separate expected and actual outputs
+            no_build_cache (bool):
+                Whether to always rebuild instead of reusing cached build
+                artifacts of compiled languages.
+            no_proq_cache (bool):
+                Whether to always parse the proq files instead of reusing the
+                proqs cached in `.proq_cache` from previous loads of unchanged
+                files.
+            fresh (bool):
+                Whether to execute all the test cases instead of reusing the
+                results cached from previous evaluations of unchanged code.
+            jobs (int):
+                The maximum number of builds and test cases to run concurrently
+                across all the proqs. Defaults to the number of CPUs.
+            concurrent_checks (bool):
+                Whether to build and run the template alongside the solution
+                instead of waiting for the solution check to pass.
+            fail_fast (bool):
+                Whether to stop running the test cases of a proq as soon as
+                the outcome is decided, i.e. when a solution test case fails or
+                a template test case passes.
+            time_limit (float):
+                The default wall-clock seconds after which a test case is
+                stopped and reported as timed out. Overridden by the limits in
+                the yaml header of the proq and the time limit of a test case.
+            cpu_time_limit (float): The default CPU seconds for each test case.
+            memory_limit (int): The default memory limit in MB for each test case.
+            output_limit (int): The default output limit in KB for each test case.
+            fork_server (bool):
+                Whether to run `python script.py` solutions and templates by
+                forking a warm interpreter for each test case instead of
+                starting a fresh one, which saves the interpreter startup.
+            watch (bool):
+                Whether to keep running after the evaluation and re-evaluate
+                the proqs affected by each change of the proq files or the
+                files they include.
         """
-        proq_checks: list[tuple[str, ProqCheck]] = []
-        for file_path in files:
-            if not os.path.isfile(file_path):
-                print(f"{file_path} is not a valid file")
-                continue
-            print(f"Evaluating {file_path}")
-            with ignore_parse_errors():
-                proq = ProQ.from_file(file_path)
+        from concurrent.futures import ThreadPoolExecutor
+
+        from proqtor.cache_utils import BuildCache, ProqCache, ResultCache
+        from proqtor.core import ProQ
+        from proqtor.core_components import ResourceLimits
+        from proqtor.evaluate_utils import ProqCheck, print_evaluation
+        from proqtor.execute_utils import JobScheduler
+        from proqtor.fork_server_utils import ForkServerPool
+        from proqtor.index_utils import ProqIndex, get_default_index_path
+        from proqtor.watch_utils import FileWatcher
+
+        files = expand_selectors(files)
+        build_cache = None if no_build_cache else BuildCache()
+        result_cache = ResultCache(refresh=fresh)
+        proq_cache = None if no_proq_cache else ProqCache()
+        limits = ResourceLimits(
+            time=time_limit,
+            cpu_time=cpu_time_limit,
+            memory=memory_limit,
+            output=output_limit,
+        )
+        watcher = FileWatcher()
+        file_dependencies: dict[str, set[str]] = {}
+
+        with (
+            JobScheduler(jobs) as scheduler,
+            ThreadPoolExecutor(max_workers=scheduler.max_jobs) as file_executor,
+            ForkServerPool() if fork_server else nullcontext() as fork_servers,
+            ProqIndex()
+            if get_default_index_path().is_file()
+            else nullcontext() as index,
+        ):
 
-                result = proq.evaluate(verbose=verbose, diff_mode=diff_mode)
-                if verbose:
-                    print()
-                proq_checks.append((file_path, result))
+            def check_file(file_path):
+                file_dependencies[file_path] = dependencies = set()
+                proq = ProQ.from_file(
+                    file_path, proq_cache=proq_cache, dependencies=dependencies
+                )
+                return proq.check(
+                    build_cache=build_cache,
+                    result_cache=result_cache,
+                    scheduler=scheduler,
+                    concurrent_checks=concurrent_checks,
+                    fail_fast=fail_fast,
+                    limits=limits,
+                    fork_servers=fork_servers,
+                )
+
+            def evaluate_files(file_paths) -> list[tuple[str, ProqCheck]]:
+                proq_checks = []
+                # Proqs are evaluated concurrently but reported in the given order
+                evaluations = {
+                    file_path: file_executor.submit(check_file, file_path)
+                    for file_path in file_paths
+                    if os.path.isfile(file_path)
+                }
+                for file_path in file_paths:
+                    if file_path not in evaluations:
+                        print(f"{file_path} is not a valid file")
+                        continue
+                    print(f"Evaluating {file_path}")
+                    with ignore_parse_errors():
+                        evaluation = evaluations[file_path].result()
+                        print_evaluation(
+                            evaluation, verbose=verbose, diff_mode=diff_mode
+                        )
+                        if verbose:
+                            print()
+                        proq_checks.append((file_path, evaluation.proq_check))
+                        if index is not None:
+                            index.record_verdict(file_path, evaluation.proq_check)
+                for file_path in file_paths:
+                    watcher.watch(file_path, file_dependencies.pop(file_path, set()))
+                return proq_checks
+
+            print_summary(evaluate_files(files))
+            if watch:
+                cprint("Watching for changes. Press Ctrl+C to stop.", attrs=["bold"])
+                try:
+                    while True:
+                        print_summary(evaluate_files(watcher.wait()))
+                except KeyboardInterrupt:
+                    pass
+
+    def index(self, directory: str = ".", no_proq_cache: bool = False):
+        """Indexes the proq files in the directory for `proq query`.
+
+        The index is stored in `.proq_cache/index.sqlite` of the current
+        directory. Running it again parses only the files that changed since.
+        Markdown files without a yaml header, like READMEs, are skipped.
 
-        n_proqs = len(proq_checks)
-        cprint(
-            f"Total of {n_proqs} proq{'s' if n_proqs>1 else ''} evaluated.",
-            attrs=["bold"],
-        )
-        for file_path, proq_check in proq_checks:
-            cprint(
-                ("✓" if proq_check.solution_check else "✗") + " solution",
-                "green" if proq_check.solution_check else "red",
-                end=" ",
-            )
-            cprint(
-                ("✓" if proq_check.template_check else "✗") + " template",
-                "green" if proq_check.template_check else "red",
-                end=" ",
+        Args:
+            directory (str): The directory with the proq files to index.
+            no_proq_cache (bool): Whether to always parse the changed proq files
+                instead of reusing the proqs cached in `.proq_cache`.
+        """
+        from proqtor.cache_utils import ProqCache
+        from proqtor.index_utils import ProqIndex
+
+        with ProqIndex() as index:
+            update = index.update(
+                directory, proq_cache=None if no_proq_cache else ProqCache()
             )
-            print(os.path.relpath(file_path, os.curdir))
+        for path, error in update.errors:
+            cprint(f"{os.path.relpath(path, os.curdir)}: {error}", "red")
+        print(
+            f"{update.added} added, {update.updated} updated, "
+            f"{update.removed} removed and {update.unchanged} unchanged."
+        )
+
+    def query(
+        self,
+        tag: str = None,
+        title: str = None,
+        lang: str = None,
+        verdict: Literal["passed", "failed", "none"] = None,
+        verbose: bool = False,
+    ):
+        """Prints the indexed proq files matching all the given fields.
+
+        Run `proq index` first to build the index. The same queries can be
+        given to `proq evaluate`, `proq correct` and `proq format` in place of
+        the files as selectors like `@tag=loops,verdict=failed`.
+
+        Args:
+            tag (str): A tag of the proqs.
+            title (str): A case insensitive part of the titles.
+            lang (str): The language of the solutions.
+            verdict (Literal["passed", "failed", "none"]): The last evaluation
+                verdict, where none selects the proqs not evaluated since
+                their last change.
+            verbose (bool): Whether to print the title, language, test case
+                counts and verdict along with the file.
+        """
+        from proqtor.index_utils import ProqIndex, get_default_index_path
+
+        if not get_default_index_path().is_file():
+            print("No index found. Run `proq index` to create one.")
+            return
+        with ProqIndex() as index:
+            for proq in index.query(tag=tag, title=title, lang=lang, verdict=verdict):
+                path = os.path.relpath(proq.path, os.curdir)
+                if not verbose:
+                    print(path)
+                    continue
+                print(
+                    f"{path}\t{proq.title}\t{proq.lang}\t"
+                    f"{proq.n_public}+{proq.n_private} tests\t{proq.verdict or '-'}"
+                )
 
     if gen_ai_features:
 
@@ -202,6 +571,9 @@ class ProqCli:
                     The LLM model to be used in the format of "provider:model_id".
                     The currently supported providers are groq and open-ai.
             """
+            from proqtor.core import ProqParseError
+            from proqtor.gen_ai_utils import generate_proq
+
             try:
                 proq = generate_proq(prompt, example_files=examples, model=model)
             except ProqParseError as e:
@@ -223,7 +595,11 @@ class ProqCli:
 
 
 def main():
-    fire.Fire(ProqCli(), name="proq")
+    try:
+        fire.Fire(ProqCli(), name="proq")
+    except CliError as e:
+        cprint(f"Error: {e}", "red", file=sys.stderr)
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -1,110 +1,152 @@
-import asyncio
-import os
-import subprocess
-import tempfile
-from typing import Literal
-
-from proqtor.core import NestedContent, ProQ, load_nested_proq_from_file
-from proqtor.template_utils import package_env
-
-OUTPUT_FORMATS = ["json", "html", "pdf"]
-
-
-async def print_html_to_pdf(html_content, output_file, chrome_path=None):
-    chrome_path = chrome_path or os.environ["CHROME"] or "chrome"
-    with tempfile.TemporaryDirectory() as tmpdir:
-        file_path = os.path.join(tmpdir, "output.html")
-        with open(file_path, "w") as f:
-            f.write(html_content)
-        subprocess.run(
-            [
-                chrome_path,
-                f"--print-to-pdf={output_file}",
-                "--headless",
-                "--disable-gpu",
-                "--no-pdf-header-footer",
-                os.path.abspath(file_path),
-            ],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
-
-
-get_rendered_html = package_env.get_template("proq_export_template.html.jinja").render
-
-
-def proq_export(
-    proq_file: str | os.PathLike,
-    output_file: str | os.PathLike = None,
-    format: Literal["html", "json", "pdf"] = "html",
-    show_hidden_suffix: bool = False,
-    hide_private_testcases: bool = False,
-    hide_template_diff: bool = False,
-):
-    """Export the proq_file or a nested proq config file to the given format.
-
-    If the output file name is not given the output file will have
-    same name as proq file but with the exported extension.
-
-    Supports json, html and pdf formats.
-
-    PDF export uses default chrome installation.
-    It uses "chrome" as the default executable name.
-    Different executable can be configured using CHROME environment variable.
-
-
-    Args:
-        proq_file (str|PathLike) : Name of the proq file.
-        output_file (str) : Name of the output file.
-        format (Literal["html", "json", "pdf"]) : Format to export.
-        show_hidden_suffix (bool) :
-            Whether to expand hidden suffix in HTML or PDF exports.
-        hide_private_testcases (bool):
-            Whether to hide private testcases in HTML or PDF exports.
-        hide_template_diff (bool):
-            Whether to hide the template - solution diff.
-
-    """
-    if not os.path.isfile(proq_file):
-        raise FileNotFoundError(f"File {proq_file} does not exists.")
-    if not output_file:
-        assert format in OUTPUT_FORMATS, (
-            "Export format not valid. Supported formats are "
-            f"{', '.join(OUTPUT_FORMATS[:-1])} and {OUTPUT_FORMATS[-1]}."
-        )
-        output_file = ".".join(proq_file.split(".")[:-1]) + f".{format}"
-    else:
-        # infer format if output filename is given
-        format = output_file.split(".")[-1]
-
-    is_nested_proq = proq_file.split(".")[-1] == "yaml"
-    if is_nested_proq:
-        nested_proq = load_nested_proq_from_file(proq_file)
-    else:
-        proq = ProQ.from_file(proq_file)
-        nested_proq = NestedContent[ProQ](title=proq.title, content=proq)
-
-    with open(output_file, "w") as f:
-        if format == "json":
-            if is_nested_proq:
-                f.write(nested_proq.model_dump_json(indent=2))
-            else:
-                f.write(proq.model_dump_json(indent=2))
-        elif format in ["html", "pdf"]:
-            rendered_html = get_rendered_html(
-                nested_proq=nested_proq,
-                show_hidden_suffix=show_hidden_suffix,
-                hide_private_testcases=hide_private_testcases,
-                hide_template_diff=hide_template_diff,
-            )
-            if format == "html":
-                f.write(rendered_html)
-            if format == "pdf":
-                asyncio.run(
-                    print_html_to_pdf(
-                        rendered_html,
-                        output_file,
-                    )
-                )
-
-    print(f"Proqs dumped to {output_file}")
+import os
+from pathlib import Path
+from typing import Literal
+
+OUTPUT_FORMATS = ["json", "ndjson", "bundle", "html", "pdf"]
+
+
+def proq_export(
+    proq_file: str | os.PathLike,
+    output_file: str | os.PathLike = None,
+    format: Literal["html", "json", "ndjson", "bundle", "pdf"] = "html",
+    show_hidden_suffix: bool = False,
+    hide_private_testcases: bool = False,
+    hide_template_diff: bool = False,
+    per_proq: bool = False,
+    browsers: int = 1,
+    no_proq_cache: bool = False,
+):
+    """Export the proq_file or a nested proq config file to the given format.
+
+    If the output file name is not given the output file will have
+    same name as proq file but with the exported extension.
+
+    Supports json, ndjson, bundle, html and pdf formats.
+
+    The ndjson format has a line for each proq with its path in the proq set.
+    The bundle format is a compressed binary file indexed by the proq paths
+    and titles. Both can be exported again as the proq_file without parsing
+    the markdown of the proqs.
+
+    PDF export uses default chrome installation.
+    It uses "chrome" as the default executable name.
+    Different executable can be configured using CHROME environment variable.
+    The documents are printed by headless browsers that are started once.
+
+
+    Args:
+        proq_file (str|PathLike) : Name of the proq file, the proq set config
+            file or a ndjson or bundle export.
+        output_file (str) : Name of the output file.
+        format (Literal["html", "json", "ndjson", "bundle", "pdf"]) :
+            Format to export.
+        show_hidden_suffix (bool) :
+            Whether to expand hidden suffix in HTML or PDF exports.
+        hide_private_testcases (bool):
+            Whether to hide private testcases in HTML or PDF exports.
+        hide_template_diff (bool):
+            Whether to hide the template - solution diff.
+        per_proq (bool):
+            Whether to export each proq of a proq set config file to its own
+            file in a folder named after the output file.
+        browsers (int):
+            The number of headless browsers printing PDFs concurrently.
+        no_proq_cache (bool):
+            Whether to always parse and render the proq files instead of
+            reusing the proqs and html fragments cached in `.proq_cache`.
+
+    """
+    from proqtor.bundle_utils import (
+        iter_proq_records,
+        load_nested_proq_from_bundle,
+        load_nested_proq_from_ndjson,
+        write_bundle,
+        write_ndjson,
+    )
+    from proqtor.cache_utils import FragmentCache, ProqCache
+    from proqtor.core import NestedContent, ProQ, load_nested_proq_from_file
+    from proqtor.export_utils import HtmlExporter
+    from proqtor.pdf_utils import BrowserPool
+    from proqtor.utils import get_file_stem
+
+    if not os.path.isfile(proq_file):
+        raise FileNotFoundError(f"File {proq_file} does not exists.")
+    if not output_file:
+        output_file = ".".join(proq_file.split(".")[:-1]) + f".{format}"
+    else:
+        # infer format if output filename is given
+        format = output_file.split(".")[-1]
+    if format not in OUTPUT_FORMATS:
+        from proqtor.cli.cli import CliError
+
+        raise CliError(
+            f"Export format {format!r} not valid. Supported formats are "
+            f"{', '.join(OUTPUT_FORMATS[:-1])} and {OUTPUT_FORMATS[-1]}."
+        )
+
+    proq_cache = None if no_proq_cache else ProqCache()
+    input_format = proq_file.split(".")[-1]
+    is_nested_proq = input_format in ["yaml", "ndjson", "bundle"]
+    if input_format == "ndjson":
+        nested_proq = load_nested_proq_from_ndjson(proq_file)
+    elif input_format == "bundle":
+        nested_proq = load_nested_proq_from_bundle(proq_file)
+    elif is_nested_proq:
+        nested_proq = load_nested_proq_from_file(proq_file, proq_cache=proq_cache)
+    else:
+        proq = ProQ.from_file(proq_file, proq_cache=proq_cache)
+        nested_proq = NestedContent[ProQ](title=proq.title, content=proq)
+
+    if per_proq and is_nested_proq:
+        output_dir = Path(os.path.splitext(output_file)[0])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        documents = [
+            (
+                NestedContent[ProQ].model_construct(title=proq.title, content=proq),
+                output_dir / f"{get_file_stem(i, proq.title)}.{format}",
+            )
+            for i, (_, _, proq) in enumerate(iter_proq_records(nested_proq), 1)
+        ]
+        output_name = output_dir
+    else:
+        documents = [(nested_proq, Path(output_file))]
+        output_name = output_file
+
+    exporter = HtmlExporter(
+        show_hidden_suffix=show_hidden_suffix,
+        hide_private_testcases=hide_private_testcases,
+        hide_template_diff=hide_template_diff,
+        fragment_cache=None if no_proq_cache else FragmentCache(),
+    )
+
+    if format == "json":
+        for document, path in documents:
+            # Single proqs are dumped without the nesting
+            if not is_nested_proq or per_proq:
+                document = document.content
+            path.write_text(document.model_dump_json(indent=2))
+    elif format == "ndjson":
+        for document, path in documents:
+            write_ndjson(document, path)
+    elif format == "bundle":
+        for document, path in documents:
+            write_bundle(document, path)
+    elif format == "html":
+        for document, path in documents:
+            exporter.dump(document, path)
+    elif format == "pdf":
+        with BrowserPool(browsers) as pool:
+            errors = pool.print_many(
+                [(exporter.render(document), path) for document, path in documents]
+            )
+        failed = 0
+        for (_, path), error in zip(documents, errors):
+            if error is not None:
+                print(f"Failed to print {path}: {error}")
+                failed += 1
+        if failed:
+            from proqtor.cli.cli import CliError
+
+            raise CliError(f"Failed to print {failed} of {len(documents)} documents.")
+
+    print(f"Proqs dumped to {output_name}")
@@ -0,0 +1,312 @@
+import codecs
+import io
+import math
+import re
+from abc import ABC, abstractmethod
+from functools import cached_property, lru_cache
+from typing import ClassVar, Literal, NamedTuple
+
+from pydantic import BaseModel, ConfigDict, field_validator, model_validator
+
+from .execute_utils import OutputCapture
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+TOKEN_PATTERN = re.compile(r"\s+|\S+")
+DEFAULT_COMPARATOR = "exact"
+# The number of expected outputs each comparator keeps prepared
+EXPECTED_OUTPUT_CACHE_SIZE = 1024
+
+
+def normalize_expected_output(expected_output: str) -> str:
+    """Returns the expected output in the form compared with the actual output."""
+    return expected_output.replace("\r", "").strip()
+
+
+def count_non_whitespace(text: str) -> int:
+    return sum(map(len, text.split()))
+
+
+class StreamingOutputMatcher(OutputCapture):
+    """Compares the output of a command with the expected output as it streams in.
+
+    The outputs match when they are equal after removing the leading and
+    trailing whitespace. Since the whitespace is the only part of the output
+    that the comparison discards, an output with more non-whitespace
+    characters than the expected output can never match. The command is
+    stopped as soon as that happens.
+
+    To bound the memory used, whitespace runs longer than the longest one in
+    the expected output are truncated to one character more than it. A run
+    that long can only be leading or trailing whitespace of a matching output,
+    and stays too long to match when it is in between, so the truncation
+    never changes the outcome of the comparison. The kept output is then at
+    most a small multiple of the size of the expected output and serves as
+    the excerpt for reporting.
+
+    Args:
+        expected_output (str): The expected output of the command, normalized
+            by `normalize_expected_output`, as prepared by the comparators.
+    """
+
+    def __init__(self, expected_output: str):
+        self.expected_output = expected_output
+        self.max_non_whitespace = count_non_whitespace(self.expected_output)
+        self.max_whitespace_run = 1 + max(
+            map(len, WHITESPACE_PATTERN.findall(self.expected_output)), default=0
+        )
+        self._long_run_pattern = re.compile(r"\s{%d,}" % (self.max_whitespace_run + 1))
+        self._decoders = {
+            stream: io.IncrementalNewlineDecoder(
+                codecs.getincrementaldecoder("utf-8")(errors="replace"),
+                translate=True,
+            )
+            for stream in ("stdout", "stderr")
+        }
+        self._texts = {"stdout": [], "stderr": []}
+        self._whitespace_runs = {"stdout": 0, "stderr": 0}
+        self.non_whitespace = 0
+        self.truncated = False
+        self.diverged = False
+        self._finished = False
+
+    def write(self, stream: Literal["stdout", "stderr"], chunk: bytes) -> bool:
+        self._add_text(stream, self._decoders[stream].decode(chunk))
+        return not self.diverged
+
+    def _add_text(self, stream: Literal["stdout", "stderr"], text: str):
+        if not text:
+            return
+        self.non_whitespace += count_non_whitespace(text)
+        if self.non_whitespace > self.max_non_whitespace:
+            self.diverged = True
+            self.truncated = True
+
+        run = self._whitespace_runs[stream]
+        leading_whitespace = len(text) - len(text.lstrip())
+        if (
+            run + leading_whitespace <= self.max_whitespace_run
+            and not self._long_run_pattern.search(text)
+        ):
+            # Fast path for chunks without long whitespace runs
+            self._texts[stream].append(text)
+            if leading_whitespace == len(text):
+                self._whitespace_runs[stream] = run + len(text)
+            else:
+                self._whitespace_runs[stream] = len(text) - len(text.rstrip())
+            return
+
+        parts = []
+        for match in TOKEN_PATTERN.finditer(text):
+            token = match.group()
+            if token[0].isspace():
+                allowed = max(0, self.max_whitespace_run - run)
+                if len(token) > allowed:
+                    self.truncated = True
+                parts.append(token[:allowed])
+                run += len(token)
+            else:
+                parts.append(token)
+                run = 0
+        self._texts[stream].append("".join(parts))
+        self._whitespace_runs[stream] = run
+
+    def getvalue(self) -> str:
+        """Returns the kept stderr followed by the kept stdout."""
+        if not self._finished:
+            self._finished = True
+            for stream, decoder in self._decoders.items():
+                self._add_text(stream, decoder.decode(b"", final=True))
+        return "".join(self._texts["stderr"] + self._texts["stdout"])
+
+
+class ExpectedOutput(NamedTuple):
+    """The forms of an expected output kept by a comparator.
+
+    The text is the expected output without carriage returns and surrounding
+    whitespace, which is reported in the results and compared while the
+    output streams in. The normalized form is the one the comparator matches.
+    """
+
+    text: str
+    normalized: str
+
+
+COMPARATORS: dict[str, type["Comparator"]] = {}
+
+
+def register_comparator(name: str):
+    """Registers the comparator class under the name used in the yaml header."""
+
+    def register(comparator_class):
+        comparator_class.name = name
+        COMPARATORS[name] = comparator_class
+        return comparator_class
+
+    return register
+
+
+class Comparator(ABC):
+    """Decides whether the actual output of a test case matches the expected one.
+
+    Both the outputs are normalized before they are compared. The most
+    recently used expected outputs are kept normalized, so evaluating the
+    same test cases again normalizes only the actual outputs. The comparators
+    whose normalized forms can match without being equal compare them in
+    `equivalent`.
+
+    The options of a comparator are converted to their types in `__init__`
+    and kept as the attributes of the same names.
+    """
+
+    name: ClassVar[str]
+    # Whether a matching output has the same non whitespace characters as the
+    # expected output, as required by the StreamingOutputMatcher
+    streaming: ClassVar[bool] = False
+
+    def __init__(self):
+        self.prepare = lru_cache(maxsize=EXPECTED_OUTPUT_CACHE_SIZE)(self.prepare)
+
+    @abstractmethod
+    def normalize(self, output: str) -> str:
+        """Returns the form of the output that is compared."""
+
+    def equivalent(self, actual: str, expected: str) -> bool:
+        """Returns whether the differing normalized outputs still match."""
+        return False
+
+    def prepare(self, expected_output: str) -> ExpectedOutput:
+        """Returns the expected output without carriage returns and normalized."""
+        text = normalize_expected_output(expected_output)
+        return ExpectedOutput(text, self.normalize(text))
+
+    def matches(self, actual_output: str, expected_output: str) -> bool:
+        expected = self.prepare(expected_output)
+        normalized = self.normalize(actual_output)
+        return normalized == expected.normalized or self.equivalent(
+            normalized, expected.normalized
+        )
+
+
+@register_comparator("exact")
+class ExactComparator(Comparator):
+    """Outputs equal apart from carriage returns and surrounding whitespace."""
+
+    streaming = True
+
+    def normalize(self, output: str) -> str:
+        return normalize_expected_output(output)
+
+
+@register_comparator("whitespace")
+class WhitespaceComparator(Comparator):
+    """Outputs with the same lines when the whitespace runs are collapsed."""
+
+    def normalize(self, output: str) -> str:
+        return "\n".join(
+            " ".join(line.split())
+            for line in normalize_expected_output(output).splitlines()
+        )
+
+
+@register_comparator("tokens")
+class TokenComparator(Comparator):
+    """Outputs with the same whitespace separated tokens, ignoring the lines."""
+
+    streaming = True
+
+    def normalize(self, output: str) -> str:
+        return " ".join(output.split())
+
+
+@register_comparator("float")
+class FloatComparator(TokenComparator):
+    """Outputs with the same tokens where the numbers match within a tolerance.
+
+    Args:
+        rel_tol (float): The relative tolerance of the numbers.
+        abs_tol (float): The absolute tolerance of the numbers.
+    """
+
+    # A number can match with more digits than the expected number
+    streaming = False
+
+    def __init__(self, rel_tol: float = 1e-9, abs_tol: float = 1e-6):
+        super().__init__()
+        # Yaml reads exponents without a dot, like 1e-6, as strings
+        self.rel_tol = float(rel_tol)
+        self.abs_tol = float(abs_tol)
+
+    def _tokens_match(self, actual: str, expected: str) -> bool:
+        if actual == expected:
+            return True
+        try:
+            actual_number, expected_number = float(actual), float(expected)
+        except ValueError:
+            return False
+        return math.isclose(
+            actual_number, expected_number, rel_tol=self.rel_tol, abs_tol=self.abs_tol
+        )
+
+    def equivalent(self, actual: str, expected: str) -> bool:
+        actual_tokens, expected_tokens = actual.split(), expected.split()
+        return len(actual_tokens) == len(expected_tokens) and all(
+            map(self._tokens_match, actual_tokens, expected_tokens)
+        )
+
+
+@register_comparator("unordered_lines")
+class UnorderedLinesComparator(Comparator):
+    """Outputs with the same non blank lines in any order."""
+
+    def normalize(self, output: str) -> str:
+        return "\n".join(
+            sorted(line.strip() for line in output.splitlines() if line.strip())
+        )
+
+
+class ComparatorConfig(BaseModel):
+    """The comparator of the test case outputs set in the yaml header.
+
+    Given either as the name of a registered comparator or as a mapping with
+    the `name` and the options of the comparator.
+    """
+
+    name: str = DEFAULT_COMPARATOR
+
+    model_config = ConfigDict(extra="allow")
+
+    @model_validator(mode="before")
+    @classmethod
+    def from_name(cls, data):
+        if isinstance(data, str):
+            return {"name": data}
+        return data
+
+    @field_validator("name")
+    @classmethod
+    def check_registered(cls, name: str) -> str:
+        if name not in COMPARATORS:
+            raise ValueError(
+                f"Unknown comparator {name!r}. The comparators are "
+                f"{', '.join(COMPARATORS)}."
+            )
+        return name
+
+    @model_validator(mode="after")
+    def check_options(self):
+        try:
+            comparator = self.create_comparator()
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid options of the {self.name} comparator: {e}")
+        # Keep the options converted by the comparator
+        for option in self.model_extra or {}:
+            self.model_extra[option] = getattr(comparator, option)
+        return self
+
+    def create_comparator(self) -> Comparator:
+        return COMPARATORS[self.name](**(self.model_extra or {}))
+
+    @cached_property
+    def instance(self) -> Comparator:
+        """The comparator shared by the evaluations, keeping the expected outputs."""
+        return self.create_comparator()
@@ -1,26 +1,34 @@
 import os
 import re
-import shutil
 import warnings
-from typing import Generic, Self, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Generic, Self, TypeVar
 
 import yaml
-from pydantic import BaseModel, ConfigDict, Field, field_validator
-from termcolor import colored, cprint
+from marko import Markdown
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
 
 import md2json
 
-from .core_components import Solution, TestCase
+from .archive_utils import write_test_cases
+from .cache_utils import BuildCache, ProqCache, ResultCache
+from .compare_utils import Comparator, ComparatorConfig
+from .core_components import ResourceLimits, Solution, TestCase
 from .evaluate_utils import (
     BuildFailedError,
     ProqCheck,
+    ProqEvaluation,
+    TestCaseResult,
+    TestCaseStatus,
     get_test_case_results,
-    print_solution_check_results,
-    print_template_check_results,
+    print_evaluation,
 )
-from .parse import extract_solution, extract_testcases
+from .execute_utils import CancelToken, JobScheduler
+from .fork_server_utils import ForkServerPool
+from .parse import extract_solution, extract_testcases, fold_blocks
 from .prog_langs import ProgLang
-from .template_utils import get_relative_env, package_env
+from .template_utils import package_env, render_relative
 
 PROBLEM_STATEMENT = "Problem Statement"
 PUBLIC_TEST_CASES = "Public Test Cases"
@@ -51,6 +59,14 @@ class ProQ(BaseModel):
     public_test_cases: list[TestCase] = Field(validation_alias=PUBLIC_TEST_CASES)
     private_test_cases: list[TestCase] = Field(validation_alias=PRIVATE_TEST_CASES)
     solution: Solution = Field(validation_alias=SOLUTION, description="The Solution")
+    limits: ResourceLimits = Field(
+        default_factory=ResourceLimits,
+        description="The time and resource limits of each test case run.",
+    )
+    comparator: ComparatorConfig = Field(
+        default_factory=ComparatorConfig,
+        description="The comparator matching the outputs with the expected outputs.",
+    )
 
     model_config = ConfigDict(
         validate_assignment=True, populate_by_name=True, extra="allow"
@@ -93,7 +109,16 @@ class ProQ(BaseModel):
         )
 
     @classmethod
-    def from_str(cls, content, base=None, render_template=False):
+    def from_str(cls, content, base=None, render_template=False, dependencies=None):
+        """Parses the proq from its markdown text.
+
+        Args:
+            content (str): The markdown text of the proq.
+            base (str): The directory the jinja includes are relative to.
+            render_template (bool): Whether to render the text as a jinja template.
+            dependencies (set[str]): The set to add the paths of the files
+                pulled in by the jinja template to.
+        """
         if base is None:
             base = os.curdir
         try:
@@ -112,11 +137,19 @@ class ProQ(BaseModel):
             )
 
         try:
-            env = get_relative_env(base)
-
+            if render_template:
+                md_string = render_relative(md_string, base, dependencies)
+            # The statement is sliced from the source text, while the code
+            # blocks are read from a single parse of the whole body
+            statements = {
+                section.heading.title(): section.body(md_string)
+                for section in md2json.get_sections(md_string).fold(1)
+            }
             proq = {
-                k.title(): env.from_string(v).render() if render_template else v
-                for k, v in md2json.fold_level(md_string, level=1).items()
+                str(heading).title(): blocks
+                for heading, blocks in fold_blocks(
+                    Markdown().parse(md_string).children, 1
+                )
             }
         except Exception as e:
             raise ProqParseError(
@@ -144,7 +177,7 @@ class ProQ(BaseModel):
                 content=content,
             )
 
-        proq[PROBLEM_STATEMENT] = proq[PROBLEM_STATEMENT].strip()
+        proq[PROBLEM_STATEMENT] = statements.get(PROBLEM_STATEMENT, "").strip()
         try:
             proq[SOLUTION] = extract_solution(proq[SOLUTION])
         except Exception as e:
@@ -155,10 +188,9 @@ class ProQ(BaseModel):
             )
 
         try:
-            proq[PUBLIC_TEST_CASES] = md2json.fold_level(
-                proq[PUBLIC_TEST_CASES], level=2, return_type="list"
+            proq[PUBLIC_TEST_CASES] = extract_testcases(
+                fold_blocks(proq[PUBLIC_TEST_CASES], 2)
             )
-            proq[PUBLIC_TEST_CASES] = extract_testcases(proq[PUBLIC_TEST_CASES])
         except Exception as e:
             raise ProqParseError(
                 message="Error occured while extracting public test cases"
@@ -167,13 +199,12 @@ class ProQ(BaseModel):
             )
 
         try:
-            proq[PRIVATE_TEST_CASES] = md2json.fold_level(
-                proq[PRIVATE_TEST_CASES], level=2, return_type="list"
+            proq[PRIVATE_TEST_CASES] = extract_testcases(
+                fold_blocks(proq[PRIVATE_TEST_CASES], 2)
             )
-            proq[PRIVATE_TEST_CASES] = extract_testcases(proq[PRIVATE_TEST_CASES])
         except Exception as e:
             raise ProqParseError(
-                message="Error occured while extracting public test cases"
+                message="Error occured while extracting private test cases"
                 f" - {e.__class__.__name__}: {e}",
                 content=content,
             )
@@ -182,15 +213,50 @@ class ProQ(BaseModel):
         return cls.model_validate(proq)
 
     @classmethod
-    def from_file(cls, proq_file, render_template=True):
-        """Loads the proq file and returns a Proq."""
+    def from_file(
+        cls,
+        proq_file,
+        render_template=True,
+        proq_cache: ProqCache | None = None,
+        dependencies: set[str] | None = None,
+    ):
+        """Loads the proq file and returns a Proq.
+
+        Args:
+            proq_file (str): The proq file.
+            render_template (bool): Whether to render the file as a jinja template.
+            proq_cache (ProqCache): The cache of parsed proqs. A hit skips the
+                rendering and the parsing of the file.
+            dependencies (set[str]): The set to add the paths of the files
+                pulled in by the jinja template to.
+        """
         if not os.path.isfile(proq_file):
             raise FileNotFoundError(f"File {proq_file} does not exists.")
         with open(proq_file) as f:
+            content = f.read()
+        base = os.path.dirname(os.path.abspath(proq_file))
+        if dependencies is None:
+            dependencies = set()
+        if proq_cache is None:
             return ProQ.from_str(
-                f.read(), os.path.dirname(proq_file), render_template=render_template
+                content,
+                base,
+                render_template=render_template,
+                dependencies=dependencies,
             )
 
+        key = proq_cache.key(content, base, render_template)
+        if (proq_json := proq_cache.load(key, dependencies)) is not None:
+            try:
+                return ProQ.model_validate_json(proq_json)
+            except ValidationError:
+                pass
+        proq = ProQ.from_str(
+            content, base, render_template=render_template, dependencies=dependencies
+        )
+        proq_cache.store(key, proq.model_dump_json(), dependencies)
+        return proq
+
     def to_str(self) -> str:
         return package_env.get_template("proq_template.md.jinja").render(proq=self)
 
@@ -198,7 +264,24 @@ class ProQ(BaseModel):
         with open(file_name, "w") as f:
             f.write(self.to_str())
 
-    def get_test_case_results(self, code, test_cases):
+    def get_test_case_results(
+        self,
+        code,
+        test_cases,
+        build_cache: BuildCache | None = None,
+        result_cache: ResultCache | None = None,
+        scheduler: JobScheduler | None = None,
+        cancel_token: CancelToken | None = None,
+        stop_when: Callable[[TestCaseResult], bool] | None = None,
+        limits: ResourceLimits | None = None,
+        fork_servers: ForkServerPool | None = None,
+        compare_streaming: bool = True,
+    ):
+        """Returns the results of running the code over the test cases.
+
+        The limits of the proq override the given default limits. The outputs
+        are matched by the comparator of the proq.
+        """
         execute_config = self.solution.execute_config
         return get_test_case_results(
             code,
@@ -206,103 +289,221 @@ class ProQ(BaseModel):
             execute_config.source_filename,
             execute_config.run,
             execute_config.build,
+            build_cache=build_cache,
+            result_cache=result_cache,
+            scheduler=scheduler,
+            cancel_token=cancel_token,
+            stop_when=stop_when,
+            limits=(limits or ResourceLimits()).merge(self.limits),
+            fork_servers=fork_servers,
+            batch=execute_config.batch,
+            compare_streaming=compare_streaming,
+            comparator=self.output_comparator,
+        )
+
+    @property
+    def output_comparator(self) -> Comparator:
+        """The comparator of the proq, which keeps the normalized expected outputs."""
+        return self.comparator.instance
+
+    @property
+    def has_sol_tag(self) -> bool:
+        return bool(
+            re.match(r".*<sol>.*</sol>.*", self.solution.tagged_template, re.DOTALL)
         )
 
-    def evaluate(self, verbose=False, diff_mode=False) -> ProqCheck:
-        n_public = len(self.public_testcases)
+    def check(
+        self,
+        build_cache: BuildCache | None = None,
+        result_cache: ResultCache | None = None,
+        scheduler: JobScheduler | None = None,
+        concurrent_checks: bool = False,
+        fail_fast: bool = False,
+        limits: ResourceLimits | None = None,
+        fork_servers: ForkServerPool | None = None,
+    ) -> ProqEvaluation:
+        """Evaluates the solution and the template without printing the results.
+
+        The template check is considered only if the solution passes all the
+        test cases.
+
+        Args:
+            build_cache (BuildCache): The cache of build artifacts.
+            result_cache (ResultCache): The cache of test case outputs.
+            scheduler (JobScheduler): The scheduler to run the jobs on.
+            concurrent_checks (bool): Whether to build and run the template
+                alongside the solution instead of after the solution passes.
+                The jobs of both the checks share the scheduler.
+            fail_fast (bool): Whether to cancel the remaining test cases once
+                the outcome is decided, i.e. when a solution test case fails or
+                when a template test case passes. The cancelled test cases are
+                reported with the cancelled status.
+            limits (ResourceLimits): The default limits of each test case run,
+                overridden by the limits of the proq and the test cases.
+            fork_servers (ForkServerPool): The fork servers to run python
+                solutions on instead of a fresh interpreter per test case.
+        """
+        test_cases = self.public_test_cases + self.private_test_cases
+        solution_token = CancelToken() if fail_fast else None
+        template_token = CancelToken(parent=solution_token) if fail_fast else None
+
+        def get_results(code, cancel_token, stop_when):
+            return self.get_test_case_results(
+                code,
+                test_cases,
+                build_cache=build_cache,
+                result_cache=result_cache,
+                scheduler=scheduler,
+                cancel_token=cancel_token,
+                stop_when=stop_when if fail_fast else None,
+                limits=limits,
+                fork_servers=fork_servers,
+            )
+
+        def get_solution_results():
+            try:
+                return get_results(
+                    self.solution.solution_code,
+                    solution_token,
+                    lambda result: not result.passed,
+                )
+            except BuildFailedError:
+                if solution_token is not None:
+                    solution_token.cancel()
+                raise
+
+        get_template_results = partial(
+            get_results,
+            self.solution.template_code,
+            template_token,
+            lambda result: result.passed,
+        )
+
+        if concurrent_checks and self.has_sol_tag:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                template_results = executor.submit(get_template_results)
+                return self._get_evaluation(
+                    get_solution_results, template_results.result
+                )
+
+        return self._get_evaluation(get_solution_results, get_template_results)
 
-        if verbose:
-            print("Title:", colored(self.title, "cyan", attrs=["bold"]))
+    def _get_evaluation(self, get_solution_results, get_template_results):
+        evaluation = ProqEvaluation(
+            title=self.title,
+            n_public=len(self.public_test_cases),
+            proq_check=ProqCheck(solution_check=False, template_check=False),
+        )
 
         # Test solution with public and private test cases
         try:
-            test_case_results = self.get_test_case_results(
-                self.solution.solution_code,
-                self.public_test_cases + self.private_test_cases,
-            )
+            test_case_results = get_solution_results()
         except BuildFailedError as e:
-            if verbose:
-                cprint("Build Failed", color="red", attrs=["bold"])
-                cprint(e.command_output, color="red")
-            return ProqCheck(solution_check=False, template_check=False)
-
-        if verbose:
-            print_solution_check_results(
-                test_case_results[:n_public],
-                test_case_results[n_public:],
-                diff_mode=diff_mode,
-            )
+            return evaluation._replace(solution_build_output=e.command_output)
 
+        evaluation = evaluation._replace(solution_results=test_case_results)
         if not all(map(lambda x: x.passed, test_case_results)):
-            return ProqCheck(solution_check=False, template_check=False)
-
-        if not re.match(r".*<sol>.*</sol>.*", self.solution.tagged_template, re.DOTALL):
-            print(
-                colored("Template Check:", attrs=["bold"]),
-                colored(
-                    "failed - No sol tag present in the template. "
-                    "Atleast one sol tag must be present in the template.",
-                    color="red",
-                ),
-            )
-            return ProqCheck(solution_check=True, template_check=False)
+            return evaluation
+
+        evaluation = evaluation._replace(
+            proq_check=ProqCheck(solution_check=True, template_check=False)
+        )
+        if not self.has_sol_tag:
+            return evaluation._replace(sol_tag_missing=True)
+
         # Test template with public and private test cases
         try:
-            template_test_case_results = self.get_test_case_results(
-                self.solution.template_code,
-                self.public_test_cases + self.private_test_cases,
+            template_test_case_results = get_template_results()
+        except BuildFailedError as e:
+            return evaluation._replace(
+                proq_check=ProqCheck(solution_check=True, template_check=True),
+                template_build_output=e.command_output,
             )
-        except BuildFailedError:
-            if verbose:
-                print(
-                    colored("Template Check:", attrs=["bold"]),
-                    colored("passed - build failed", color="green"),
-                )
-            return ProqCheck(solution_check=True, template_check=True)
 
         template_passed = any(result.passed for result in template_test_case_results)
-        proq_check = ProqCheck(solution_check=True, template_check=not template_passed)
-
-        if verbose:
-            print_template_check_results(
-                template_test_case_results[:n_public],
-                template_test_case_results[n_public:],
-                proq_check.template_check,
-            )
-
-        return proq_check
+        return evaluation._replace(
+            proq_check=ProqCheck(
+                solution_check=True, template_check=not template_passed
+            ),
+            template_results=template_test_case_results,
+        )
 
-    def correct_outputs(self, inplace=False) -> Self:
+    def evaluate(
+        self,
+        verbose=False,
+        diff_mode=False,
+        build_cache: BuildCache | None = None,
+        result_cache: ResultCache | None = None,
+        scheduler: JobScheduler | None = None,
+        concurrent_checks: bool = False,
+        fail_fast: bool = False,
+        limits: ResourceLimits | None = None,
+        fork_servers: ForkServerPool | None = None,
+    ) -> ProqCheck:
+        evaluation = self.check(
+            build_cache=build_cache,
+            result_cache=result_cache,
+            scheduler=scheduler,
+            concurrent_checks=concurrent_checks,
+            fail_fast=fail_fast,
+            limits=limits,
+            fork_servers=fork_servers,
+        )
+        print_evaluation(evaluation, verbose=verbose, diff_mode=diff_mode)
+        return evaluation.proq_check
+
+    def correct_outputs(
+        self,
+        inplace=False,
+        build_cache: BuildCache | None = None,
+        scheduler: JobScheduler | None = None,
+        limits: ResourceLimits | None = None,
+        fork_servers: ForkServerPool | None = None,
+    ) -> Self:
+        """Sets the test case outputs to the outputs of the solution.
+
+        The outputs of the test cases whose run did not complete, e.g. due to
+        the time limit, are left unchanged.
+        """
         if not inplace:
             proq = self.model_copy(deep=True)
         else:
             proq = self
         test_cases = proq.public_test_cases + proq.private_test_cases
         test_case_results = self.get_test_case_results(
-            self.solution.solution_code, test_cases
+            self.solution.solution_code,
+            test_cases,
+            build_cache=build_cache,
+            scheduler=scheduler,
+            limits=limits,
+            fork_servers=fork_servers,
+            # The complete outputs are needed to correct the test cases
+            compare_streaming=False,
         )
-        for test_case, test_case_result in zip(test_cases, test_case_results):
+        for i, (test_case, test_case_result) in enumerate(
+            zip(test_cases, test_case_results), 1
+        ):
+            if test_case_result.status not in (
+                TestCaseStatus.PASSED,
+                TestCaseStatus.FAILED,
+            ):
+                warnings.warn(
+                    f"Output of test case {i} of {self.title} is not corrected "
+                    f"- {test_case_result.status}"
+                )
+                continue
             test_case.output = test_case_result.actual_output
         return proq
 
     def export_test_cases(self, output_dir, zip=False):
-        if output_dir.exists():
-            shutil.rmtree(output_dir)
-        output_dir.mkdir()
-        for test_case_set, set_name in [
-            (self.public_test_cases, "public"),
-            (self.private_test_cases, "private"),
-        ]:
-            curr_folder = output_dir / set_name
-            (curr_folder).mkdir()
-            for i, test_case in enumerate(test_case_set, 1):
-                with open(curr_folder / f"input_{i:03}.txt", "w") as f:
-                    f.write(test_case.input)
-                with open(curr_folder / f"output_{i:03}.txt", "w") as f:
-                    f.write(test_case.output)
+        """Writes the test cases to a folder or, with zip, to `{output_dir}.zip`.
+
+        The zip archive is written directly without creating the folder.
+        """
         if zip:
-            shutil.make_archive(output_dir, "zip", output_dir)
-            shutil.rmtree(output_dir)
+            write_test_cases(self, f"{output_dir}.zip", "zip")
+        else:
+            write_test_cases(self, output_dir)
 
 
 DataT = TypeVar("DataT")
@@ -313,23 +514,73 @@ class NestedContent(BaseModel, Generic[DataT]):
     content: list["NestedContent[DataT]"] | DataT
 
 
-def load_nested_proq_from_file(yaml_file) -> NestedContent[ProQ]:
-    """Loads a nested content structure with proqs at leaf nodes."""
+class NestedProqLoadError(Exception):
+    """Raised when proqs of a proq set config file fail to load.
+
+    Args:
+        errors (list[tuple[str, Exception]]): The proq files that failed to
+            load along with their errors.
+    """
+
+    def __init__(self, errors: list[tuple[str, Exception]]):
+        self.errors = errors
+        many = len(errors) > 1
+        super().__init__(
+            f"{len(errors)} proq{'s' if many else ''} failed to load:\n"
+            + "\n".join(
+                f"{proq_file}: {getattr(error, 'message', error)}"
+                for proq_file, error in errors
+            )
+        )
+
+
+def load_nested_proq_from_file(
+    yaml_file, proq_cache: ProqCache | None = None, max_workers: int | None = None
+) -> NestedContent[ProQ]:
+    """Loads a nested content structure with proqs at leaf nodes.
+
+    The proq files are loaded concurrently and every proq file is loaded
+    once. The errors of all the proq files that fail to load are raised
+    together as a NestedProqLoadError.
+
+    Args:
+        yaml_file (str): The proq set config file.
+        proq_cache (ProqCache): The cache of parsed proqs.
+        max_workers (int): The maximum number of proq files loaded at once.
+    """
     with open(yaml_file) as f:
-        nested_proq_files = NestedContent[str | ProQ].model_validate(yaml.safe_load(f))
+        nested_proq_files = NestedContent[str].model_validate(yaml.safe_load(f))
+    base = os.path.dirname(os.path.abspath(yaml_file))
 
-    def load_nested_proq_files(nested_proq_files: NestedContent[str]):
-        """Loads the nested Proqs inplace recursively."""
+    def get_proq_files(nested_proq_files: NestedContent[str]):
         if isinstance(nested_proq_files.content, str):
-            nested_proq_files.content = ProQ.from_file(
-                os.path.join(
-                    os.path.dirname(os.path.abspath(yaml_file)),
-                    nested_proq_files.content,
-                )
-            )
+            yield os.path.join(base, nested_proq_files.content)
         else:
             for content in nested_proq_files.content:
-                load_nested_proq_files(content)
+                yield from get_proq_files(content)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            proq_file: executor.submit(ProQ.from_file, proq_file, proq_cache=proq_cache)
+            for proq_file in dict.fromkeys(get_proq_files(nested_proq_files))
+        }
+    proqs, errors = {}, []
+    for proq_file, future in futures.items():
+        try:
+            proqs[proq_file] = future.result()
+        except Exception as e:
+            errors.append((proq_file, e))
+    if errors:
+        raise NestedProqLoadError(errors)
+
+    def build_nested_proq(nested_proq_files: NestedContent[str]):
+        """Builds the typed tree from the validated parts without validating again."""
+        if isinstance(nested_proq_files.content, str):
+            content = proqs[os.path.join(base, nested_proq_files.content)]
+        else:
+            content = [build_nested_proq(item) for item in nested_proq_files.content]
+        return NestedContent[ProQ].model_construct(
+            title=nested_proq_files.title, content=content
+        )
 
-    load_nested_proq_files(nested_proq_files)
-    return NestedContent[ProQ].model_validate(nested_proq_files.model_dump())
+    return build_nested_proq(nested_proq_files)
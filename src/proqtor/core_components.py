@@ -10,7 +10,6 @@ from .prog_langs import ProgLang
 from .template_utils import package_env
 
 lang_default_files = files("proqtor.templates.lang_defaults")
-solution_template = package_env.get_template("solution.md.jinja")
 
 
 def get_lang_default_code_block(lang):
@@ -22,15 +21,41 @@ def get_lang_default_code_block(lang):
     return lang_default_files.joinpath(f"{lang}.md").read_text("utf-8")
 
 
+class ResourceLimits(BaseModel):
+    """Limits applied to each run of a test case.
+
+    Unset limits are not enforced. The CPU time, memory and output limits are
+    applied as resource limits of the process on platforms supporting them.
+    """
+
+    time: float | None = Field(default=None, description="Wall-clock seconds")
+    cpu_time: float | None = Field(default=None, description="CPU seconds")
+    memory: int | None = Field(default=None, description="Address space in MB")
+    output: int | None = Field(default=None, description="Output size in KB")
+
+    def merge(self, limits: "ResourceLimits | None") -> "ResourceLimits":
+        """Returns the limits overridden by the limits set in the given limits."""
+        if limits is None:
+            return self
+        return self.model_copy(update=limits.model_dump(exclude_none=True))
+
+
 class TestCase(BaseModel):
     input: str
     output: str
+    time_limit: float | None = Field(
+        default=None, description="Wall-clock seconds overriding the proq limits"
+    )
 
 
 class ExecuteConfig(BaseModel):
     source_filename: str | None = ""
     build: str | None = ""
     run: str | None = ""
+    batch: bool = Field(
+        default=False,
+        description="Whether to run all the test cases in a single process",
+    )
 
 
 class Solution(BaseModel):
@@ -109,4 +134,4 @@ class Solution(BaseModel):
 
     @property
     def code_block(self):
-        return solution_template.render(solution=self)
+        return package_env.get_template("solution.md.jinja").render(solution=self)
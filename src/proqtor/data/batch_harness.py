@@ -0,0 +1,163 @@
+"""A harness that runs a python script once for each test case in one process.
+
+Usage: python batch_harness.py CAPTURE_DIR SCRIPT [ARGS...]
+
+For each json request line read from stdin, the script is run as `__main__`
+with the file `CAPTURE_DIR/stdin` as its stdin and with its stdout and stderr
+written to `CAPTURE_DIR/stdout` and `CAPTURE_DIR/stderr`. A json line with the
+exit code of the run is written to stdout once the run is over. The optional
+`cpu_time` of a request limits the CPU seconds of the run.
+
+The module state is reset between the runs: every run gets a fresh `__main__`
+module, the modules imported by a run are unloaded, and the working
+directory, `sys.argv` and `sys.path` are restored.
+
+This script runs on the interpreter of the proq and must only use the
+standard library.
+"""
+
+import atexit
+import builtins
+import json
+import math
+import os
+import sys
+import threading
+import types
+from importlib.machinery import SourceFileLoader
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def compile_script(path):
+    try:
+        with open(path, "rb") as f:
+            return compile(f.read(), path, "exec")
+    except (OSError, SyntaxError) as e:
+        return e
+
+
+def redirect_stdio(capture_dir, encoding, errors):
+    for fd, name, flags in (
+        (0, "stdin", os.O_RDONLY),
+        (1, "stdout", os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+        (2, "stderr", os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+    ):
+        file_fd = os.open(os.path.join(capture_dir, name), flags, 0o644)
+        os.dup2(file_fd, fd)
+        os.close(file_fd)
+    sys.stdin = open(0, "r", encoding=encoding, errors=errors, closefd=False)
+    sys.stdout = open(1, "w", encoding=encoding, errors=errors, closefd=False)
+    sys.stderr = open(
+        2, "w", buffering=1, encoding=encoding, errors="backslashreplace", closefd=False
+    )
+
+
+def set_cpu_time_limit(cpu_time):
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if cpu_time is None:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime + cpu_time)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def run_script(path, code):
+    """Runs the compiled script as `__main__` and returns the exit code."""
+    main = types.ModuleType("__main__")
+    main.__file__ = path
+    main.__cached__ = None
+    main.__builtins__ = builtins
+    main.__loader__ = SourceFileLoader("__main__", path)
+    sys.modules["__main__"] = main
+    if isinstance(code, OSError):
+        print(
+            f"{sys.executable}: can't open file {path!r}: "
+            f"[Errno {code.errno}] {code.strerror}",
+            file=sys.stderr,
+        )
+        return 2
+    if isinstance(code, SyntaxError):
+        code.__traceback__ = None
+        sys.excepthook(type(code), code, None)
+        return 1
+    try:
+        exec(code, vars(main))
+    except SystemExit as e:
+        return get_exit_code(e)
+    except BaseException as e:
+        # Hide the frame of this function from the traceback
+        e.__traceback__ = e.__traceback__.tb_next
+        sys.excepthook(type(e), e, e.__traceback__)
+        return 1
+    return 0
+
+
+def get_exit_code(e: SystemExit):
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print(e.code, file=sys.stderr)
+    return 1
+
+
+def finish_run(exit_code):
+    """Runs the steps of the interpreter exit that are visible to the script."""
+    for thread in threading.enumerate():
+        if thread is not threading.main_thread() and not thread.daemon:
+            thread.join()
+    atexit._run_exitfuncs()
+    atexit._clear()
+    try:
+        sys.stdout.flush()
+    except Exception:
+        exit_code = 120
+    try:
+        sys.stderr.flush()
+    except Exception:
+        pass
+    return exit_code & 0xFF
+
+
+def main():
+    capture_dir, *argv = sys.argv[1:]
+    requests = os.fdopen(os.dup(0), "rb")
+    responses = os.fdopen(os.dup(1), "wb")
+    encoding, errors = sys.stdout.encoding, sys.stdout.errors
+
+    path = os.path.abspath(argv[0])
+    cwd = os.getcwd()
+    sys_path = [os.path.dirname(path)] + sys.path[1:]
+    recursion_limit = sys.getrecursionlimit()
+    code = compile_script(path)
+    modules = set(sys.modules)
+
+    for request in requests:
+        request = json.loads(request)
+        sys.argv = list(argv)
+        sys.path[:] = sys_path
+        redirect_stdio(capture_dir, encoding, errors)
+        set_cpu_time_limit(request.get("cpu_time"))
+        exit_code = finish_run(run_script(path, code))
+        set_cpu_time_limit(None)
+
+        # Reset the state left behind by the run
+        for name in set(sys.modules) - modules:
+            del sys.modules[name]
+        os.chdir(cwd)
+        sys.setrecursionlimit(recursion_limit)
+        responses.write(json.dumps({"exit_code": exit_code}).encode() + b"\n")
+        responses.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Prepares the process and executes a command in its place.
+
+Usage: python exec_wrapper.py [OPTIONS] -- COMMAND [ARGS...]
+
+Each `--rlimit RESOURCE=SOFT,HARD` option sets a resource limit and each
+`--fd TARGET=SOURCE` option duplicates the inherited file descriptor SOURCE
+to TARGET. The wrapper replaces a `preexec_fn`, which is
+not safe to use from a process with threads, at the cost of starting an
+interpreter.
+
+This script runs on the interpreter of proqtor with `-I -S` before every
+test case run with resource limits, so it must only use the standard library
+and imports as little as possible.
+"""
+
+import os
+import sys
+
+# The first file descriptor above the targets used by proqtor
+FIRST_FREE_FD = 5
+
+
+def parse_args(args):
+    rlimits, fds = [], []
+    while args and args[0] != "--":
+        option, value, args = args[0], args[1], args[2:]
+        if option == "--rlimit":
+            rlimit, limits = value.split("=")
+            rlimits.append((int(rlimit), tuple(map(int, limits.split(",")))))
+        elif option == "--fd":
+            target, source = map(int, value.split("="))
+            fds.append((target, source))
+        else:
+            raise ValueError(f"Unknown option {option}")
+    return rlimits, fds, args[1:]
+
+
+def place_fds(fds):
+    import fcntl
+
+    # Move the sources above the targets first so that placing one of them
+    # never overwrites another
+    moved = [
+        (target, fcntl.fcntl(source, fcntl.F_DUPFD, FIRST_FREE_FD))
+        for target, source in fds
+    ]
+    for target, source in moved:
+        os.dup2(source, target)
+    for _, source in moved:
+        os.close(source)
+    targets = {target for target, _ in fds}
+    for _, source in fds:
+        if source not in targets:
+            os.close(source)
+
+
+def main():
+    rlimits, fds, command = parse_args(sys.argv[1:])
+    if fds:
+        place_fds(fds)
+    if rlimits:
+        import resource
+
+        for rlimit, limits in rlimits:
+            resource.setrlimit(rlimit, limits)
+    try:
+        os.execvp(command[0], command)
+    except OSError as e:
+        print(f"{command[0]}: {e.strerror}", file=sys.stderr)
+        sys.exit(127)
+
+
+if __name__ == "__main__":
+    main()
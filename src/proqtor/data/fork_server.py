@@ -0,0 +1,195 @@
+"""A fork server that runs python scripts in forks of a warm interpreter.
+
+Usage: python fork_server.py LISTENER_FD LIFELINE_FD
+
+The server accepts run requests on the inherited unix socket and exits when
+the write end of the inherited lifeline pipe is closed by the client. A request is a
+json line with the script arguments, the working directory and the resource
+limits, sent along with the stdin, stdout and stderr file descriptors of the
+run. For each request the server forks a supervisor which starts a new
+session, forks the runner and reports the pid of the session followed by the
+exit code of the runner. The runner executes the script as `__main__` the way
+`python script.py` would.
+
+This script runs on the interpreter of the proq and must only use the
+standard library.
+"""
+
+import atexit
+import builtins
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import types
+from importlib.machinery import SourceFileLoader
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Side effect free modules commonly imported by solutions
+PRELOAD = (
+    "bisect",
+    "collections",
+    "copy",
+    "dataclasses",
+    "datetime",
+    "decimal",
+    "fractions",
+    "functools",
+    "heapq",
+    "itertools",
+    "math",
+    "operator",
+    "re",
+    "string",
+    "typing",
+)
+MAX_REQUEST_SIZE = 64 * 1024
+
+
+def receive_request(connection):
+    message, fds, _, _ = socket.recv_fds(connection, MAX_REQUEST_SIZE, 3)
+    while not message.endswith(b"\n"):
+        chunk = connection.recv(MAX_REQUEST_SIZE)
+        if not chunk:
+            break
+        message += chunk
+    if len(fds) != 3:
+        for fd in fds:
+            os.close(fd)
+        raise ValueError("Expected the stdin, stdout and stderr descriptors.")
+    return json.loads(message), fds
+
+
+def serve(listener, lifeline):
+    """Serves the run requests and returns the request in the forked runner."""
+    # Supervisors are reaped automatically
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    while True:
+        readable, _, _ = select.select([listener, lifeline], [], [])
+        if lifeline in readable:
+            # The client exited
+            os._exit(0)
+        connection, _ = listener.accept()
+        try:
+            request, fds = receive_request(connection)
+        except (OSError, ValueError):
+            connection.close()
+            continue
+        if os.fork() == 0:
+            listener.close()
+            os.close(lifeline)
+            return supervise(connection, request, fds)
+        connection.close()
+        for fd in fds:
+            os.close(fd)
+
+
+def supervise(connection, request, fds):
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    # The client kills the run by killing the process group of the session
+    os.setsid()
+    pid = os.fork()
+    if pid == 0:
+        connection.close()
+        for target_fd, fd in enumerate(fds):
+            os.dup2(fd, target_fd)
+            os.close(fd)
+        return request
+    for fd in fds:
+        os.close(fd)
+    try:
+        connection.sendall(b"%d\n" % os.getpid())
+        _, status = os.waitpid(pid, 0)
+        connection.sendall(b"%d\n" % os.waitstatus_to_exitcode(status))
+    except OSError:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+    os._exit(0)
+
+
+def run_script(request):
+    """Runs the script like `python script.py` and returns the exit code."""
+    for rlimit, limits in request["rlimits"]:
+        resource.setrlimit(rlimit, tuple(limits))
+    os.chdir(request["cwd"])
+    sys.argv = request["argv"]
+    path = os.path.abspath(sys.argv[0])
+    sys.path[0] = os.path.dirname(path)
+    main = types.ModuleType("__main__")
+    main.__file__ = path
+    main.__cached__ = None
+    main.__builtins__ = builtins
+    main.__loader__ = SourceFileLoader("__main__", path)
+    sys.modules["__main__"] = main
+    try:
+        with open(path, "rb") as f:
+            code = compile(f.read(), path, "exec")
+    except OSError as e:
+        print(
+            f"{sys.executable}: can't open file {path!r}: "
+            f"[Errno {e.errno}] {e.strerror}",
+            file=sys.stderr,
+        )
+        return 2
+    except SyntaxError as e:
+        e.__traceback__ = None
+        sys.excepthook(type(e), e, None)
+        return 1
+    try:
+        exec(code, vars(main))
+    except SystemExit as e:
+        return get_exit_code(e)
+    except BaseException as e:
+        # Hide the frame of this function from the traceback
+        e.__traceback__ = e.__traceback__.tb_next
+        sys.excepthook(type(e), e, e.__traceback__)
+        return 1
+    return 0
+
+
+def get_exit_code(e: SystemExit):
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print(e.code, file=sys.stderr)
+    return 1
+
+
+def shutdown(exit_code):
+    """Runs the steps of the interpreter exit that are visible to the script.
+
+    The rest of the interpreter finalization, which is most of the cost of a
+    short run, is skipped.
+    """
+    if "threading" in sys.modules:
+        sys.modules["threading"]._shutdown()
+    atexit._run_exitfuncs()
+    try:
+        sys.stdout.flush()
+    except Exception:
+        exit_code = 120
+    try:
+        sys.stderr.flush()
+    except Exception:
+        pass
+    os._exit(exit_code & 0xFF)
+
+
+if __name__ == "__main__":
+    for module_name in PRELOAD:
+        try:
+            __import__(module_name)
+        except ImportError:
+            pass
+    request = serve(socket.socket(fileno=int(sys.argv[1])), int(sys.argv[2]))
+    # Only the runner reaches here, with the stack of the server unwound
+    shutdown(run_script(request))
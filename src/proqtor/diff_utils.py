@@ -0,0 +1,283 @@
+from collections.abc import Iterator
+from typing import NamedTuple
+
+from termcolor import cprint
+
+DIFF_CONTEXT = 3
+MAX_HUNKS = 5
+MAX_HUNK_LINES = 50
+MAX_EDITS = 200
+MAX_LINE_LENGTH = 200
+
+LINE_COLORS = {"-": "red", "+": "green", "@": "cyan", "note": "yellow"}
+
+
+class DiffHunk(NamedTuple):
+    """The lines around a change, each with the tag ` `, `-` or `+`."""
+
+    old_start: int
+    old_count: int
+    new_start: int
+    new_count: int
+    lines: list[tuple[str, str]]
+    omitted_lines: int = 0
+
+
+class OutputDiff(NamedTuple):
+    """A bounded line diff of an expected output and an actual output.
+
+    The line numbers of the hunks and the first mismatch are 1-based. The diff
+    is incomplete when the outputs differ in more lines than the edit limit,
+    in which case its only hunk shows the first difference.
+    """
+
+    n_old: int
+    n_new: int
+    first_mismatch: int | None
+    hunks: list[DiffHunk]
+    omitted_hunks: int = 0
+    complete: bool = True
+
+
+def get_edit_script(a: list[str], b: list[str], max_edits: int):
+    """Returns the tags of a shortest edit script turning `a` into `b`.
+
+    Uses the O((N+M)D) algorithm of Myers, stopping with None once more than
+    `max_edits` lines would have to be deleted or inserted, so that the time
+    stays linear in the size of the outputs for a bounded number of edits.
+    """
+    n, m = len(a), len(b)
+    max_d = min(n + m, max_edits)
+    offset = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace = []
+    for d in range(max_d + 1):
+        trace.append(v[offset - d - 1 : offset + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return backtrack(trace, n, m)
+    return None
+
+
+def backtrack(trace: list[list[int]], x: int, y: int) -> list[str]:
+    tags = []
+    for d in range(len(trace) - 1, -1, -1):
+        # trace[d] holds the furthest x of the diagonals -d-1 to d+1
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1 + d + 1] < v[k + 1 + d + 1]):
+            previous_k = k + 1
+        else:
+            previous_k = k - 1
+        previous_x = v[previous_k + d + 1] if d > 0 else 0
+        previous_y = previous_x - previous_k if d > 0 else 0
+        while x > previous_x and y > previous_y:
+            tags.append(" ")
+            x -= 1
+            y -= 1
+        if d > 0:
+            tags.append("+" if x == previous_x else "-")
+        x, y = previous_x, previous_y
+    tags.reverse()
+    return tags
+
+
+def get_changes(tags: list[str], offset: int) -> list[tuple[int, int, int, int]]:
+    """Returns the changed ranges `(i1, i2, j1, j2)` of the edit script."""
+    changes = []
+    i = j = offset
+    for tag in tags:
+        if tag == " ":
+            i += 1
+            j += 1
+            continue
+        if changes and changes[-1][1] == i and changes[-1][3] == j:
+            i1, _, j1, _ = changes.pop()
+        else:
+            i1, j1 = i, j
+        if tag == "-":
+            i += 1
+        else:
+            j += 1
+        changes.append((i1, i, j1, j))
+    return changes
+
+
+def make_hunk(
+    old_lines: list[str],
+    new_lines: list[str],
+    changes: list[tuple[int, int, int, int]],
+    context: int,
+    max_hunk_lines: int,
+) -> DiffHunk:
+    i1, _, j1, _ = changes[0]
+    _, i2, _, j2 = changes[-1]
+    start_i = max(0, i1 - context)
+    start_j = j1 - (i1 - start_i)
+    end_i = min(len(old_lines), i2 + context)
+    end_j = j2 + (end_i - i2)
+    lines = [(" ", line) for line in old_lines[start_i:i1]]
+    for n, (i1, i2, j1, j2) in enumerate(changes):
+        if n:
+            lines.extend((" ", line) for line in old_lines[changes[n - 1][1] : i1])
+        lines.extend(("-", line) for line in old_lines[i1:i2])
+        lines.extend(("+", line) for line in new_lines[j1:j2])
+    lines.extend((" ", line) for line in old_lines[i2:end_i])
+    return DiffHunk(
+        start_i + 1,
+        end_i - start_i,
+        start_j + 1,
+        end_j - start_j,
+        lines[:max_hunk_lines],
+        max(0, len(lines) - max_hunk_lines),
+    )
+
+
+def make_first_difference_hunk(
+    old_lines: list[str],
+    new_lines: list[str],
+    start: int,
+    context: int,
+    max_hunk_lines: int,
+) -> DiffHunk:
+    """Returns a hunk with the first lines of both outputs from the mismatch."""
+    n_shown = max(1, (max_hunk_lines - context) // 2)
+    old_shown = old_lines[start : start + n_shown]
+    new_shown = new_lines[start : start + n_shown]
+    context_start = max(0, start - context)
+    return DiffHunk(
+        context_start + 1,
+        start - context_start + len(old_shown),
+        context_start + 1,
+        start - context_start + len(new_shown),
+        [(" ", line) for line in old_lines[context_start:start]]
+        + [("-", line) for line in old_shown]
+        + [("+", line) for line in new_shown],
+        len(old_lines) + len(new_lines) - 2 * start - len(old_shown) - len(new_shown),
+    )
+
+
+def get_output_diff(
+    expected_output: str,
+    actual_output: str,
+    context: int = DIFF_CONTEXT,
+    max_hunks: int = MAX_HUNKS,
+    max_hunk_lines: int = MAX_HUNK_LINES,
+    max_edits: int = MAX_EDITS,
+) -> OutputDiff:
+    """Returns a bounded line diff of the expected and the actual outputs.
+
+    The common leading and trailing lines are skipped first, which finds the
+    first mismatch in linear time, and the remaining lines are diffed with a
+    bounded number of edits. When the outputs differ in more lines than that,
+    only the first difference is shown.
+
+    Args:
+        expected_output (str): The expected output.
+        actual_output (str): The actual output.
+        context (int): The number of unchanged lines shown around each change.
+        max_hunks (int): The maximum number of hunks shown.
+        max_hunk_lines (int): The maximum number of lines shown of a hunk.
+        max_edits (int): The maximum number of deleted and inserted lines
+            of a complete diff.
+
+    Returns:
+        diff (OutputDiff): The diff of the outputs.
+    """
+    old_lines = expected_output.strip().splitlines()
+    new_lines = actual_output.strip().splitlines()
+    n_old, n_new = len(old_lines), len(new_lines)
+    prefix = 0
+    while prefix < min(n_old, n_new) and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    if prefix == n_old == n_new:
+        return OutputDiff(n_old, n_new, None, [])
+    suffix = 0
+    while (
+        suffix < min(n_old, n_new) - prefix
+        and old_lines[n_old - suffix - 1] == new_lines[n_new - suffix - 1]
+    ):
+        suffix += 1
+
+    tags = get_edit_script(
+        old_lines[prefix : n_old - suffix],
+        new_lines[prefix : n_new - suffix],
+        max_edits,
+    )
+    if tags is None:
+        hunk = make_first_difference_hunk(
+            old_lines[: n_old - suffix],
+            new_lines[: n_new - suffix],
+            prefix,
+            context,
+            max_hunk_lines,
+        )
+        return OutputDiff(n_old, n_new, prefix + 1, [hunk], complete=False)
+
+    groups = []
+    for change in get_changes(tags, prefix):
+        if groups and change[0] - groups[-1][-1][1] <= 2 * context:
+            groups[-1].append(change)
+        else:
+            groups.append([change])
+    hunks = [
+        make_hunk(old_lines, new_lines, changes, context, max_hunk_lines)
+        for changes in groups[:max_hunks]
+    ]
+    return OutputDiff(
+        n_old, n_new, prefix + 1, hunks, omitted_hunks=max(0, len(groups) - max_hunks)
+    )
+
+
+def shorten(line: str, max_length: int = MAX_LINE_LENGTH) -> str:
+    if len(line) <= max_length:
+        return line
+    return f"{line[:max_length]}... ({len(line) - max_length} more characters)"
+
+
+def iter_diff_lines(diff: OutputDiff) -> Iterator[tuple[str, str]]:
+    """Yields the kind and the text of the lines of the diff.
+
+    The hunks are in the unified diff format, where the kind of a line is
+    `@` for a hunk header, ` `, `-` or `+` for a line of the outputs and
+    `note` for the omitted lines and the summary.
+    """
+    for hunk in diff.hunks:
+        yield (
+            "@",
+            f"@@ -{hunk.old_start},{hunk.old_count} "
+            f"+{hunk.new_start},{hunk.new_count} @@",
+        )
+        for tag, line in hunk.lines:
+            yield tag, tag + shorten(line)
+        if hunk.omitted_lines:
+            yield "note", f"... {hunk.omitted_lines} more lines not shown"
+    if diff.omitted_hunks:
+        yield "note", f"... {diff.omitted_hunks} more hunks not shown"
+    summary = f"Expected {diff.n_old} lines, actual {diff.n_new} lines"
+    if diff.first_mismatch is None:
+        yield "note", summary + ", the lines are the same."
+        return
+    yield "note", summary + f", first difference at line {diff.first_mismatch}."
+    if not diff.complete:
+        yield "note", "The outputs differ in too many lines to show all the changes."
+
+
+def format_output_diff(diff: OutputDiff) -> str:
+    """Returns the diff as plain text, to include in reports."""
+    return "\n".join(text for _, text in iter_diff_lines(diff))
+
+
+def print_output_diff(expected_output: str, actual_output: str):
+    """Prints a bounded colored diff of the expected and the actual outputs."""
+    for kind, text in iter_diff_lines(get_output_diff(expected_output, actual_output)):
+        cprint(text, LINE_COLORS.get(kind))
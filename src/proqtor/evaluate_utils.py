@@ -1,41 +1,242 @@
-import os
+import warnings
 from collections import namedtuple
+from concurrent.futures import CancelledError
+from enum import StrEnum
+from functools import partial
 from pathlib import Path
 from tempfile import TemporaryDirectory
-from typing import Literal
+from typing import Callable, Literal
 
 from termcolor import colored, cprint
 
-from .core_components import TestCase
-from .execute_utils import CommandFailedError, get_command_output, get_outputs
-from .utils import color_diff
+from .batch_utils import BatchRunner
+from .cache_utils import BuildCache, ResultCache
+from .compare_utils import Comparator, ExactComparator, StreamingOutputMatcher
+from .core_components import ResourceLimits, TestCase
+from .diff_utils import print_output_diff
+from .execute_utils import (
+    CancelToken,
+    CommandCancelledError,
+    CommandFailedError,
+    CommandTimeoutError,
+    JobScheduler,
+    OutputDivergedError,
+    OutputLimitExceededError,
+    get_command_output,
+    get_default_scheduler,
+)
+from .fork_server_utils import ForkServerPool
 
 ProqCheck = namedtuple("ProqCheck", ["solution_check", "template_check"])
 
+
+class TestCaseStatus(StrEnum):
+    PASSED = "passed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    TIMED_OUT = "timed out"
+    OUTPUT_LIMIT_EXCEEDED = "output limit exceeded"
+    # Failed with only an excerpt of the output kept
+    DIVERGED = "output diverged"
+
+
 TestCaseResult = namedtuple(
-    "TestCaseResult", ["input", "expected_output", "actual_output", "passed"]
+    "TestCaseResult",
+    ["input", "expected_output", "actual_output", "passed", "cached", "status"],
+    defaults=[False, None],
+)
+
+ProqEvaluation = namedtuple(
+    "ProqEvaluation",
+    [
+        "title",
+        "n_public",
+        "proq_check",
+        "solution_results",
+        "template_results",
+        "solution_build_output",
+        "template_build_output",
+        "sol_tag_missing",
+    ],
+    defaults=[None, None, None, None, False],
 )
+ProqEvaluation.__doc__ = """The outcome of evaluating a proq.
+
+The test case results are None for the checks that were not run and the
+build outputs are set only when the respective build failed.
+"""
 
 
 class BuildFailedError(CommandFailedError):
     pass
 
 
+def get_test_case_result(
+    test_case: TestCase,
+    actual_output: str,
+    cached: bool = False,
+    comparator: Comparator | None = None,
+) -> TestCaseResult:
+    comparator = comparator or ExactComparator()
+    actual_output = actual_output.replace("\r", "")
+    passed = comparator.matches(actual_output, test_case.output)
+    return TestCaseResult(
+        test_case.input,
+        comparator.prepare(test_case.output).text,
+        actual_output,
+        passed,
+        cached,
+        TestCaseStatus.PASSED if passed else TestCaseStatus.FAILED,
+    )
+
+
+def get_unfinished_result(
+    test_case: TestCase,
+    status: TestCaseStatus,
+    actual_output: str = "",
+    comparator: Comparator | None = None,
+) -> TestCaseResult:
+    """Returns the result of a test case whose run did not complete."""
+    comparator = comparator or ExactComparator()
+    return TestCaseResult(
+        test_case.input,
+        comparator.prepare(test_case.output).text,
+        actual_output,
+        False,
+        False,
+        status,
+    )
+
+
+def get_cancelled_result(
+    test_case: TestCase, comparator: Comparator | None = None
+) -> TestCaseResult:
+    return get_unfinished_result(
+        test_case, TestCaseStatus.CANCELLED, comparator=comparator
+    )
+
+
 def check_test_cases(
     run_command: str,
     test_cases: list[TestCase],
+    cwd=None,
+    scheduler: JobScheduler | None = None,
+    cancel_token: CancelToken | None = None,
+    stop_when: Callable[[TestCaseResult], bool] | None = None,
+    limits: ResourceLimits | None = None,
+    fork_servers: ForkServerPool | None = None,
+    batch: bool = False,
+    compare_streaming: bool = True,
+    comparator: Comparator | None = None,
 ):
-    actual_outputs = get_outputs(
-        run_command, [test_case.input for test_case in test_cases]
+    """Runs the test cases on the scheduler and returns the results in order.
+
+    Once a result satisfies `stop_when`, the cancel token is cancelled so that
+    the queued test cases are dropped and the running ones are killed. Those
+    test cases are reported with the cancelled status.
+
+    The time limit of a test case overrides the time limit in the limits.
+    Python scripts are run on the fork servers when given. In batch mode all
+    the test cases are run one after another in a single job by a
+    `BatchRunner`.
+
+    With `compare_streaming` the output is compared with the expected output
+    while it is read. A run is stopped as soon as its output can no longer
+    match and only a bounded excerpt of a failing output is kept. Such
+    results have the diverged status. The outputs are compared while they are
+    read only for the comparators supporting it.
+
+    The outputs are matched by the comparator, the exact comparator by default.
+    """
+    limits = limits or ResourceLimits()
+    comparator = comparator or ExactComparator()
+    compare_streaming = compare_streaming and comparator.streaming
+    run = (
+        get_command_output if fork_servers is None else fork_servers.get_command_output
     )
-    results = []
-    for actual_output, testcase in zip(actual_outputs, test_cases):
-        actual_output = actual_output.replace("\r", "")
-        expected_output = testcase.output.replace("\r", "")
-        passed = actual_output.strip() == expected_output.strip()
-        results.append(
-            TestCaseResult(testcase.input, expected_output, actual_output, passed)
+    scheduler = scheduler or get_default_scheduler()
+    if stop_when is not None and cancel_token is None:
+        cancel_token = CancelToken()
+
+    def check_test_case(test_case, run=run):
+        test_case_limits = limits
+        if test_case.time_limit is not None:
+            test_case_limits = limits.model_copy(update={"time": test_case.time_limit})
+        capture = None
+        if compare_streaming:
+            capture = StreamingOutputMatcher(comparator.prepare(test_case.output).text)
+        try:
+            actual_output = run(
+                run_command,
+                test_case.input,
+                cwd=cwd,
+                cancel_token=cancel_token,
+                limits=test_case_limits,
+                capture=capture,
+            )
+        except CommandCancelledError:
+            return get_cancelled_result(test_case, comparator)
+        except CommandTimeoutError as e:
+            result = get_unfinished_result(
+                test_case, TestCaseStatus.TIMED_OUT, e.command_output, comparator
+            )
+        except OutputLimitExceededError as e:
+            result = get_unfinished_result(
+                test_case,
+                TestCaseStatus.OUTPUT_LIMIT_EXCEEDED,
+                e.command_output,
+                comparator,
+            )
+        except OutputDivergedError as e:
+            result = get_unfinished_result(
+                test_case, TestCaseStatus.DIVERGED, e.command_output, comparator
+            )
+        else:
+            result = get_test_case_result(
+                test_case, actual_output, comparator=comparator
+            )
+            if not result.passed and capture is not None and capture.truncated:
+                result = result._replace(status=TestCaseStatus.DIVERGED)
+        if stop_when is not None and stop_when(result):
+            cancel_token.cancel()
+        return result
+
+    if batch and not BatchRunner.supports(run_command):
+        warnings.warn(
+            f"Batch mode is not supported for {run_command!r}. "
+            "Running the test cases separately."
         )
+        batch = False
+    if batch:
+
+        def check_batch():
+            with BatchRunner(run_command, cwd, limits) as runner:
+                return [
+                    check_test_case(test_case, runner.get_command_output)
+                    for test_case in test_cases
+                ]
+
+        future = scheduler.submit(check_batch)
+        if cancel_token is not None:
+            cancel_token.add_future(future)
+        try:
+            return future.result()
+        except CancelledError:
+            return [
+                get_cancelled_result(test_case, comparator) for test_case in test_cases
+            ]
+
+    futures = [scheduler.submit(check_test_case, test_case) for test_case in test_cases]
+    if cancel_token is not None:
+        for future in futures:
+            cancel_token.add_future(future)
+
+    results = []
+    for test_case, future in zip(test_cases, futures):
+        try:
+            results.append(future.result())
+        except CancelledError:
+            results.append(get_cancelled_result(test_case, comparator))
     return results
 
 
@@ -45,15 +246,54 @@ def get_test_case_results(
     source_filename,
     run_command,
     build_command=None,
+    build_cache: BuildCache | None = None,
+    result_cache: ResultCache | None = None,
+    scheduler: JobScheduler | None = None,
+    cancel_token: CancelToken | None = None,
+    stop_when: Callable[[TestCaseResult], bool] | None = None,
+    limits: ResourceLimits | None = None,
+    fork_servers: ForkServerPool | None = None,
+    batch: bool = False,
+    compare_streaming: bool = True,
+    comparator: Comparator | None = None,
 ) -> list[TestCaseResult]:
     """Returns the test case results after evaluating the test cases.
 
+    The code is built and run in a private temporary workspace that is passed
+    to the commands as their working directory. The process wide state such as
+    the current directory is never modified, so the function can be called
+    concurrently from multiple threads.
+
     Args:
         code (str): The full code to execute.
         test_cases (list[TestCase]): The list of test cases.
         source_filename (str): The file name of the file to run.
         run_command (str): The command to run the code.
         build_command (str): The build command to build or compile the code.
+        build_cache (BuildCache): The cache to restore the build artifacts from.
+            The build is skipped on a cache hit.
+        result_cache (ResultCache): The cache of outputs from previous runs.
+            Only the test cases without a cached output are executed and the
+            build is skipped if all of them are cached.
+        scheduler (JobScheduler): The scheduler to run the build and the
+            test cases on. Defaults to the process wide scheduler.
+        cancel_token (CancelToken): The token to cancel the pending test cases.
+        stop_when (Callable[[TestCaseResult], bool]): The condition on a result
+            that decides the outcome. The remaining test cases are cancelled
+            once a result satisfies it.
+        limits (ResourceLimits): The time and resource limits of each test case
+            run. A run exceeding the time or output limit is reported with the
+            timed out or output limit exceeded status.
+        fork_servers (ForkServerPool): The fork servers to run python scripts
+            on instead of starting a fresh interpreter for each test case.
+        batch (bool): Whether to run all the test cases of a python script in
+            a single harness process.
+        compare_streaming (bool): Whether to compare the outputs while they
+            are read, stopping the runs whose output can no longer match and
+            keeping only an excerpt of the failing outputs. Disable it to get
+            the complete outputs.
+        comparator (Comparator): The comparator matching the actual outputs
+            with the expected outputs. Defaults to the exact comparator.
 
     Returns:
         results (list[TestCaseResult]): The list of test case results.
@@ -61,18 +301,129 @@ def get_test_case_results(
     Raises:
         BuildFailedError:  if the build process fails.
     """
-    curdir = os.path.abspath(os.curdir)
+    comparator = comparator or ExactComparator()
+    run = partial(
+        run_test_cases,
+        code,
+        source_filename=source_filename,
+        run_command=run_command,
+        build_command=build_command,
+        build_cache=build_cache,
+        scheduler=scheduler,
+        cancel_token=cancel_token,
+        stop_when=stop_when,
+        limits=limits,
+        fork_servers=fork_servers,
+        batch=batch,
+        compare_streaming=compare_streaming,
+        comparator=comparator,
+    )
+    if result_cache is None:
+        return run(test_cases)
+
+    key = result_cache.key(code, source_filename, run_command, build_command, limits)
+    cached_outputs = result_cache.load(key)
+    input_keys = [
+        result_cache.input_key(test_case.input, test_case.time_limit)
+        for test_case in test_cases
+    ]
+    cached_results = {
+        input_key: get_test_case_result(
+            test_case, cached_outputs[input_key], True, comparator
+        )
+        for test_case, input_key in zip(test_cases, input_keys)
+        if input_key in cached_outputs
+    }
+    missing = [
+        test_case
+        for test_case, input_key in zip(test_cases, input_keys)
+        if input_key not in cached_results
+    ]
+    if stop_when is not None and any(map(stop_when, cached_results.values())):
+        # The outcome is already decided by the cached results
+        fresh_results = (
+            get_cancelled_result(test_case, comparator) for test_case in missing
+        )
+    else:
+        fresh_results = iter(run(missing) if missing else [])
+
+    results, fresh_outputs = [], {}
+    for test_case, input_key in zip(test_cases, input_keys):
+        if input_key in cached_results:
+            results.append(cached_results[input_key])
+        else:
+            result = next(fresh_results)
+            # Only completed runs are reusable
+            if result.status in (TestCaseStatus.PASSED, TestCaseStatus.FAILED):
+                fresh_outputs[input_key] = result.actual_output
+            results.append(result)
+    result_cache.update(key, fresh_outputs)
+    return results
+
+
+def run_test_cases(
+    code,
+    test_cases,
+    source_filename,
+    run_command,
+    build_command=None,
+    build_cache: BuildCache | None = None,
+    scheduler: JobScheduler | None = None,
+    cancel_token: CancelToken | None = None,
+    stop_when: Callable[[TestCaseResult], bool] | None = None,
+    limits: ResourceLimits | None = None,
+    fork_servers: ForkServerPool | None = None,
+    batch: bool = False,
+    compare_streaming: bool = True,
+    comparator: Comparator | None = None,
+) -> list[TestCaseResult]:
+    """Builds the code in a temporary directory and runs the test cases."""
+    scheduler = scheduler or get_default_scheduler()
     with TemporaryDirectory() as tempdirname:
-        os.chdir(tempdirname)
-        try:
-            Path(source_filename).write_text(code)
-            if build_command:
-                get_command_output(build_command, raise_on_fail=True)
-            return check_test_cases(run_command, test_cases)
-        except CommandFailedError as e:
-            raise BuildFailedError(e.command_output)
-        finally:
-            os.chdir(curdir)
+        Path(tempdirname, source_filename).write_text(code)
+        if build_command:
+            try:
+                if build_cache is None:
+                    build(build_command, tempdirname, scheduler, cancel_token)
+                else:
+                    key = build_cache.key(code, source_filename, build_command)
+                    if not build_cache.restore(key, tempdirname):
+                        build(build_command, tempdirname, scheduler, cancel_token)
+                        build_cache.store(key, tempdirname, source_filename)
+            except CommandFailedError as e:
+                raise BuildFailedError(e.command_output)
+            except (CommandCancelledError, CancelledError):
+                return [
+                    get_cancelled_result(test_case, comparator)
+                    for test_case in test_cases
+                ]
+        return check_test_cases(
+            run_command,
+            test_cases,
+            tempdirname,
+            scheduler,
+            cancel_token,
+            stop_when,
+            limits,
+            fork_servers,
+            batch,
+            compare_streaming,
+            comparator,
+        )
+
+
+def build(build_command, cwd, scheduler: JobScheduler, cancel_token=None):
+    """Runs the build command as a job on the scheduler."""
+    future = scheduler.submit(
+        get_command_output,
+        build_command,
+        raise_on_fail=True,
+        cwd=cwd,
+        cancel_token=cancel_token,
+    )
+    if cancel_token is not None:
+        cancel_token.add_future(future)
+    return future.result()
 
 
 def print_failed_test_cases(
@@ -83,25 +434,53 @@ def print_failed_test_cases(
     test_case_type = test_case_type.title()
     cprint(f"{test_case_type} Test Cases:", attrs=["bold"])
     for i, result in enumerate(test_case_results, 1):
-        if not result.passed:
-            cprint(f"{test_case_type} Test Case {i}: Failed", "red", attrs=["bold"])
+        if is_failed(result):
+            status = (
+                "Failed"
+                if result.status in (None, TestCaseStatus.FAILED)
+                else f"Failed - {result.status.capitalize()}"
+            )
+            cprint(
+                f"{test_case_type} Test Case {i}: {status}"
+                + (" (cached)" if result.cached else ""),
+                "red",
+                attrs=["bold"],
+            )
             cprint("Input:", "cyan", attrs=["bold"])
             print(result.input.strip())
             if not diff_mode:
                 cprint("Expected Output:", "cyan", attrs=["bold"])
                 print(result.expected_output)
-                cprint("Actual Output:", "cyan", attrs=["bold"])
+                cprint(
+                    "Actual Output"
+                    + (" (excerpt)" if result.status == TestCaseStatus.DIVERGED else "")
+                    + ":",
+                    "cyan",
+                    attrs=["bold"],
+                )
                 print(result.actual_output or "{{NO OUPUT}}")
             else:
                 cprint("Expected - Actual Diff:", "cyan", attrs=["bold"])
-                color_diff(result.expected_output, result.actual_output)
+                print_output_diff(result.expected_output, result.actual_output)
                 print()
 
 
+def is_failed(result: TestCaseResult):
+    return not result.passed and result.status != TestCaseStatus.CANCELLED
+
+
 def count_passed(results: list[TestCaseResult]):
     return sum(map(lambda x: x.passed, results))
 
 
+def count_cached(results: list[TestCaseResult]):
+    return sum(map(lambda x: x.cached, results))
+
+
+def count_cancelled(results: list[TestCaseResult]):
+    return sum(map(lambda x: x.status == TestCaseStatus.CANCELLED, results))
+
+
 def get_passed(results: list[TestCaseResult]):
     return [i for i, result in enumerate(results, 1) if result.passed]
 
@@ -113,13 +492,13 @@ def print_solution_check_results(
     n_private = len(private_test_cases)
     public_passed = count_passed(public_test_cases)
     private_passed = count_passed(private_test_cases)
-    if public_passed < n_public:
+    if any(map(is_failed, public_test_cases)):
         print_failed_test_cases(
             public_test_cases,
             test_case_type="public",
             diff_mode=diff_mode,
         )
-    if private_passed < n_private:
+    if any(map(is_failed, private_test_cases)):
         print_failed_test_cases(
             private_test_cases,
             test_case_type="private",
@@ -134,7 +513,21 @@ def print_solution_check_results(
     cprint(
         f"{private_passed}/{n_private} private test cases passed",
         "red" if private_passed < n_private else "green",
+        end="",
     )
+    print_result_notes(public_test_cases + private_test_cases)
+
+
+def print_result_notes(test_case_results: list[TestCaseResult]):
+    """Prints the number of cached and cancelled results and ends the line."""
+    n_results = len(test_case_results)
+    n_cached = count_cached(test_case_results)
+    if n_cached:
+        cprint(f"\t({n_cached}/{n_results} from cache)", "grey", end="")
+    n_cancelled = count_cancelled(test_case_results)
+    if n_cancelled:
+        cprint(f"\t({n_cancelled}/{n_results} cancelled)", "yellow", end="")
+    print()
 
 
 def print_template_check_results(public_test_cases, private_test_cases, template_check):
@@ -146,19 +539,70 @@ def print_template_check_results(public_test_cases, private_test_cases, template
     print(
         colored("Template check: ", attrs=["bold"]),
         status,
-        end=" | " if not template_check else "\n",
+        end=" | " if not template_check else "",
     )
     if not template_check:
         passed_test_cases = ",".join(map(str, get_passed(public_test_cases)))
         if passed_test_cases:
             cprint(
-                "public testcase: " f"{passed_test_cases} " "passed",
+                f"public testcase: {passed_test_cases} passed",
                 "red",
                 end="\t",
             )
         passed_test_cases = ",".join(map(str, get_passed(private_test_cases)))
         if passed_test_cases:
             cprint(
-                "private testcase: " f"{passed_test_cases} " "passed",
+                f"private testcase: {passed_test_cases} passed",
                 "red",
+                end="",
+            )
+    print_result_notes(public_test_cases + private_test_cases)
+
+
+def print_evaluation(evaluation: ProqEvaluation, verbose=False, diff_mode=False):
+    """Prints the outcome of the evaluation of a proq."""
+    if verbose:
+        print("Title:", colored(evaluation.title, "cyan", attrs=["bold"]))
+
+    if evaluation.solution_build_output is not None:
+        if verbose:
+            cprint("Build Failed", color="red", attrs=["bold"])
+            cprint(evaluation.solution_build_output, color="red")
+        return
+
+    n_public = evaluation.n_public
+    if verbose:
+        print_solution_check_results(
+            evaluation.solution_results[:n_public],
+            evaluation.solution_results[n_public:],
+            diff_mode=diff_mode,
+        )
+
+    if not evaluation.proq_check.solution_check:
+        return
+
+    if evaluation.sol_tag_missing:
+        print(
+            colored("Template Check:", attrs=["bold"]),
+            colored(
+                "failed - No sol tag present in the template. "
+                "Atleast one sol tag must be present in the template.",
+                color="red",
+            ),
+        )
+        return
+
+    if evaluation.template_build_output is not None:
+        if verbose:
+            print(
+                colored("Template Check:", attrs=["bold"]),
+                colored("passed - build failed", color="green"),
             )
+        return
+
+    if verbose:
+        print_template_check_results(
+            evaluation.template_results[:n_public],
+            evaluation.template_results[n_public:],
+            evaluation.proq_check.template_check,
+        )
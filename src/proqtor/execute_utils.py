@@ -1,6 +1,22 @@
+import os
+import signal
 import subprocess
-from concurrent.futures import ThreadPoolExecutor
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from importlib.resources import files
 from itertools import repeat
+from typing import Literal
+
+from .core_components import ResourceLimits
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+READ_CHUNK_SIZE = 64 * 1024
+EXEC_WRAPPER_SCRIPT = str(files("proqtor.data").joinpath("exec_wrapper.py"))
 
 
 class CommandFailedError(Exception):
@@ -15,36 +31,398 @@ class CommandFailedError(Exception):
         self.command_output = command_output
 
 
-def get_command_output(command: str, stdin: str = "", raise_on_fail: bool = False):
+class CommandTimeoutError(CommandFailedError):
+    """Raised when a command exceeds its wall-clock or CPU time limit."""
+
+
+class OutputLimitExceededError(CommandFailedError):
+    """Raised when a command writes more than its output limit."""
+
+
+class OutputDivergedError(CommandFailedError):
+    """Raised when the output capture stops a command as its output diverged."""
+
+
+class CommandCancelledError(Exception):
+    """Raised when a command is cancelled before or while running."""
+
+
+class CancelToken:
+    """Cancels the jobs and kills the processes registered with it.
+
+    Cancelling a token also cancels the tokens created with it as the parent.
+    """
+
+    def __init__(self, parent: "CancelToken | None" = None):
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._futures: list[Future] = []
+        self._processes: set[subprocess.Popen] = set()
+        self._children: list[CancelToken] = []
+        if parent is not None:
+            parent._add_child(self)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def _add_child(self, child: "CancelToken"):
+        with self._lock:
+            self._children.append(child)
+            cancelled = self._cancelled
+        if cancelled:
+            child.cancel()
+
+    def add_future(self, future: Future) -> Future:
+        """Cancels the future if it is still queued when the token is cancelled."""
+        with self._lock:
+            self._futures.append(future)
+            cancelled = self._cancelled
+        if cancelled:
+            future.cancel()
+        return future
+
+    def add_process(self, process: subprocess.Popen):
+        """Kills the process if it is running when the token is cancelled."""
+        with self._lock:
+            if not self._cancelled:
+                self._processes.add(process)
+                return
+        kill_process(process)
+
+    def remove_process(self, process: subprocess.Popen):
+        with self._lock:
+            self._processes.discard(process)
+
+    def cancel(self):
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            futures, processes = self._futures, self._processes
+            self._futures, self._processes = [], set()
+        for future in futures:
+            future.cancel()
+        for process in processes:
+            kill_process(process)
+        for child in self._children:
+            child.cancel()
+
+
+class JobScheduler:
+    """A bounded pool of workers that runs the commands of all evaluations.
+
+    Sharing one scheduler across evaluations caps the number of concurrently
+    running subprocesses at `max_jobs` irrespective of the number of proqs
+    or test cases being evaluated.
+
+    Args:
+        max_jobs (int): The maximum number of concurrent jobs.
+            Defaults to the number of CPUs.
+    """
+
+    def __init__(self, max_jobs: int | None = None):
+        self.max_jobs = max_jobs or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_jobs, thread_name_prefix="proq-job"
+        )
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def map(self, fn, *iterables) -> list:
+        return list(self.executor.map(fn, *iterables))
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_default_scheduler() -> JobScheduler:
+    """Returns the process wide scheduler used when none is given."""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = JobScheduler()
+        return _default_scheduler
+
+
+def kill_process(process: subprocess.Popen):
+    """Kills the process along with the processes it started."""
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def get_rlimits(limits: ResourceLimits | None) -> list[tuple[int, tuple[int, int]]]:
+    """Returns the resource limits and their soft and hard values to be set."""
+    if resource is None or limits is None:
+        return []
+    rlimits = []
+    if limits.cpu_time is not None:
+        cpu_time = max(1, int(limits.cpu_time + 0.999))
+        rlimits.append((resource.RLIMIT_CPU, (cpu_time, cpu_time + 1)))
+    if limits.memory is not None:
+        memory = limits.memory * 1024 * 1024
+        rlimits.append((resource.RLIMIT_AS, (memory, memory)))
+    if limits.output is not None:
+        output = limits.output * 1024
+        rlimits.append((resource.RLIMIT_FSIZE, (output, output)))
+    return rlimits
+
+
+def wrap_command(
+    args: list[str],
+    rlimits: list[tuple[int, tuple[int, int]]] | None = None,
+    fds: dict[int, int] | None = None,
+) -> list[str]:
+    """Returns the command that sets the rlimits and the fds before running args.
+
+    The command runs through the exec wrapper, which prepares the process and
+    executes the args in its place. It is used instead of a `preexec_fn`,
+    which can deadlock the child of a process with threads.
+
+    Args:
+        args (list[str]): The command to run.
+        rlimits (list): The resource limits and their soft and hard values.
+        fds (dict[int, int]): The inherited file descriptors to duplicate,
+            by their target file descriptors. The sources must be passed to
+            the process with `pass_fds`.
+    """
+    if not rlimits and not fds:
+        return args
+    options = []
+    for rlimit, (soft, hard) in rlimits or []:
+        options += ["--rlimit", f"{rlimit}={soft},{hard}"]
+    for target, source in (fds or {}).items():
+        options += ["--fd", f"{target}={source}"]
+    return [sys.executable, "-I", "-S", EXEC_WRAPPER_SCRIPT, *options, "--", *args]
+
+
+class OutputCapture:
+    """Collects the stdout and stderr of a command as they are read.
+
+    Subclasses can inspect the output while it streams in and stop the
+    command by returning False from `write`.
+    """
+
+    def __init__(self):
+        self._chunks = {"stdout": [], "stderr": []}
+
+    def write(self, stream: Literal["stdout", "stderr"], chunk: bytes) -> bool:
+        """Adds a chunk read from the stream.
+
+        Returns:
+            keep_running (bool): whether the command should keep running.
+        """
+        self._chunks[stream].append(chunk)
+        return True
+
+    def getvalue(self) -> str:
+        """Returns the decoded stderr followed by the decoded stdout."""
+        return decode_output(b"".join(self._chunks["stderr"])) + decode_output(
+            b"".join(self._chunks["stdout"])
+        )
+
+
+def communicate(
+    process: subprocess.Popen,
+    stdin: bytes,
+    timeout: float | None = None,
+    max_output: int | None = None,
+    capture: OutputCapture | None = None,
+) -> OutputCapture:
+    """Writes the stdin and reads the stdout and stderr of the process.
+
+    The output is passed to the capture chunk by chunk as it is read. The
+    process is killed when it runs longer than timeout seconds, writes more
+    than max_output bytes to stdout and stderr combined or when the capture
+    asks to stop it.
+
+    Raises:
+        subprocess.TimeoutExpired: if the process exceeds the timeout.
+        OutputLimitExceededError: if the process exceeds the output limit.
+        OutputDivergedError: if the capture stopped the process.
+    """
+    capture = capture or OutputCapture()
+    streams = {process.stdout: "stdout", process.stderr: "stderr"}
+    output_size = 0
+    output_exceeded = output_diverged = False
+    lock = threading.Lock()
+
+    def write_stdin():
+        try:
+            process.stdin.write(stdin)
+            process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+    def read_output(stream):
+        nonlocal output_size, output_exceeded, output_diverged
+        while chunk := stream.read1(READ_CHUNK_SIZE):
+            with lock:
+                if output_exceeded or output_diverged:
+                    break
+                output_size += len(chunk)
+                if max_output is not None and output_size > max_output:
+                    output_exceeded = True
+                    kill_process(process)
+                    break
+                if not capture.write(streams[stream], chunk):
+                    output_diverged = True
+                    kill_process(process)
+                    break
+        stream.close()
+
+    threads = [threading.Thread(target=write_stdin, daemon=True)] + [
+        threading.Thread(target=read_output, args=(stream,), daemon=True)
+        for stream in streams
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        kill_process(process)
+        process.wait()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+    if output_exceeded:
+        raise OutputLimitExceededError(command_output=capture.getvalue())
+    if output_diverged:
+        raise OutputDivergedError(command_output=capture.getvalue())
+    return capture
+
+
+def decode_output(output: bytes) -> str:
+    """Decodes the output with universal newlines like text mode pipes."""
+    return output.decode(errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def get_command_output(
+    command: str,
+    stdin: str = "",
+    raise_on_fail: bool = False,
+    cwd: str | os.PathLike | None = None,
+    cancel_token: CancelToken | None = None,
+    limits: ResourceLimits | None = None,
+    capture: OutputCapture | None = None,
+):
     """Runs the given command and returns the output.
 
     Args:
         command (str):  build  to run in a subprocess
         stdin (str): the contents of the stdin passed
         raise_on_fail (bool): whether to raise an exception on non zero return status.
+        cwd (str|PathLike): the working directory to run the command in.
+        cancel_token (CancelToken): the token that kills the process when cancelled.
+        limits (ResourceLimits): the time and resource limits of the process.
+        capture (OutputCapture): the capture the output is streamed into.
 
     Return:
         output (str):  The output of build command
 
     Raises:
         BuildFailedError: if build process returns a non-zero
+        CommandTimeoutError: if the process exceeds the time or CPU time limit.
+        OutputLimitExceededError: if the process exceeds the output limit.
+        OutputDivergedError: if the capture stopped the process.
+        CommandCancelledError: if the token is cancelled before the command exits.
     """
-    result = subprocess.run(
-        command.split(),
-        input=stdin,
+    if cancel_token is not None and cancel_token.cancelled:
+        raise CommandCancelledError(command)
+    limits = limits or ResourceLimits()
+    process = subprocess.Popen(
+        wrap_command(command.split(), get_rlimits(limits)),
+        stdin=subprocess.PIPE,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        text=True,
+        cwd=cwd,
+        # A new session lets the whole process group be killed
+        start_new_session=os.name == "posix",
+    )
+    return get_process_output(
+        process, command, stdin, raise_on_fail, cancel_token, limits, capture
     )
-    output = result.stderr + result.stdout
-    if raise_on_fail and result.returncode != 0:
+
+
+def get_process_output(
+    process,
+    command: str,
+    stdin: str = "",
+    raise_on_fail: bool = False,
+    cancel_token: CancelToken | None = None,
+    limits: ResourceLimits | None = None,
+    capture: OutputCapture | None = None,
+):
+    """Feeds the stdin to a started process and returns its output.
+
+    The process can be any object with the interface of `subprocess.Popen`
+    used by `communicate`, such as the processes of a fork server. The
+    arguments and exceptions are the same as of `get_command_output`.
+    """
+    limits = limits or ResourceLimits()
+    if cancel_token is not None:
+        cancel_token.add_process(process)
+    try:
+        capture = communicate(
+            process,
+            stdin.encode(),
+            timeout=limits.time,
+            max_output=limits.output * 1024 if limits.output is not None else None,
+            capture=capture,
+        )
+    except subprocess.TimeoutExpired:
+        raise CommandTimeoutError(
+            command_output=f"Time limit of {limits.time} seconds exceeded."
+        )
+    finally:
+        if cancel_token is not None:
+            cancel_token.remove_process(process)
+    if cancel_token is not None and cancel_token.cancelled:
+        raise CommandCancelledError(command)
+    output = capture.getvalue()
+    if resource is not None and process.returncode == -signal.SIGXCPU:
+        raise CommandTimeoutError(
+            command_output=output
+            + f"CPU time limit of {limits.cpu_time} seconds exceeded."
+        )
+    if resource is not None and process.returncode == -signal.SIGXFSZ:
+        raise OutputLimitExceededError(command_output=output)
+    if raise_on_fail and process.returncode != 0:
         raise CommandFailedError(command_output=output)
     return output
 
 
-def get_outputs(command, stdins: list[str], raise_on_fail: bool = False):
+def get_outputs(
+    command,
+    stdins: list[str],
+    raise_on_fail: bool = False,
+    cwd: str | os.PathLike | None = None,
+    scheduler: JobScheduler | None = None,
+) -> list[str]:
+    """Runs the command once for each stdin on the scheduler."""
+    scheduler = scheduler or get_default_scheduler()
     n = len(stdins)
-    with ThreadPoolExecutor(max_workers=n) as executor:
-        return executor.map(
-            get_command_output, repeat(command, n), stdins, repeat(raise_on_fail, n)
-        )
+    return scheduler.map(
+        get_command_output,
+        repeat(command, n),
+        stdins,
+        repeat(raise_on_fail, n),
+        repeat(cwd, n),
+    )
@@ -0,0 +1,83 @@
+import json
+import os
+from collections.abc import Iterator
+
+from .cache_utils import FragmentCache, get_package_version, hash_parts
+from .template_utils import package_env
+
+EXPORT_TEMPLATE = "proq_export_template.html.jinja"
+EXPORT_MACROS_TEMPLATE = "proq_export_macros.html.jinja"
+
+
+class HtmlExporter:
+    """Renders nested proqs to html one proq at a time.
+
+    The page is streamed from the export template while the proqs are
+    rendered as independent fragments, so the whole document is never held
+    in memory when it is written to a file. With a fragment cache the
+    fragments of unchanged proqs are reused, so re-exporting after editing
+    a proq renders only that proq.
+
+    Args:
+        show_hidden_suffix (bool): Whether to expand the hidden suffix.
+        hide_private_testcases (bool): Whether to hide the private testcases.
+        hide_template_diff (bool): Whether to hide the template - solution diff.
+        fragment_cache (FragmentCache): The cache of the rendered proqs.
+    """
+
+    def __init__(
+        self,
+        show_hidden_suffix: bool = False,
+        hide_private_testcases: bool = False,
+        hide_template_diff: bool = False,
+        fragment_cache: FragmentCache | None = None,
+    ):
+        self.options = {
+            "show_hidden_suffix": show_hidden_suffix,
+            "hide_private_testcases": hide_private_testcases,
+            "hide_template_diff": hide_template_diff,
+        }
+        self.fragment_cache = fragment_cache
+        self.macros = package_env.get_template(EXPORT_MACROS_TEMPLATE).make_module(
+            self.options
+        )
+        self._options_key = hash_parts(
+            json.dumps(self.options, sort_keys=True),
+            get_package_version(),
+            package_env.loader.get_source(package_env, EXPORT_MACROS_TEMPLATE)[0],
+        )
+
+    def render_proq(self, title: str, proq, depth: int = 1) -> str:
+        """Returns the html fragment of the proq under the given heading."""
+        if self.fragment_cache is None:
+            return str(self.macros.render_proq(title, proq, depth))
+        key = hash_parts(self._options_key, title, str(depth), proq.model_dump_json())
+        if (fragment := self.fragment_cache.load(key)) is None:
+            fragment = str(self.macros.render_proq(title, proq, depth))
+            self.fragment_cache.store(key, fragment)
+        return fragment
+
+    def generate_fragments(self, nested_proq, depth: int = 1) -> Iterator[str]:
+        """Yields the html fragments of the nested proq in order."""
+        if isinstance(nested_proq.content, list):
+            yield str(self.macros.render_heading(nested_proq.title, depth))
+            for item in nested_proq.content:
+                yield from self.generate_fragments(item, depth + 1)
+        else:
+            yield self.render_proq(nested_proq.title, nested_proq.content, depth)
+
+    def generate(self, nested_proq) -> Iterator[str]:
+        """Yields the html document of the nested proq chunk by chunk."""
+        yield from package_env.get_template(EXPORT_TEMPLATE).generate(
+            nested_proq=nested_proq, fragments=self.generate_fragments(nested_proq)
+        )
+        if self.fragment_cache is not None:
+            self.fragment_cache.evict()
+
+    def render(self, nested_proq) -> str:
+        return "".join(self.generate(nested_proq))
+
+    def dump(self, nested_proq, output_file: str | os.PathLike) -> None:
+        """Streams the html document of the nested proq to the output file."""
+        with open(output_file, "w") as f:
+            f.writelines(self.generate(nested_proq))
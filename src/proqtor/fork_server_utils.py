@@ -0,0 +1,264 @@
+import json
+import os
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+from importlib.resources import files
+
+from .core_components import ResourceLimits
+from .execute_utils import (
+    CancelToken,
+    CommandCancelledError,
+    OutputCapture,
+    get_command_output,
+    get_process_output,
+    get_rlimits,
+)
+
+SERVER_SCRIPT = str(files("proqtor.data").joinpath("fork_server.py"))
+PYTHON_EXECUTABLE_PATTERN = re.compile(r"python(3(\.\d+)?)?")
+HANDSHAKE_TIMEOUT = 30
+
+
+class ForkServerError(Exception):
+    """Raised when the fork server fails to start a run."""
+
+
+def get_python_script_args(command: str) -> tuple[str, list[str]] | None:
+    """Returns the interpreter and the arguments of a `python script.py` command.
+
+    Commands passing options to the interpreter are not supported as the fork
+    server cannot apply them to an already running interpreter.
+    """
+    python, *args = command.split() or [""]
+    if (
+        not PYTHON_EXECUTABLE_PATTERN.fullmatch(os.path.basename(python))
+        # Relative paths would resolve against the directory of the server
+        or (os.sep in python and not os.path.isabs(python))
+        or not args
+        or args[0].startswith("-")
+        or not args[0].endswith(".py")
+    ):
+        return None
+    return python, args
+
+
+class ForkedProcess:
+    """A run of a script forked by a fork server.
+
+    It provides the parts of the `subprocess.Popen` interface used by
+    `execute_utils.communicate`. The pid is the id of the process group of the
+    run so that `execute_utils.kill_process` kills the whole run.
+    """
+
+    def __init__(self, args, connection: socket.socket, stdin, stdout, stderr):
+        self.args = args
+        self.stdin, self.stdout, self.stderr = stdin, stdout, stderr
+        self.returncode = None
+        self._connection = connection
+        self._buffer = b""
+        line = self._read_line()
+        if not line:
+            raise ForkServerError("The fork server closed the connection.")
+        self.pid = int(line)
+
+    def _read_line(self) -> bytes:
+        while b"\n" not in self._buffer:
+            chunk = self._connection.recv(64)
+            if not chunk:
+                return b""
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line
+
+    def wait(self, timeout: float | None = None) -> int:
+        if self.returncode is not None:
+            return self.returncode
+        self._connection.settimeout(timeout)
+        try:
+            line = self._read_line()
+        except TimeoutError:
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        # The supervisor is killed along with the run when the run is killed
+        self.returncode = int(line) if line else -signal.SIGKILL
+        self._connection.close()
+        return self.returncode
+
+    def kill(self):
+        os.killpg(self.pid, signal.SIGKILL)
+
+
+class ForkServer:
+    """A warm interpreter that forks a process for each run of a script.
+
+    Args:
+        python (str): The python interpreter to run the server on.
+    """
+
+    def __init__(self, python: str):
+        self.python = python
+        self._tempdir = tempfile.mkdtemp(prefix="proq-fork-server-")
+        self.address = os.path.join(self._tempdir, "server.sock")
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # The server exits once the client closes the write end of the lifeline
+        lifeline, self._lifeline = os.pipe()
+        try:
+            listener.bind(self.address)
+            listener.listen(socket.SOMAXCONN)
+            self.process = subprocess.Popen(
+                [python, SERVER_SCRIPT, str(listener.fileno()), str(lifeline)],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                pass_fds=[listener.fileno(), lifeline],
+                start_new_session=True,
+            )
+        except OSError:
+            os.close(self._lifeline)
+            shutil.rmtree(self._tempdir, ignore_errors=True)
+            raise
+        finally:
+            listener.close()
+            os.close(lifeline)
+
+    def spawn(
+        self,
+        args: list[str],
+        cwd: str | os.PathLike | None = None,
+        limits: ResourceLimits | None = None,
+    ) -> ForkedProcess:
+        """Starts a run of the script with the given arguments.
+
+        Raises:
+            ForkServerError: if the server is not able to start the run.
+        """
+        request = {
+            "argv": args,
+            "cwd": os.path.abspath(cwd or os.curdir),
+            "rlimits": get_rlimits(limits),
+        }
+        stdin_read, stdin_write = os.pipe()
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        streams = (
+            open(stdin_write, "wb"),
+            open(stdout_read, "rb"),
+            open(stderr_read, "rb"),
+        )
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.settimeout(HANDSHAKE_TIMEOUT)
+            connection.connect(self.address)
+            socket.send_fds(
+                connection,
+                [json.dumps(request).encode() + b"\n"],
+                [stdin_read, stdout_write, stderr_write],
+            )
+            return ForkedProcess(args, connection, *streams)
+        except (OSError, ValueError, ForkServerError) as e:
+            connection.close()
+            for stream in streams:
+                stream.close()
+            raise ForkServerError(f"Fork server of {self.python} failed: {e}")
+        finally:
+            # The run holds the other ends of the pipes
+            for fd in (stdin_read, stdout_write, stderr_write):
+                os.close(fd)
+
+    @property
+    def running(self) -> bool:
+        return self.process.poll() is None
+
+    def close(self):
+        os.close(self._lifeline)
+        self.process.kill()
+        self.process.wait()
+        shutil.rmtree(self._tempdir, ignore_errors=True)
+
+
+class ForkServerPool:
+    """Runs python scripts on fork servers instead of fresh interpreters.
+
+    Commands of the form `python script.py [args]` are run by forking a warm
+    server of the interpreter, which skips the interpreter startup and the
+    import of common modules for every run. The script runs as `__main__`
+    with the same `sys.argv`, working directory, exit code and resource limits
+    as a fresh run. Other commands, and all commands on platforms without
+    `fork`, are run as usual with `get_command_output`.
+
+    The servers are started on first use and stopped on `close`.
+    """
+
+    def __init__(self):
+        self._servers: dict[str, ForkServer | None] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_supported() -> bool:
+        return os.name == "posix" and hasattr(socket, "send_fds")
+
+    def _get_server(self, python: str) -> ForkServer | None:
+        with self._lock:
+            if python not in self._servers:
+                try:
+                    self._servers[python] = ForkServer(python)
+                except OSError:
+                    self._servers[python] = None
+            return self._servers[python]
+
+    def get_command_output(
+        self,
+        command: str,
+        stdin: str = "",
+        raise_on_fail: bool = False,
+        cwd: str | os.PathLike | None = None,
+        cancel_token: CancelToken | None = None,
+        limits: ResourceLimits | None = None,
+        capture: OutputCapture | None = None,
+    ):
+        """Runs the command on a fork server when possible.
+
+        The arguments, return value and exceptions are the same as of
+        `execute_utils.get_command_output`, which runs the commands that are
+        not supported by the fork servers.
+        """
+        script_args = get_python_script_args(command) if self.is_supported() else None
+        server = self._get_server(script_args[0]) if script_args else None
+        if server is None:
+            return get_command_output(
+                command, stdin, raise_on_fail, cwd, cancel_token, limits, capture
+            )
+        if cancel_token is not None and cancel_token.cancelled:
+            raise CommandCancelledError(command)
+        try:
+            process = server.spawn(script_args[1], cwd, limits)
+        except ForkServerError:
+            if not server.running:
+                with self._lock:
+                    stopped = self._servers.get(script_args[0]) is server
+                    if stopped:
+                        self._servers[script_args[0]] = None
+                if stopped:
+                    server.close()
+            return get_command_output(
+                command, stdin, raise_on_fail, cwd, cancel_token, limits, capture
+            )
+        return get_process_output(
+            process, command, stdin, raise_on_fail, cancel_token, limits, capture
+        )
+
+    def close(self):
+        with self._lock:
+            servers, self._servers = self._servers, {}
+        for server in servers.values():
+            if server is not None:
+                server.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
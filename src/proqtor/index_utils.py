@@ -0,0 +1,328 @@
+import json
+import os
+import sqlite3
+from collections.abc import Iterator
+from pathlib import Path
+from typing import NamedTuple
+
+from .cache_utils import PROJECT_CACHE_DIR, ProqCache, hash_file
+from .watch_utils import get_file_state
+
+INDEX_FILE = "index.sqlite"
+PROQ_FILE_PATTERN = "*.md"
+YAML_HEADER_START = "---"
+# The number of characters read to find the yaml header of a markdown file
+HEADER_PEEK_SIZE = 4096
+QUERY_FIELDS = ["tag", "title", "lang", "verdict"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS proqs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    dependencies TEXT NOT NULL DEFAULT '{}',
+    error TEXT,
+    title TEXT,
+    lang TEXT,
+    source_filename TEXT,
+    run_command TEXT,
+    build_command TEXT,
+    n_public INTEGER,
+    n_private INTEGER,
+    limits TEXT,
+    header TEXT,
+    solution_check INTEGER,
+    template_check INTEGER,
+    verdict TEXT,
+    evaluated_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS tags (
+    path TEXT NOT NULL REFERENCES proqs(path) ON DELETE CASCADE,
+    tag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tags_by_tag ON tags(tag);
+CREATE INDEX IF NOT EXISTS proqs_by_title ON proqs(title);
+"""
+
+
+class IndexUpdate(NamedTuple):
+    added: int
+    updated: int
+    removed: int
+    unchanged: int
+    errors: list[tuple[str, str]]
+
+
+class IndexedProq(NamedTuple):
+    path: str
+    title: str
+    lang: str
+    n_public: int
+    n_private: int
+    verdict: str | None
+
+
+def get_default_index_path() -> Path:
+    return Path(PROJECT_CACHE_DIR) / INDEX_FILE
+
+
+def get_dependency_states(paths) -> dict[str, list[int] | None]:
+    return {
+        path: list(state) if (state := get_file_state(path)) else None
+        for path in sorted(paths)
+    }
+
+
+def has_yaml_header(path: str | os.PathLike) -> bool:
+    """Returns whether the markdown file starts with a yaml header, like a proq."""
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return f.read(HEADER_PEEK_SIZE).lstrip().startswith(YAML_HEADER_START)
+    except OSError:
+        return False
+
+
+def parse_selector(selector: str) -> dict[str, str]:
+    """Parses a `@key=value,key=value` file selector into the query fields."""
+    fields = {}
+    for part in selector.removeprefix("@").split(","):
+        key, sep, value = part.partition("=")
+        if not sep or key.strip() not in QUERY_FIELDS:
+            raise ValueError(
+                f"Invalid selector {selector!r}. Use @key=value with the keys "
+                f"{', '.join(QUERY_FIELDS)}."
+            )
+        fields[key.strip()] = value.strip()
+    return fields
+
+
+class ProqIndex:
+    """An incrementally updated SQLite index of the proqs in a question bank.
+
+    The index records the yaml header, the tags, the language, the execute
+    config and the test case counts of each proq file along with the last
+    evaluation verdict, so the proqs can be queried without parsing them. A
+    file is parsed again only when it or a file it includes changed, first
+    checked by the modification time and size and then by the content hash.
+
+    Args:
+        index_file (str|PathLike): The database file. Defaults to
+            `.proq_cache/index.sqlite` in the current directory.
+    """
+
+    def __init__(self, index_file: str | os.PathLike | None = None):
+        self.index_file = Path(index_file or get_default_index_path())
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.index_file)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def _is_unchanged(self, row, state, content_hash=None) -> bool:
+        mtime_ns, size, stored_hash, dependencies = row
+        if content_hash is None and (mtime_ns, size) != state:
+            return False
+        if content_hash is not None and content_hash != stored_hash:
+            return False
+        dependencies = json.loads(dependencies)
+        return get_dependency_states(dependencies) == dependencies
+
+    def _store(self, path: str, state, content_hash: str, proq_cache):
+        # Imported here so that querying the index does not load the parser
+        from .core import ProQ
+        from .core_components import ExecuteConfig
+
+        dependencies = set()
+        fields = {
+            "path": path,
+            "mtime_ns": state[0],
+            "size": state[1],
+            "content_hash": content_hash,
+        }
+        try:
+            proq = ProQ.from_file(
+                path, proq_cache=proq_cache, dependencies=dependencies
+            )
+        except Exception as e:
+            fields["error"] = str(getattr(e, "message", e))
+            tags = []
+        else:
+            execute_config = proq.solution.execute_config or ExecuteConfig()
+            fields |= {
+                "title": proq.title,
+                "lang": str(proq.solution.lang),
+                "source_filename": execute_config.source_filename,
+                "run_command": execute_config.run,
+                "build_command": execute_config.build,
+                "n_public": len(proq.public_test_cases),
+                "n_private": len(proq.private_test_cases),
+                "limits": proq.limits.model_dump_json(),
+                "header": json.dumps(proq.model_extra or {}),
+            }
+            tags = proq.tags or []
+        dependencies.discard(path)
+        fields["dependencies"] = json.dumps(get_dependency_states(dependencies))
+        # Keep the verdict of the unchanged content
+        previous = self.connection.execute(
+            "SELECT solution_check, template_check, verdict, evaluated_hash "
+            "FROM proqs WHERE path = ?",
+            (path,),
+        ).fetchone()
+        if previous and previous[3] == content_hash:
+            fields |= dict(
+                zip(
+                    ["solution_check", "template_check", "verdict", "evaluated_hash"],
+                    previous,
+                )
+            )
+        self.connection.execute("DELETE FROM proqs WHERE path = ?", (path,))
+        self.connection.execute(
+            f"INSERT INTO proqs ({', '.join(fields)}) "
+            f"VALUES ({', '.join('?' * len(fields))})",
+            list(fields.values()),
+        )
+        self.connection.executemany(
+            "INSERT INTO tags (path, tag) VALUES (?, ?)",
+            [(path, tag) for tag in dict.fromkeys(tags)],
+        )
+        return fields.get("error")
+
+    def update(
+        self, directory: str | os.PathLike = ".", proq_cache: ProqCache | None = None
+    ) -> IndexUpdate:
+        """Indexes the proq files in the directory and its subdirectories.
+
+        Unchanged files are skipped and the files that no longer exist are
+        removed from the index. Markdown files without a yaml header, like
+        READMEs, are not proqs and are skipped.
+
+        Args:
+            directory (str|PathLike): The directory to index.
+            proq_cache (ProqCache): The cache of parsed proqs.
+        """
+        directory = Path(directory).absolute()
+        paths = sorted(
+            str(path)
+            for path in directory.rglob(PROQ_FILE_PATTERN)
+            if not any(
+                part.startswith(".") for part in path.relative_to(directory).parts
+            )
+        )
+        prefix = os.path.join(directory, "")
+        stored = {
+            row[0]: row[1:]
+            for row in self.connection.execute(
+                "SELECT path, mtime_ns, size, content_hash, dependencies FROM proqs"
+            )
+            if row[0].startswith(prefix)
+        }
+        added = updated = unchanged = 0
+        errors = []
+        with self.connection:
+            for path in paths:
+                if (state := get_file_state(path)) is None:
+                    continue
+                row = stored.pop(path, None)
+                if row is not None and self._is_unchanged(row, state):
+                    unchanged += 1
+                    continue
+                if not has_yaml_header(path):
+                    if row is not None:
+                        # Removed below, like the files that no longer exist
+                        stored[path] = row
+                    continue
+                if (content_hash := hash_file(path)) is None:
+                    continue
+                if row is not None and self._is_unchanged(row, state, content_hash):
+                    # Touched without changes
+                    self.connection.execute(
+                        "UPDATE proqs SET mtime_ns = ?, size = ? WHERE path = ?",
+                        (*state, path),
+                    )
+                    unchanged += 1
+                    continue
+                error = self._store(path, state, content_hash, proq_cache)
+                if error is not None:
+                    errors.append((path, error))
+                if row is None:
+                    added += 1
+                else:
+                    updated += 1
+            self.connection.executemany(
+                "DELETE FROM proqs WHERE path = ?", [(path,) for path in stored]
+            )
+        return IndexUpdate(added, updated, len(stored), unchanged, errors)
+
+    def record_verdict(self, path: str | os.PathLike, proq_check) -> None:
+        """Records the evaluation of the indexed proq file at its current content."""
+        path = os.path.abspath(path)
+        if (content_hash := hash_file(path)) is None:
+            return
+        solution_check, template_check = proq_check
+        with self.connection:
+            self.connection.execute(
+                "UPDATE proqs SET solution_check = ?, template_check = ?, "
+                "verdict = ?, evaluated_hash = ? WHERE path = ?",
+                (
+                    solution_check,
+                    template_check,
+                    "passed" if solution_check and template_check else "failed",
+                    content_hash,
+                    path,
+                ),
+            )
+
+    def query(
+        self,
+        tag: str | None = None,
+        title: str | None = None,
+        lang: str | None = None,
+        verdict: str | None = None,
+    ) -> Iterator[IndexedProq]:
+        """Yields the indexed proqs matching all the given fields.
+
+        Args:
+            tag (str): A tag of the proqs.
+            title (str): A case insensitive part of the titles.
+            lang (str): The language of the solutions.
+            verdict (str): The last evaluation verdict, `passed`, `failed` or
+                `none` for the proqs not evaluated since their last change.
+        """
+        conditions, parameters = ["error IS NULL"], []
+        if tag is not None:
+            conditions.append("path IN (SELECT path FROM tags WHERE tag = ?)")
+            parameters.append(tag)
+        if title is not None:
+            conditions.append("title LIKE ?")
+            parameters.append(f"%{title}%")
+        if lang is not None:
+            conditions.append("lang = ?")
+            parameters.append(lang)
+        if verdict is not None:
+            if verdict == "none":
+                conditions.append(
+                    "(verdict IS NULL OR evaluated_hash IS NOT content_hash)"
+                )
+            else:
+                conditions.append("verdict = ? AND evaluated_hash = content_hash")
+                parameters.append(verdict)
+        for row in self.connection.execute(
+            "SELECT path, title, lang, n_public, n_private, "
+            "CASE WHEN evaluated_hash = content_hash THEN verdict END "
+            f"FROM proqs WHERE {' AND '.join(conditions)} ORDER BY path",
+            parameters,
+        ):
+            yield IndexedProq(*row)
+
+    def select(self, selector: str) -> list[str]:
+        """Returns the paths of the proqs matching a `@key=value,...` selector."""
+        return [proq.path for proq in self.query(**parse_selector(selector))]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -48,10 +48,25 @@ def strip_tags(html: str, tags: list[str]) -> str:
     )
 
 
-execute_config_parser = argparse.ArgumentParser()
+class InfoStringParser(argparse.ArgumentParser):
+    """Parses the options of a code block info string.
+
+    Raises a ValueError on invalid options instead of exiting, so that a
+    malformed info string fails the parsing of its proq only.
+    """
+
+    def __init__(self):
+        super().__init__(add_help=False)
+
+    def error(self, message):
+        raise ValueError(message)
+
+
+execute_config_parser = InfoStringParser()
 execute_config_parser.add_argument("source_filename", type=str, nargs="?")
 execute_config_parser.add_argument("-b", "--build", type=str, required=False)
 execute_config_parser.add_argument("-r", "--run", type=str, required=False)
+execute_config_parser.add_argument("--batch", action="store_true")
 
 
 def parse_execute_config(config_string):
@@ -60,21 +75,54 @@ def parse_execute_config(config_string):
     )
 
 
-def extract_codeblock_content(text):
-    block = next(
-        iter(
-            block
-            for block in Markdown().parse(text).children
-            if (block.get_type() == "FencedCode" or block.get_type() == "CodeBlock")
-        )
-    )
+test_case_config_parser = InfoStringParser()
+test_case_config_parser.add_argument("-t", "--time-limit", type=float, required=False)
+
+
+def parse_test_case_config(config_string):
+    """Parses the config in the info string of a test case input code block."""
+    config, _ = test_case_config_parser.parse_known_args(shlex.split(config_string))
+    return dict(config._get_kwargs())
+
+
+def is_code_block(block) -> bool:
+    return block.get_type() in ("FencedCode", "CodeBlock")
+
+
+def fold_blocks(blocks, level: int) -> list[tuple[str, list]]:
+    """Groups the blocks under the headings of the given level.
+
+    The blocks before the first heading of the level are dropped.
+    """
+    sections = []
+    for block in blocks:
+        if block.get_type() == "Heading" and block.level == level:
+            sections.append((block.children[0].children, []))
+        elif sections:
+            sections[-1][1].append(block)
+    return sections
+
+
+def get_codeblock_content(block):
     return {
         "lang": block.lang,
         "execute_config": parse_execute_config(block.extra),
         "code": block.children[0].children,
+        "info": f"{block.lang} {block.extra}".strip(),
     }
 
 
+def get_first_codeblock(blocks):
+    for block in blocks:
+        if is_code_block(block):
+            return block
+    raise ValueError("Code block not found.")
+
+
+def extract_codeblock_content(text):
+    return get_codeblock_content(get_first_codeblock(Markdown().parse(text).children))
+
+
 def extract_code_parts(code):
     code_parts = re.match(
         r"(?P<prefix>.*)<template>(?P<tagged_template>.*)</template>(?P<suffix>.*)",
@@ -117,17 +165,45 @@ def extract_code_parts(code):
 
 
 def extract_solution(solution_codeblock):
-    code_block_contents = extract_codeblock_content(solution_codeblock)
+    """Extracts the solution from the markdown text or the blocks of its section."""
+    if isinstance(solution_codeblock, str):
+        code_block_contents = extract_codeblock_content(solution_codeblock)
+    else:
+        code_block_contents = get_codeblock_content(
+            get_first_codeblock(solution_codeblock)
+        )
+    code_block_contents.pop("info")
     code_parts = extract_code_parts(code_block_contents.pop("code"))
     return code_block_contents | code_parts
 
 
-def extract_testcases(testcase_blocks: tuple):
-    testcases_list = [x[1] for x in testcase_blocks]
-    return [
-        {
-            "input": extract_codeblock_content(input)["code"],
-            "output": extract_codeblock_content(output)["code"],
-        }
-        for input, output in zip(testcases_list[::2], testcases_list[1::2])
+def extract_testcases(testcase_blocks: list):
+    """Extracts the test cases from the second level sections of a test case section.
+
+    The sections are given either as (heading, markdown text) pairs or as
+    (heading, blocks) pairs as returned by `fold_blocks`. The first code
+    blocks of the consecutive sections are the input and the output of a test
+    case.
+    """
+    codeblocks = [
+        extract_codeblock_content(section)
+        if isinstance(section, str)
+        else get_codeblock_content(get_first_codeblock(section))
+        for _, section in testcase_blocks
     ]
+    testcases = []
+    for (heading, _), input, output in zip(
+        testcase_blocks[::2], codeblocks[::2], codeblocks[1::2]
+    ):
+        try:
+            config = parse_test_case_config(input["info"])
+        except ValueError as e:
+            raise ValueError(f"Invalid info string of {heading!r}: {e}") from None
+        testcases.append(
+            {
+                "input": input["code"],
+                "output": output["code"],
+                **config,
+            }
+        )
+    return testcases
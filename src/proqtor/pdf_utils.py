@@ -0,0 +1,343 @@
+import base64
+import itertools
+import json
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from .execute_utils import kill_process, wrap_command
+
+DEFAULT_TIMEOUT = 60
+DEFAULT_PAGES_PER_BROWSER = 4
+READ_SIZE = 64 * 1024
+CHROME_ARGS = [
+    "--headless",
+    "--disable-gpu",
+    "--remote-debugging-pipe",
+    "--no-first-run",
+    "--no-default-browser-check",
+]
+
+
+class BrowserError(Exception):
+    pass
+
+
+def get_chrome_path(chrome_path: str | None = None) -> str:
+    """Returns the chrome executable, configurable by the CHROME variable."""
+    return chrome_path or os.environ.get("CHROME") or "chrome"
+
+
+class Browser:
+    """A headless chrome controlled over the DevTools protocol.
+
+    The browser is started once and prints each document in a new tab, so
+    printing many documents pays the browser startup only once. The protocol
+    messages are exchanged as null terminated json over the pipes of
+    `--remote-debugging-pipe`. A reader thread dispatches the responses by
+    their ids and the events by their sessions, so any number of threads can
+    print through the same browser concurrently.
+
+    Args:
+        chrome_path (str): The chrome executable. Defaults to the `CHROME`
+            environment variable or `chrome`.
+        timeout (float): The seconds to wait for each step of a print.
+    """
+
+    def __init__(self, chrome_path: str | None = None, timeout=DEFAULT_TIMEOUT):
+        if not self.is_supported():
+            raise BrowserError("DevTools pipes need a posix platform.")
+        self.timeout = timeout
+        chrome = shutil.which(get_chrome_path(chrome_path))
+        if chrome is None:
+            raise BrowserError(
+                f"Could not start the browser: {get_chrome_path(chrome_path)} "
+                "not found."
+            )
+        self.user_data_dir = tempfile.mkdtemp(prefix="proq-chrome-")
+        commands_read, commands_write = os.pipe()
+        results_read, results_write = os.pipe()
+        try:
+            self.process = subprocess.Popen(
+                # The DevTools pipes are expected at the fds 3 and 4
+                wrap_command(
+                    [
+                        chrome,
+                        *CHROME_ARGS,
+                        f"--user-data-dir={self.user_data_dir}",
+                    ],
+                    fds={3: commands_read, 4: results_write},
+                ),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                pass_fds=(commands_read, results_write),
+                start_new_session=True,
+            )
+        except OSError as e:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+            raise BrowserError(f"Could not start the browser: {e}") from e
+        finally:
+            os.close(commands_read)
+            os.close(results_write)
+        self._commands = os.fdopen(commands_write, "wb")
+        self._results = results_read
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pending: dict[int, Future] = {}
+        self._session_events: dict[str, queue.Queue] = {}
+        self._closed = False
+        self._reader = threading.Thread(target=self._read_messages, daemon=True)
+        self._reader.start()
+
+    @staticmethod
+    def is_supported() -> bool:
+        # The DevTools pipes are passed to the browser with pass_fds
+        return os.name == "posix"
+
+    def is_alive(self) -> bool:
+        return not self._closed and self.process.poll() is None
+
+    def _read_messages(self):
+        partial = []
+        try:
+            while chunk := os.read(self._results, READ_SIZE):
+                *messages, rest = chunk.split(b"\0")
+                if messages:
+                    messages[0] = b"".join(partial) + messages[0]
+                    partial = []
+                for message in messages:
+                    self._dispatch(json.loads(message))
+                if rest:
+                    partial.append(rest)
+        except (OSError, ValueError):
+            pass
+        with self._lock:
+            self._closed = True
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(BrowserError("The browser exited."))
+
+    def _dispatch(self, message: dict):
+        if "id" in message:
+            with self._lock:
+                future = self._pending.pop(message["id"], None)
+            if future is None:
+                return
+            if "error" in message:
+                future.set_exception(BrowserError(message["error"].get("message")))
+            else:
+                future.set_result(message.get("result", {}))
+        elif (events := self._session_events.get(message.get("sessionId"))) is not None:
+            events.put(message)
+
+    def send(self, method: str, params: dict | None = None, session_id=None) -> dict:
+        """Sends a DevTools protocol command and returns its result."""
+        message = {"method": method, "params": params or {}}
+        if session_id is not None:
+            message["sessionId"] = session_id
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise BrowserError("The browser exited.")
+            message["id"] = next(self._ids)
+            self._pending[message["id"]] = future
+            try:
+                self._commands.write(json.dumps(message).encode() + b"\0")
+                self._commands.flush()
+            except OSError as e:
+                self._pending.pop(message["id"])
+                raise BrowserError("The browser exited.") from e
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            raise BrowserError(f"{method} timed out after {self.timeout} seconds.")
+
+    def _wait_for_load(self, events: queue.Queue, loader_id: str):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                message = events.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise BrowserError(f"Loading timed out after {self.timeout} seconds.")
+            params = message.get("params", {})
+            if (
+                message.get("method") == "Page.lifecycleEvent"
+                and params.get("name") == "load"
+                and params.get("loaderId") == loader_id
+            ):
+                return
+
+    def print_to_pdf(self, html_content: str, output_file: str | os.PathLike):
+        """Prints the html document to the pdf file once it has loaded."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            html_file = Path(tmpdir) / "output.html"
+            html_file.write_text(html_content)
+            target_id = self.send("Target.createTarget", {"url": "about:blank"})[
+                "targetId"
+            ]
+            session_id = None
+            try:
+                session_id = self.send(
+                    "Target.attachToTarget", {"targetId": target_id, "flatten": True}
+                )["sessionId"]
+                self._session_events[session_id] = events = queue.Queue()
+                self.send("Page.enable", session_id=session_id)
+                self.send(
+                    "Page.setLifecycleEventsEnabled",
+                    {"enabled": True},
+                    session_id=session_id,
+                )
+                navigation = self.send(
+                    "Page.navigate", {"url": html_file.as_uri()}, session_id=session_id
+                )
+                if "errorText" in navigation:
+                    raise BrowserError(navigation["errorText"])
+                self._wait_for_load(events, navigation["loaderId"])
+                pdf = self.send(
+                    "Page.printToPDF",
+                    {"displayHeaderFooter": False},
+                    session_id=session_id,
+                )
+            finally:
+                self._session_events.pop(session_id, None)
+                try:
+                    self.send("Target.closeTarget", {"targetId": target_id})
+                except BrowserError:
+                    pass
+        Path(output_file).write_bytes(base64.b64decode(pdf["data"]))
+
+    def close(self):
+        try:
+            self.send("Browser.close")
+        except BrowserError:
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        # Stop the helper processes of the browser as well
+        kill_process(self.process)
+        self.process.wait()
+        self._commands.close()
+        # The pipe is at EOF once the browser and its helpers are gone
+        self._reader.join(timeout=5)
+        if not self._reader.is_alive():
+            os.close(self._results)
+        shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def print_with_new_browser(
+    html_content: str, output_file: str | os.PathLike, chrome_path=None
+):
+    """Prints the html document to pdf with a chrome started for it alone."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        file_path = os.path.join(tmpdir, "output.html")
+        with open(file_path, "w") as f:
+            f.write(html_content)
+        subprocess.run(
+            [
+                get_chrome_path(chrome_path),
+                f"--print-to-pdf={os.path.abspath(output_file)}",
+                "--headless",
+                "--disable-gpu",
+                "--no-pdf-header-footer",
+                os.path.abspath(file_path),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+
+class BrowserPool:
+    """A pool of headless browsers printing html documents to pdf concurrently.
+
+    The browsers are started on first use and each one prints up to
+    `pages_per_browser` documents at once. On platforms without DevTools
+    pipes every document is printed by a chrome started for it.
+
+    Args:
+        size (int): The number of browsers.
+        chrome_path (str): The chrome executable. Defaults to the `CHROME`
+            environment variable or `chrome`.
+        pages_per_browser (int): The number of documents printed at once by
+            each browser.
+    """
+
+    def __init__(
+        self,
+        size: int = 1,
+        chrome_path: str | None = None,
+        pages_per_browser: int = DEFAULT_PAGES_PER_BROWSER,
+    ):
+        self.size = max(1, size)
+        self.chrome_path = chrome_path
+        self.pages_per_browser = pages_per_browser
+        self._browsers: list[Browser] = []
+        self._lock = threading.Lock()
+        self._next_browser = itertools.count()
+
+    def _get_browser(self) -> Browser:
+        # Browsers that crashed or were killed are replaced by new ones, and
+        # closed without holding the lock as closing can take a while
+        dead = []
+        try:
+            with self._lock:
+                browsers = []
+                for browser in self._browsers:
+                    (browsers if browser.is_alive() else dead).append(browser)
+                self._browsers = browsers
+                if len(self._browsers) < self.size:
+                    self._browsers.append(Browser(self.chrome_path))
+                    return self._browsers[-1]
+                return self._browsers[next(self._next_browser) % self.size]
+        finally:
+            for browser in dead:
+                browser.close()
+
+    def print_to_pdf(self, html_content: str, output_file: str | os.PathLike):
+        if not Browser.is_supported():
+            print_with_new_browser(html_content, output_file, self.chrome_path)
+            return
+        self._get_browser().print_to_pdf(html_content, output_file)
+
+    def print_many(
+        self, documents: list[tuple[str, str | os.PathLike]]
+    ) -> list[Exception | None]:
+        """Prints the (html content, output file) pairs concurrently.
+
+        Returns:
+            errors (list[Exception|None]): The error of each document, None
+                for the printed ones.
+        """
+        max_workers = self.size * self.pages_per_browser
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.print_to_pdf, html_content, output_file)
+                for html_content, output_file in documents
+            ]
+        return [future.exception() for future in futures]
+
+    def close(self):
+        with self._lock:
+            browsers, self._browsers = self._browsers, []
+        for browser in browsers:
+            browser.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
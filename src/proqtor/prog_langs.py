@@ -1,19 +1,34 @@
 import json
+from functools import cache
 from importlib.resources import files
 from typing import Annotated, Literal
 
 from pydantic import BeforeValidator
 
-# curl https://emkc.org/api/v2/piston/runtimes | \
-#   jq "sort_by(.language)| map({language: .language, aliases: .aliases})" \
-#   > runtimes.json
 
-# langs and aliases taken from piston
-runtimes = json.loads(files("proqtor.data").joinpath("runtimes.json").read_text())
-alias_map = {runtime["language"]: runtime["language"] for runtime in runtimes} | {
-    alias: runtime["language"] for runtime in runtimes for alias in runtime["aliases"]
-}
-alias_codes = sorted(list(alias_map.keys()))
+@cache
+def get_alias_map() -> dict[str, str]:
+    """Returns the languages by their aliases, loaded on first use."""
+    # curl https://emkc.org/api/v2/piston/runtimes | \
+    #   jq "sort_by(.language)| map({language: .language, aliases: .aliases})" \
+    #   > runtimes.json
+
+    # langs and aliases taken from piston
+    runtimes = json.loads(files("proqtor.data").joinpath("runtimes.json").read_text())
+    return {runtime["language"]: runtime["language"] for runtime in runtimes} | {
+        alias: runtime["language"]
+        for runtime in runtimes
+        for alias in runtime["aliases"]
+    }
+
+
+def __getattr__(name):
+    # The alias tables of earlier versions, kept as lazy module attributes
+    if name == "alias_map":
+        return get_alias_map()
+    if name == "alias_codes":
+        return sorted(get_alias_map())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class InvalidLangAliasError(ValueError):
@@ -22,9 +37,10 @@ class InvalidLangAliasError(ValueError):
 
 def get_lang_code(alias):
     """Get the lang code from alias."""
+    alias_map = get_alias_map()
     if alias not in alias_map:
         raise InvalidLangAliasError(
-            f"Alias not recognized. Alias should be one of {alias_codes}"
+            f"Alias not recognized. Alias should be one of {sorted(alias_map)}"
         )
     return alias_map[alias]
 
@@ -119,5 +135,5 @@ ProgLang = Annotated[
         "yeethon",
         "zig",
     ],
-    BeforeValidator(lambda x: alias_map[x]),
+    BeforeValidator(lambda x: get_alias_map()[x]),
 ]
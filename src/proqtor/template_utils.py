@@ -1,30 +1,151 @@
+import os
+from contextvars import ContextVar
+from functools import lru_cache
 from pathlib import Path
 
-from jinja2 import Environment, FunctionLoader, PackageLoader, select_autoescape
+from jinja2 import (
+    BaseLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    PackageLoader,
+    TemplateNotFound,
+    select_autoescape,
+)
 from marko.ext.gfm import gfm
 
+TEMPLATE_CACHE_SIZE = 1000
+# The name of the proq bodies, in the directory of the proq
+STRING_TEMPLATE_NAME = "<string>"
+GFM_CACHE_SIZE = 4096
+
+# The set collecting the files loaded by the render in progress
+_dependencies: ContextVar[set[str] | None] = ContextVar("dependencies", default=None)
+# The directory the includes of the render in progress are relative to
+_base: ContextVar[str] = ContextVar("base", default=os.curdir)
+
+
+@lru_cache(maxsize=GFM_CACHE_SIZE)
+def convert_gfm(text: str) -> str:
+    """Converts the github flavored markdown to html, memoized by the text."""
+    return gfm.convert(text)
+
+
 package_env = Environment(
     loader=PackageLoader("proqtor", "templates"), autoescape=select_autoescape()
 )
-package_env.filters["gfm"] = gfm.convert
+package_env.filters["gfm"] = convert_gfm
+
+
+class PathLoader(BaseLoader):
+    """Loads the templates named by their absolute paths."""
+
+    def get_source(self, environment, template):
+        path = Path(template)
+        try:
+            mtime = path.stat().st_mtime
+            source = path.read_text()
+        except OSError:
+            raise TemplateNotFound(template)
+
+        def uptodate():
+            try:
+                return path.stat().st_mtime == mtime
+            except OSError:
+                return False
+
+        return source, str(path), uptodate
+
+
+class RelativeEnvironment(Environment):
+    """An environment that resolves template names relative to the proq.
+
+    Every include, import or extends, nested ones included, is relative to
+    the directory of the proq being rendered. The templates are named by
+    their resolved absolute paths, so a file included by many proqs is loaded
+    and compiled once and then served from the template cache until it
+    changes on disk.
+    """
+
+    def join_path(self, template, parent):
+        return os.path.normpath(os.path.join(_base.get(), template))
+
+    def get_template(self, name, parent=None, globals=None):
+        template = super().get_template(name, parent, globals)
+        if (dependencies := _dependencies.get()) is not None:
+            dependencies.add(template.filename)
+        return template
+
+    def select_template(self, names, parent=None, globals=None):
+        template = super().select_template(names, parent, globals)
+        if (dependencies := _dependencies.get()) is not None:
+            dependencies.add(template.filename)
+        return template
+
+
+_select_autoescape = select_autoescape()
+
+
+def select_relative_autoescape(template_name: str | None) -> bool:
+    """Escapes the proq bodies like `from_string` escapes template strings."""
+    if template_name and os.path.basename(template_name) == STRING_TEMPLATE_NAME:
+        template_name = None
+    return _select_autoescape(template_name)
+
+
+relative_env = RelativeEnvironment(
+    loader=PathLoader(),
+    autoescape=select_relative_autoescape,
+    cache_size=TEMPLATE_CACHE_SIZE,
+)
+
+
+def enable_bytecode_cache(directory: str | os.PathLike | None = None):
+    """Stores the compiled templates of the relative environment on disk.
 
+    Args:
+        directory (str|PathLike): The directory of the cache. Defaults to the
+            `templates` cache directory of `cache_utils.get_cache_dir`.
+    """
+    if directory is None:
+        from .cache_utils import get_cache_dir
 
-def load_relative_to(path):
-    """Loads the files relative to the given file or directory."""
+        directory = get_cache_dir("templates")
+    os.makedirs(directory, exist_ok=True)
+    relative_env.bytecode_cache = FileSystemBytecodeCache(str(directory))
 
-    def inner(template):
-        nonlocal path
-        path = Path(path)
-        if not path.is_dir():
-            path = path.parent
-        return (path / template).read_text()
 
-    return inner
+def render_relative(
+    source: str, base: str | os.PathLike, dependencies: set[str] | None = None
+) -> str:
+    """Renders the template string with the includes relative to the base.
 
+    The bytecode cache is enabled on the first render when the
+    `PROQ_TEMPLATE_BYTECODE_CACHE` environment variable is set.
 
-def get_relative_env(filename):
-    return Environment(
-        loader=FunctionLoader(load_relative_to(filename)),
-        autoescape=select_autoescape(),
-        cache_size=0,
+    Args:
+        source (str): The template string.
+        base (str|PathLike): The file or directory the includes are relative to.
+        dependencies (set[str]): The set to add the paths of the files
+            included, imported or extended while rendering to.
+    """
+    if relative_env.bytecode_cache is None and os.environ.get(
+        "PROQ_TEMPLATE_BYTECODE_CACHE"
+    ):
+        enable_bytecode_cache()
+    path = Path(base).absolute()
+    if not path.is_dir():
+        path = path.parent
+    name = str(path / STRING_TEMPLATE_NAME)
+    template = relative_env.template_class.from_code(
+        relative_env,
+        relative_env.compile(source, name),
+        relative_env.make_globals(None),
+        None,
     )
+    base_token = _base.set(str(path))
+    token = _dependencies.set(dependencies)
+    try:
+        return template.render()
+    finally:
+        _dependencies.reset(token)
+        _base.reset(base_token)
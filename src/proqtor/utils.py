@@ -1,4 +1,5 @@
 import difflib
+import re
 
 from termcolor import cprint
 
@@ -24,3 +25,8 @@ def color_diff(old_text, new_text):
             cprint(line, "yellow")
         else:  # Unchanged
             print(line)
+
+
+def get_file_stem(index: int, title: str) -> str:
+    """Returns a numbered file name for the title, like `001_sum_of_squares`."""
+    return f"{index:03}_" + re.sub(r"[^a-z0-9]+", "_", title.lower()).strip("_")
@@ -0,0 +1,76 @@
+import os
+import time
+
+DEFAULT_POLL_INTERVAL = 0.5
+DEFAULT_DEBOUNCE = 0.3
+
+
+def get_file_state(path: str) -> tuple[int, int] | None:
+    """Returns the modification time and the size of the file, None if missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FileWatcher:
+    """Polls the files that the watched targets depend on for changes.
+
+    Each target, usually a proq file, depends on itself and on the files
+    given for it, such as its jinja includes. A change of a file affects
+    exactly the targets depending on it.
+
+    Args:
+        interval (float): The seconds between the polls.
+        debounce (float): The seconds without further changes to wait for
+            after a change, so that a burst of saves is reported once.
+    """
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_POLL_INTERVAL,
+        debounce: float = DEFAULT_DEBOUNCE,
+    ):
+        self.interval = interval
+        self.debounce = debounce
+        self.targets: dict[str, set[str]] = {}
+        self._states: dict[str, tuple[int, int] | None] = {}
+
+    def watch(self, target: str, dependencies: set[str] = frozenset()):
+        """Sets the files the target depends on, replacing the earlier ones."""
+        paths = {os.path.abspath(path) for path in [target, *dependencies]}
+        self.targets[target] = paths
+        for path in paths:
+            if path not in self._states:
+                self._states[path] = get_file_state(path)
+        # Forget the files no target depends on anymore
+        watched = set().union(*self.targets.values())
+        for path in set(self._states) - watched:
+            del self._states[path]
+
+    def poll(self) -> set[str]:
+        """Returns the watched files that changed since the last poll."""
+        changed = set()
+        for path, state in self._states.items():
+            if (new_state := get_file_state(path)) != state:
+                self._states[path] = new_state
+                changed.add(path)
+        return changed
+
+    def affected(self, changed: set[str]) -> list[str]:
+        """Returns the targets depending on any of the changed files in order."""
+        return [target for target, paths in self.targets.items() if paths & changed]
+
+    def wait(self) -> list[str]:
+        """Blocks until watched files change and returns the affected targets."""
+        while True:
+            changed = self.poll()
+            while changed:
+                time.sleep(self.debounce)
+                if not (more_changed := self.poll()):
+                    break
+                changed |= more_changed
+            if affected := self.affected(changed):
+                return affected
+            time.sleep(self.interval)
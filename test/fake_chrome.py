@@ -0,0 +1,71 @@
+"""A stand-in for chrome speaking the DevTools protocol over pipes.
+
+It serves the commands of `--remote-debugging-pipe` used for printing. The
+printed pdf is the loaded html prefixed with `%PDF-fake`. Each launch is
+logged to the file in FAKE_CHROME_LOG.
+"""
+
+import base64
+import itertools
+import json
+import os
+import sys
+from urllib.parse import unquote, urlparse
+
+if log_file := os.environ.get("FAKE_CHROME_LOG"):
+    with open(log_file, "a") as f:
+        f.write(" ".join(sys.argv[1:]) + "\n")
+
+commands = os.fdopen(3, "rb")
+results = os.fdopen(4, "wb")
+ids = itertools.count(1)
+documents = {}
+
+
+def send(message):
+    results.write(json.dumps(message).encode() + b"\0")
+    results.flush()
+
+
+def handle(method, params, session_id):
+    match method:
+        case "Target.createTarget":
+            return {"targetId": f"target-{next(ids)}"}
+        case "Target.attachToTarget":
+            return {"sessionId": f"session-{params['targetId']}"}
+        case "Page.navigate":
+            path = unquote(urlparse(params["url"]).path)
+            if not os.path.isfile(path):
+                return {"frameId": "frame", "errorText": "net::ERR_FILE_NOT_FOUND"}
+            with open(path, "rb") as f:
+                documents[session_id] = f.read()
+            return {"frameId": "frame", "loaderId": f"loader-{next(ids)}"}
+        case "Page.printToPDF":
+            pdf = b"%PDF-fake\n" + documents[session_id]
+            return {"data": base64.b64encode(pdf).decode()}
+        case _:
+            return {}
+
+
+buffer = b""
+while chunk := commands.read1(65536):
+    buffer += chunk
+    *messages, buffer = buffer.split(b"\0")
+    for message in map(json.loads, messages):
+        session_id = message.get("sessionId")
+        result = handle(message["method"], message["params"], session_id)
+        response = {"id": message["id"], "result": result}
+        if session_id is not None:
+            response["sessionId"] = session_id
+        send(response)
+        if message["method"] == "Page.navigate" and "loaderId" in result:
+            for name in ["DOMContentLoaded", "load"]:
+                send(
+                    {
+                        "method": "Page.lifecycleEvent",
+                        "params": {"name": name, "loaderId": result["loaderId"]},
+                        "sessionId": session_id,
+                    }
+                )
+        if message["method"] == "Browser.close":
+            sys.exit(0)
@@ -0,0 +1,76 @@
+import json
+import tarfile
+import zipfile
+
+import pytest
+
+from proqtor.archive_utils import (
+    get_archive_format,
+    write_combined_archive,
+    write_test_cases,
+)
+from proqtor.core import ProQ
+
+proq_file = "examples/python/io_type_problems/sum_even_numbers.md"
+
+
+@pytest.fixture(scope="module")
+def proq():
+    return ProQ.from_file(proq_file)
+
+
+def read_folder(folder):
+    return {
+        str(path.relative_to(folder)): path.read_text()
+        for path in folder.rglob("*.txt")
+    }
+
+
+def test_archives_match_folder(tmp_path, proq):
+    write_test_cases(proq, tmp_path / "folder")
+    files = read_folder(tmp_path / "folder")
+    assert len(files) == 2 * (
+        len(proq.public_test_cases) + len(proq.private_test_cases)
+    )
+    assert files["public/input_001.txt"] == proq.public_test_cases[0].input
+
+    write_test_cases(proq, tmp_path / "cases.zip", "zip")
+    with zipfile.ZipFile(tmp_path / "cases.zip") as archive:
+        assert {name: archive.read(name).decode() for name in archive.namelist()} == (
+            files
+        )
+
+    write_test_cases(proq, tmp_path / "cases.tar.gz", "tar.gz")
+    with tarfile.open(tmp_path / "cases.tar.gz") as archive:
+        assert {
+            member.name: archive.extractfile(member).read().decode()
+            for member in archive.getmembers()
+        } == files
+
+
+def test_export_test_cases_zip(tmp_path, proq):
+    proq.export_test_cases(tmp_path / "cases", zip=True)
+    assert not (tmp_path / "cases").exists()
+    with zipfile.ZipFile(tmp_path / "cases.zip") as archive:
+        assert "private/output_001.txt" in archive.namelist()
+
+
+def test_combined_archive(tmp_path, proq):
+    entries = [("001_a", {"source": "a.md"}, proq), ("002_b", {"source": "b.md"}, proq)]
+    write_combined_archive(entries, tmp_path / "all.zip")
+    with zipfile.ZipFile(tmp_path / "all.zip") as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+        assert "002_b/public/input_001.txt" in archive.namelist()
+    assert manifest["proqs"][1] == {
+        "folder": "002_b",
+        "title": proq.title,
+        "source": "b.md",
+        "public": len(proq.public_test_cases),
+        "private": len(proq.private_test_cases),
+    }
+
+
+def test_archive_format():
+    assert get_archive_format("cases.TGZ") == "tar.gz"
+    with pytest.raises(ValueError, match="Unknown archive extension"):
+        get_archive_format("cases.rar")
@@ -0,0 +1,93 @@
+import sys
+import time
+
+import pytest
+
+from proqtor.batch_utils import BatchRunner
+from proqtor.core import ProQ
+from proqtor.core_components import ResourceLimits
+from proqtor.core_components import TestCase as Case
+from proqtor.evaluate_utils import ProqCheck, check_test_cases
+from proqtor.evaluate_utils import TestCaseStatus as Status
+from proqtor.execute_utils import CommandTimeoutError, get_command_output
+
+pytestmark = pytest.mark.skipif(
+    not BatchRunner.is_supported(), reason="Batch mode needs select on pipes"
+)
+
+script = """import os, sys
+import counter
+counter.count += 1
+n = input()
+if n == "crash":
+    print("crashing", flush=True)
+    os._exit(3)
+if n == "raise":
+    raise ValueError(n)
+if n == "loop":
+    while True:
+        pass
+print(__name__, sys.argv, counter.count, n)
+"""
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    (tmp_path / "test.py").write_text(script)
+    (tmp_path / "counter.py").write_text("count = 0\n")
+    return tmp_path
+
+
+def test_same_output_as_fresh_run(workspace):
+    command = f"{sys.executable} test.py arg"
+    with BatchRunner(command, workspace) as runner:
+        for stdin in ["1\n", "raise\n", "crash\n", "2\n"]:
+            assert runner.get_command_output(command, stdin) == get_command_output(
+                command, stdin, cwd=workspace
+            )
+
+
+def test_time_limit(workspace):
+    command = f"{sys.executable} test.py"
+    start = time.perf_counter()
+    with BatchRunner(command, workspace, ResourceLimits(time=0.5)) as runner:
+        with pytest.raises(CommandTimeoutError):
+            runner.get_command_output(command, "loop\n")
+        # The harness is restarted for the next run
+        assert runner.get_command_output(command, "1\n").endswith("1 1\n")
+    assert time.perf_counter() - start < 5
+
+
+def test_check_test_cases(workspace):
+    inputs = ["1", "crash", "loop", "raise", "2"]
+    test_cases = [
+        Case(input=f"{n}\n", output=f"__main__ ['test.py'] 1 {n}") for n in inputs
+    ]
+    results = check_test_cases(
+        f"{sys.executable} test.py",
+        test_cases,
+        workspace,
+        limits=ResourceLimits(time=1),
+        batch=True,
+    )
+    assert [result.status for result in results] == [
+        Status.PASSED,
+        Status.FAILED,
+        Status.TIMED_OUT,
+        # The traceback is longer than the expected output
+        Status.DIVERGED,
+        Status.PASSED,
+    ]
+    assert results[1].actual_output == "crashing\n"
+    assert "ValueError: raise" in results[3].actual_output
+
+
+def test_batch_execute_config():
+    proq = ProQ.from_file("examples/python/function_type_problems/sum_even_indices.md")
+    proq.solution.execute_config.batch = True
+    assert "--batch" in proq.to_str()
+    parsed_proq = ProQ.from_str(proq.to_str())
+    assert parsed_proq.solution.execute_config.batch
+    parsed_proq.solution.execute_config.run = f"{sys.executable} test.py"
+    evaluation = parsed_proq.check()
+    assert evaluation.proq_check == ProqCheck(True, True)
@@ -0,0 +1,88 @@
+import pytest
+
+from proqtor.bundle_utils import (
+    ProqBundle,
+    load_nested_proq_from_bundle,
+    load_nested_proq_from_ndjson,
+    write_bundle,
+    write_ndjson,
+)
+from proqtor.core import NestedContent, ProQ, load_nested_proq_from_file
+
+nested_proq_file = "examples/python/assessment.yaml"
+
+
+@pytest.fixture(scope="module")
+def nested_proq():
+    return load_nested_proq_from_file(nested_proq_file)
+
+
+def test_ndjson_round_trip(tmp_path, nested_proq):
+    write_ndjson(nested_proq, tmp_path / "bank.ndjson")
+    lines = (tmp_path / "bank.ndjson").read_text().splitlines()
+    assert len(lines) == 4
+    assert load_nested_proq_from_ndjson(tmp_path / "bank.ndjson") == nested_proq
+
+
+def test_bundle_random_access(tmp_path, nested_proq):
+    write_bundle(nested_proq, tmp_path / "bank.bundle")
+    assert load_nested_proq_from_bundle(tmp_path / "bank.bundle") == nested_proq
+
+    section = nested_proq.content[1]
+    with ProqBundle(tmp_path / "bank.bundle") as bundle:
+        assert len(bundle) == 4
+        assert bundle.get("Python Exam/Section 2/Problem 4") == (
+            section.content[1].content
+        )
+        proq = section.content[0].content
+        assert bundle.find(proq.title) == [proq]
+        assert bundle.find("Missing") == []
+        with pytest.raises(KeyError):
+            bundle.get(["Python Exam", "Section 2"])
+
+
+def test_single_proq_bundle(tmp_path, nested_proq):
+    proq = nested_proq.content[0].content[0].content
+    single = NestedContent[ProQ](title=proq.title, content=proq)
+    write_bundle(single, tmp_path / "single.bundle")
+    assert load_nested_proq_from_bundle(tmp_path / "single.bundle") == single
+
+
+def test_bundle_round_trip_is_lossless(tmp_path, nested_proq):
+    section = nested_proq.content[1]
+    proq = section.content[0].content
+    nested = NestedContent[ProQ].model_construct(
+        title="Bank",
+        content=[
+            NestedContent[ProQ].model_construct(title="Empty", content=[]),
+            NestedContent[ProQ].model_construct(
+                title="Section",
+                content=[
+                    NestedContent[ProQ].model_construct(title="Same", content=proq),
+                    NestedContent[ProQ].model_construct(title="Same", content=[]),
+                    NestedContent[ProQ].model_construct(
+                        title="Same", content=section.content[1].content
+                    ),
+                ],
+            ),
+        ],
+    )
+    write_bundle(nested, tmp_path / "bank.bundle")
+    assert load_nested_proq_from_bundle(tmp_path / "bank.bundle") == nested
+    with ProqBundle(tmp_path / "bank.bundle") as bundle:
+        assert bundle.get_all("Bank/Section/Same") == [
+            proq,
+            section.content[1].content,
+        ]
+        with pytest.raises(ValueError, match="2 proqs at Bank/Section/Same"):
+            bundle.get("Bank/Section/Same")
+
+    empty = NestedContent[ProQ].model_construct(title="Bank", content=[])
+    write_bundle(empty, tmp_path / "empty.bundle")
+    assert load_nested_proq_from_bundle(tmp_path / "empty.bundle") == empty
+
+
+def test_not_a_bundle(tmp_path):
+    (tmp_path / "bank.bundle").write_text("{}")
+    with pytest.raises(ValueError, match="not a proq bundle"):
+        ProqBundle(tmp_path / "bank.bundle")
@@ -0,0 +1,97 @@
+from proqtor.cache_utils import BuildCache, ProqCache, ResultCache
+from proqtor.core import ProQ
+from proqtor.core_components import TestCase as ProqTestCase
+from proqtor.evaluate_utils import get_test_case_results
+
+test_cases = [ProqTestCase(input="", output="hello")]
+
+
+def evaluate(code, build_cache):
+    return get_test_case_results(
+        code,
+        test_cases,
+        "source.txt",
+        "cat built.txt",
+        "cp source.txt built.txt",
+        build_cache=build_cache,
+    )
+
+
+def test_build_cache_hit_restores_artifacts(tmp_path):
+    build_cache = BuildCache(tmp_path)
+    assert evaluate("hello", build_cache)[0].passed
+    (entry,) = tmp_path.iterdir()
+    assert (entry / "built.txt").read_text() == "hello"
+
+    # A hit restores the cached artifact instead of running the build
+    (entry / "built.txt").write_text("from cache")
+    assert evaluate("hello", build_cache)[0].actual_output == "from cache"
+    assert evaluate("hello", None)[0].actual_output == "hello"
+
+
+def test_build_cache_lru_eviction(tmp_path):
+    build_cache = BuildCache(tmp_path, max_size=10)
+    evaluate("hello", build_cache)
+    evaluate("world!", build_cache)
+    (entry,) = tmp_path.iterdir()
+    assert (entry / "built.txt").read_text() == "world!"
+
+
+def test_result_cache_runs_only_new_test_cases(tmp_path):
+    result_cache = ResultCache(tmp_path)
+
+    def evaluate(test_cases):
+        return get_test_case_results(
+            "", test_cases, "source.txt", "cat", result_cache=result_cache
+        )
+
+    results = evaluate([ProqTestCase(input="a", output="a")])
+    assert [result.cached for result in results] == [False]
+
+    results = evaluate(
+        [ProqTestCase(input="a", output="b"), ProqTestCase(input="c", output="c")]
+    )
+    assert [result.cached for result in results] == [True, False]
+    # Cached outputs are checked against the current expected output
+    assert [result.passed for result in results] == [False, True]
+
+    result_cache.refresh = True
+    results = evaluate([ProqTestCase(input="a", output="a")])
+    assert [result.cached for result in results] == [False]
+
+
+def test_proq_cache_tracks_includes(tmp_path, monkeypatch):
+    (tmp_path / "suffix.jinja").write_text("print('suffix')")
+    template = (
+        open("examples/python/function_type_problems/sum_even_indices.md")
+        .read()
+        .replace("</template>", "</template>\n{{ suffix }}")
+    )
+    (tmp_path / "included.md").write_text(
+        template.replace("{{ suffix }}", "{% include 'suffix.jinja' %}")
+    )
+    (tmp_path / "plain.md").write_text(template.replace("{{ suffix }}", ""))
+    proq_cache = ProqCache(tmp_path / "cache")
+    proqs = {
+        name: ProQ.from_file(tmp_path / name, proq_cache=proq_cache)
+        for name in ["included.md", "plain.md"]
+    }
+    assert "print('suffix')" in proqs["included.md"].solution.suffix
+
+    # Only the proq including the edited file is parsed again
+    (tmp_path / "suffix.jinja").write_text("print('edited')")
+    parsed = []
+    from_str = ProQ.from_str
+
+    def spy(content, *args, **kwargs):
+        parsed.append(content)
+        return from_str(content, *args, **kwargs)
+
+    monkeypatch.setattr(ProQ, "from_str", spy)
+    assert (
+        ProQ.from_file(tmp_path / "plain.md", proq_cache=proq_cache)
+        == (proqs["plain.md"])
+    )
+    included = ProQ.from_file(tmp_path / "included.md", proq_cache=proq_cache)
+    assert "print('edited')" in included.solution.suffix
+    assert len(parsed) == 1
@@ -0,0 +1,73 @@
+import sys
+
+import pytest
+
+from proqtor.cli import main
+from proqtor.cli.cli import CliError, expand_selectors
+from proqtor.index_utils import get_default_index_path
+
+
+def test_selectors_without_index(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    assert expand_selectors(["a.md"]) == ["a.md"]
+    with pytest.raises(CliError, match="Run `proq index` first"):
+        expand_selectors(["@tag=list"])
+    # The index is not created by reading it
+    assert not get_default_index_path().exists()
+
+    monkeypatch.setattr(sys, "argv", ["proq", "evaluate", "@tag=list"])
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 1
+    assert "Run `proq index` first" in capsys.readouterr().err
+    assert not get_default_index_path().exists()
+
+
+def test_invalid_selector(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["proq", "index"])
+    main()
+    monkeypatch.setattr(sys, "argv", ["proq", "evaluate", "@author=me"])
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 1
+    assert "Invalid selector '@author=me'" in capsys.readouterr().err
+
+
+@pytest.fixture
+def proq_file(tmp_path):
+    proq_file = tmp_path / "proq.md"
+    proq_file.write_text(
+        "---\ntitle: Echo\n---\n\n# Problem Statement\n\nEcho the input.\n\n"
+        "# Solution\n\n```python test.py -r 'python test.py'\n"
+        "print(input())\n```\n\n# Public Test Cases\n\n"
+        "## Input 1\n\n```\n1\n```\n\n## Output 1\n\n```\n1\n```\n\n"
+        "# Private Test Cases\n"
+    )
+    return proq_file
+
+
+def test_failed_pdf_export(proq_file, tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("CHROME", str(tmp_path / "missing"))
+    output_file = str(tmp_path / "out.pdf")
+    monkeypatch.setattr(sys, "argv", ["proq", "export", str(proq_file), output_file])
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 1
+    captured = capsys.readouterr()
+    assert f"Failed to print {output_file}" in captured.out
+    assert "Proqs dumped" not in captured.out
+    assert "Failed to print 1 of 1 documents." in captured.err
+
+
+def test_unknown_export_format(proq_file, tmp_path, monkeypatch, capsys):
+    output_file = str(tmp_path / "out.docx")
+    monkeypatch.setattr(sys, "argv", ["proq", "export", str(proq_file), output_file])
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 1
+    captured = capsys.readouterr()
+    assert "Proqs dumped" not in captured.out
+    assert "Export format 'docx' not valid" in captured.err
+    assert "json, ndjson, bundle, html and pdf" in captured.err
+    assert list(tmp_path.iterdir()) == [proq_file]
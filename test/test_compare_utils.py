@@ -0,0 +1,111 @@
+import pytest
+
+from proqtor import compare_utils
+from proqtor.compare_utils import (
+    Comparator,
+    ComparatorConfig,
+    StreamingOutputMatcher,
+    TokenComparator,
+)
+
+
+def feed(matcher, chunks):
+    for stream, chunk in chunks:
+        if not matcher.write(stream, chunk):
+            break
+    return matcher.getvalue()
+
+
+@pytest.mark.parametrize(
+    "expected,chunks,passed",
+    (
+        ("1 2\n3", [("stdout", b"\n\n\n\n1 2\r"), ("stdout", b"\n3\n\n\n\n")], True),
+        ("1 2", [("stdout", b"1    2")], False),
+        ("1\n\n2", [("stdout", b"1\n\n"), ("stdout", b"2 \n")], True),
+        ("ab", [("stderr", b"a"), ("stdout", b"b")], True),
+        ("é", [("stdout", "é".encode()[:1]), ("stdout", "é".encode()[1:])], True),
+    ),
+)
+def test_truncation_keeps_outcome(expected, chunks, passed):
+    actual = feed(StreamingOutputMatcher(expected.strip()), chunks)
+    full = "".join(
+        chunk.decode().replace("\r\n", "\n").replace("\r", "\n")
+        for stream in ("stderr", "stdout")
+        for chunk in [b"".join(c for s, c in chunks if s == stream)]
+    )
+    assert (actual.strip() == expected.strip()) == passed
+    assert (full.strip() == expected.strip()) == passed
+
+
+def test_stops_on_excess_output():
+    matcher = StreamingOutputMatcher("12")
+    assert matcher.write("stdout", b"1")
+    assert not matcher.write("stdout", b"23")
+    assert matcher.diverged
+
+
+def test_whitespace_is_bounded():
+    matcher = StreamingOutputMatcher("1")
+    for _ in range(1000):
+        assert matcher.write("stdout", b"\n" * 1000)
+    assert len(matcher.getvalue()) <= matcher.max_whitespace_run
+
+
+@pytest.mark.parametrize(
+    "config,actual,expected,passed",
+    (
+        ("exact", "1 2\r\n3\n\n", "1 2\n3", True),
+        ("exact", "1  2\n3", "1 2\n3", False),
+        ("whitespace", "1\t 2 \n 3", "1 2\n3", True),
+        ("whitespace", "1 2 3", "1 2\n3", False),
+        ("tokens", "1\n2\n3", "1 2 3", True),
+        ("float", "0.30000001 yes", "0.3 yes", True),
+        ("float", "0.31 yes", "0.3 yes", False),
+        ({"name": "float", "abs_tol": 0.05}, "0.31 yes", "0.3 yes", True),
+        ("float", "nan", "0.3", False),
+        ("unordered_lines", "b\n\na\n", "a\nb", True),
+        ("unordered_lines", "a\na", "a", False),
+    ),
+)
+def test_comparators(config, actual, expected, passed):
+    comparator = ComparatorConfig.model_validate(config).create_comparator()
+    assert comparator.matches(actual, expected) == passed
+
+
+def test_expected_output_prepared_once(monkeypatch):
+    comparator = TokenComparator()
+    calls = []
+    normalize = comparator.normalize
+    monkeypatch.setattr(
+        comparator,
+        "normalize",
+        lambda output: calls.append(output) or normalize(output),
+    )
+    for actual in ["1 2", "1  2", "1 3"]:
+        comparator.matches(actual, "1\n2")
+    assert calls.count("1\n2") == 1
+    assert comparator.prepare("1\r\n2\n").text == "1\n2"
+    assert comparator.prepare("1\r\n2\n").normalized == "1 2"
+
+
+def test_comparator_requires_normalize():
+    with pytest.raises(TypeError):
+        Comparator()
+
+
+def test_invalid_comparator_config():
+    with pytest.raises(ValueError, match="Unknown comparator 'fuzzy'"):
+        ComparatorConfig.model_validate("fuzzy")
+    with pytest.raises(ValueError, match="Invalid options of the exact comparator"):
+        ComparatorConfig(name="exact", tol=1)
+    with pytest.raises(ValueError, match="Invalid options of the float comparator"):
+        ComparatorConfig(name="float", abs_tol="small")
+
+
+def test_prepared_expected_outputs_are_bounded(monkeypatch):
+    monkeypatch.setattr(compare_utils, "EXPECTED_OUTPUT_CACHE_SIZE", 2)
+    comparator = TokenComparator()
+    for expected in ["1", "2", "3", "1"]:
+        assert comparator.matches(expected, expected)
+    assert comparator.prepare.cache_info().currsize == 2
+    assert comparator.prepare.cache_info().misses == 4
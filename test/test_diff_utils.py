@@ -0,0 +1,67 @@
+import random
+import time
+
+import pytest
+
+from proqtor.diff_utils import format_output_diff, get_edit_script, get_output_diff
+
+
+def apply_edit_script(a, b, tags):
+    i = j = 0
+    result = []
+    for tag in tags:
+        if tag == " ":
+            assert a[i] == b[j]
+            result.append(a[i])
+            i, j = i + 1, j + 1
+        elif tag == "-":
+            i += 1
+        else:
+            result.append(b[j])
+            j += 1
+    assert (i, j) == (len(a), len(b))
+    return result
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_edit_script(seed):
+    rng = random.Random(seed)
+    a = rng.choices("abc", k=rng.randint(0, 30))
+    b = rng.choices("abc", k=rng.randint(0, 30))
+    tags = get_edit_script(a, b, 100)
+    assert apply_edit_script(a, b, tags) == b
+    assert len(tags) - tags.count(" ") <= len(a) + len(b)
+    if a != b:
+        assert get_edit_script(a, b, 0) is None
+
+
+def test_hunks():
+    expected = "\n".join(map(str, range(1, 15)))
+    actual = "\n".join(["1", "2", "X", *map(str, range(4, 12)), "13", "14", "15"])
+    diff = get_output_diff(expected, actual)
+    assert diff.first_mismatch == 3
+    assert format_output_diff(diff) == "\n".join(
+        ["@@ -1,6 +1,6 @@", " 1", " 2", "-3", "+X", " 4", " 5", " 6"]
+        + ["@@ -9,6 +9,6 @@", " 9", " 10", " 11", "-12", " 13", " 14", "+15"]
+        + ["Expected 14 lines, actual 14 lines, first difference at line 3."]
+    )
+    assert get_output_diff("1\n2\n", "1\n2").hunks == []
+
+
+def test_large_outputs_are_bounded():
+    n = 50000
+    expected = "\n".join(map(str, range(n)))
+    start = time.perf_counter()
+    diff = get_output_diff(
+        expected, "\n".join(str(i) if i % 1000 else "x" for i in range(n))
+    )
+    different = get_output_diff(expected, "\n".join(str(i * 7) for i in range(n)))
+    assert time.perf_counter() - start < 2
+    assert (len(diff.hunks), diff.omitted_hunks) == (5, 45)
+
+    assert not different.complete
+    assert different.first_mismatch == 2
+    [hunk] = different.hunks
+    assert len(hunk.lines) <= 50
+    assert hunk.lines[1] == ("-", "1")
+    assert hunk.lines[-1][0] == "+"
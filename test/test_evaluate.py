@@ -0,0 +1,295 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import pytest
+
+from proqtor import compare_utils
+from proqtor.core import ProQ
+from proqtor.core_components import ResourceLimits
+from proqtor.evaluate_utils import ProqCheck
+from proqtor.evaluate_utils import TestCaseStatus as Status
+from proqtor.execute_utils import READ_CHUNK_SIZE, JobScheduler, get_command_output
+
+proq_template = """---
+title: Proq {i}
+---
+
+# Problem Statement
+
+Append the proq number to the input.
+
+# Solution
+
+```python test.py -b 'cp test.py main.py' -r '{python} main.py'
+<template>
+<sol>print(input() + "-{i}")</sol><los>print(input())</los>
+</template>
+```
+
+# Public Test Cases
+
+## Input 1
+
+```
+public
+```
+
+## Output 1
+
+```
+public-{i}
+```
+
+# Private Test Cases
+
+## Input 1
+
+```
+private
+```
+
+## Output 1
+
+```
+private-{i}
+```
+"""
+
+
+def get_proq(i):
+    return ProQ.from_str(proq_template.format(i=i, python=sys.executable))
+
+
+@pytest.mark.parametrize("concurrent_checks", (False, True))
+def test_concurrent_evaluate(concurrent_checks):
+    curdir = os.getcwd()
+    proqs = [get_proq(i) for i in range(32)]
+    evaluate = partial(ProQ.evaluate, concurrent_checks=concurrent_checks)
+    with ThreadPoolExecutor(max_workers=len(proqs)) as executor:
+        proq_checks = list(executor.map(evaluate, proqs))
+    assert proq_checks == [ProqCheck(True, True)] * len(proqs)
+    assert os.getcwd() == curdir
+
+
+@pytest.mark.parametrize("concurrent_checks", (False, True))
+def test_check_failing_solution(concurrent_checks):
+    proq = get_proq(0)
+    proq.public_test_cases[0].output = "wrong"
+    evaluation = proq.check(concurrent_checks=concurrent_checks)
+    assert evaluation.proq_check == ProqCheck(False, False)
+    assert [result.passed for result in evaluation.solution_results] == [False, True]
+    assert evaluation.template_results is None
+
+
+sleep_proq = """---
+title: Sleep
+---
+
+# Problem Statement
+
+Sleep for the given number of seconds and print it.
+
+# Solution
+
+```python test.py -r '{python} test.py'
+import time
+<template>
+seconds = input()
+<sol>{solution}</sol><los>time.sleep(float(seconds)); print(seconds)</los>
+</template>
+```
+
+# Public Test Cases
+
+## Input 1
+
+```
+0
+```
+
+## Output 1
+
+```
+{first_output}
+```
+
+## Input 2
+
+```
+30
+```
+
+## Output 2
+
+```
+30
+```
+
+# Private Test Cases
+
+## Input 1
+
+```
+30
+```
+
+## Output 1
+
+```
+30
+```
+"""
+
+
+@pytest.mark.parametrize(
+    "solution,first_output,proq_check",
+    (
+        # A failing solution test case cancels the rest
+        (
+            "time.sleep(float(seconds)); print(seconds)",
+            "wrong",
+            ProqCheck(False, False),
+        ),
+        # A passing template test case cancels the rest
+        ("print(seconds)", "0", ProqCheck(True, False)),
+    ),
+)
+def test_fail_fast(solution, first_output, proq_check):
+    proq = ProQ.from_str(
+        sleep_proq.format(
+            python=sys.executable, solution=solution, first_output=first_output
+        )
+    )
+    start = time.perf_counter()
+    with JobScheduler(2) as scheduler:
+        evaluation = proq.check(scheduler=scheduler, fail_fast=True)
+    assert time.perf_counter() - start < 10
+    assert evaluation.proq_check == proq_check
+    results = evaluation.template_results or evaluation.solution_results
+    assert [result.status for result in results] == [
+        Status.PASSED if proq_check.solution_check else Status.FAILED,
+        Status.CANCELLED,
+        Status.CANCELLED,
+    ]
+
+
+def test_time_limit():
+    proq = ProQ.from_str(
+        sleep_proq.format(
+            python=sys.executable,
+            solution="time.sleep(float(seconds)); print(seconds)",
+            first_output="0",
+        )
+    )
+    proq.limits.time = 1
+    proq.private_test_cases[0].time_limit = 0.5
+    start = time.perf_counter()
+    evaluation = proq.check()
+    assert time.perf_counter() - start < 10
+    assert evaluation.proq_check == ProqCheck(False, False)
+    assert [result.status for result in evaluation.solution_results] == [
+        Status.PASSED,
+        Status.TIMED_OUT,
+        Status.TIMED_OUT,
+    ]
+
+
+def test_limits_round_trip():
+    proq = get_proq(0)
+    proq.limits.memory = 256
+    proq.public_test_cases[0].time_limit = 2.5
+    parsed_proq = ProQ.from_str(proq.to_str())
+    assert parsed_proq.limits == proq.limits
+    assert parsed_proq.public_test_cases == proq.public_test_cases
+
+
+def test_diverged_output_stops_run():
+    proq = get_proq(0)
+    proq.solution.tagged_template = "<sol>while True: print(input())</sol>"
+    start = time.perf_counter()
+    results = proq.get_test_case_results(
+        proq.solution.solution_code,
+        proq.public_test_cases,
+        limits=ResourceLimits(time=10),
+    )
+    assert time.perf_counter() - start < 5
+    assert results[0].status == Status.DIVERGED
+    assert len(results[0].actual_output) < 2 * READ_CHUNK_SIZE
+
+
+def test_comparator_round_trip():
+    proq = get_proq(0)
+    proq.comparator = {"name": "float", "abs_tol": 0.01}
+    text = proq.to_str()
+    assert "comparator: {name: float, abs_tol: 0.01}" in text
+    parsed_proq = ProQ.from_str(text)
+    assert parsed_proq == proq
+    assert parsed_proq.output_comparator.abs_tol == 0.01
+    assert "comparator" not in get_proq(0).to_str()
+
+
+def test_comparator_exponent_tolerance():
+    proq = get_proq(0)
+    proq.comparator = {"name": "float", "abs_tol": 1e-6}
+    text = proq.to_str()
+    assert "abs_tol: 1e-06" in text
+    parsed_proq = ProQ.from_str(text.replace("1e-06", "1e-3"))
+    assert parsed_proq.comparator.abs_tol == 1e-3
+    assert parsed_proq.output_comparator.matches("0.3001", "0.3")
+    assert ProQ.from_str(text) == proq
+
+
+def test_comparator_evaluation():
+    proq = get_proq(0)
+    proq.solution.tagged_template = "<sol>print(input()); print(0)</sol>"
+    proq.public_test_cases[0].output = "0\npublic"
+    for comparator, status in [
+        ("exact", Status.FAILED),
+        ("unordered_lines", Status.PASSED),
+    ]:
+        proq.comparator = comparator
+        results = proq.get_test_case_results(
+            proq.solution.solution_code, proq.public_test_cases
+        )
+        assert results[0].status == status
+
+
+def test_expected_outputs_prepared_once(monkeypatch):
+    proq = get_proq(0)
+    proq.public_test_cases[0].output = "public-0\r\n"
+    calls = []
+    normalize = compare_utils.normalize_expected_output
+    monkeypatch.setattr(
+        compare_utils,
+        "normalize_expected_output",
+        lambda output: calls.append(output) or normalize(output),
+    )
+    for _ in range(2):
+        results = proq.get_test_case_results(
+            proq.solution.solution_code, proq.public_test_cases
+        )
+        assert results[0].passed
+        assert results[0].expected_output == "public-0"
+    assert calls.count("public-0\r\n") == 1
+
+
+@pytest.mark.skipif(os.name != "posix", reason="Resource limits need posix")
+def test_resource_limits_are_applied(tmp_path):
+    script = tmp_path / "limits.py"
+    script.write_text(
+        "import resource\n"
+        "for name in ['RLIMIT_CPU', 'RLIMIT_AS', 'RLIMIT_FSIZE']:\n"
+        "    print(*resource.getrlimit(getattr(resource, name)))\n"
+    )
+    output = get_command_output(
+        f"{sys.executable} {script}",
+        limits=ResourceLimits(cpu_time=2, memory=256, output=64),
+    )
+    assert output.split("\n")[:3] == [
+        "2 3",
+        f"{256 * 1024 * 1024} {256 * 1024 * 1024}",
+        f"{64 * 1024} {64 * 1024}",
+    ]
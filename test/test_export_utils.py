@@ -0,0 +1,48 @@
+from proqtor.cache_utils import FragmentCache
+from proqtor.core import NestedContent, ProQ, load_nested_proq_from_file
+from proqtor.export_utils import HtmlExporter
+
+nested_proq_file = "examples/python/assessment.yaml"
+
+
+def test_streamed_export(tmp_path):
+    nested_proq = load_nested_proq_from_file(nested_proq_file)
+    exporter = HtmlExporter(hide_private_testcases=True)
+    exporter.dump(nested_proq, tmp_path / "export.html")
+    html = (tmp_path / "export.html").read_text()
+    assert html == exporter.render(nested_proq)
+    assert html.startswith("<!DOCTYPE html>")
+    assert html.count('<div class="problem">') == 4
+    assert "Private Test Cases" not in html
+
+
+def test_fragment_cache(tmp_path):
+    nested_proq = load_nested_proq_from_file(nested_proq_file)
+    rendered = []
+
+    def export():
+        exporter = HtmlExporter(fragment_cache=FragmentCache(tmp_path / "fragments"))
+        render_proq = exporter.macros.render_proq
+
+        def spy(title, proq, depth):
+            rendered.append(proq.title)
+            return render_proq(title, proq, depth)
+
+        exporter.macros.render_proq = spy
+        return exporter.render(nested_proq)
+
+    html = export()
+    assert len(rendered) == 4
+    rendered.clear()
+    assert export() == html
+    assert rendered == []
+
+    section = nested_proq.content[0]
+    leaf = section.content[0]
+    section.content[0] = NestedContent[ProQ].model_construct(
+        title=leaf.title,
+        content=leaf.content.model_copy(update={"statement": "Edited statement"}),
+    )
+    html = export()
+    assert rendered == [leaf.content.title]
+    assert "Edited statement" in html
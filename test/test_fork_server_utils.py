@@ -0,0 +1,130 @@
+import sys
+import time
+
+import pytest
+
+from proqtor.core import ProQ
+from proqtor.core_components import ResourceLimits
+from proqtor.evaluate_utils import ProqCheck
+from proqtor.execute_utils import (
+    CommandFailedError,
+    CommandTimeoutError,
+    get_command_output,
+)
+from proqtor.fork_server_utils import ForkServerPool, get_python_script_args
+
+pytestmark = pytest.mark.skipif(
+    not ForkServerPool.is_supported(), reason="Fork servers need fork"
+)
+
+scripts = {
+    "main": """import os, sys
+print(__name__, sys.argv, os.path.basename(os.getcwd()), sys.path[0] == os.getcwd())
+print(input()[::-1])
+""",
+    "exception": """def f():
+    return 1 / 0
+f()
+""",
+    "syntax_error": "print(",
+    "exit": """import atexit, sys, threading, time
+atexit.register(print, "atexit")
+threading.Thread(target=lambda: (time.sleep(0.1), print("thread"))).start()
+print("before exit", end="")
+sys.exit("exit message")
+""",
+}
+
+
+@pytest.fixture(scope="module")
+def fork_servers():
+    with ForkServerPool() as fork_servers:
+        yield fork_servers
+
+
+@pytest.mark.parametrize("script", scripts)
+def test_same_output_as_fresh_run(fork_servers, tmp_path, script):
+    (tmp_path / "test.py").write_text(scripts[script])
+    command = f"{sys.executable} test.py arg"
+    assert fork_servers.get_command_output(
+        command, "input\n", cwd=tmp_path
+    ) == get_command_output(command, "input\n", cwd=tmp_path)
+
+
+def test_exit_code(fork_servers, tmp_path):
+    (tmp_path / "test.py").write_text("import sys\nprint('out')\nsys.exit(3)\n")
+    with pytest.raises(CommandFailedError) as e:
+        fork_servers.get_command_output(
+            f"{sys.executable} test.py", cwd=tmp_path, raise_on_fail=True
+        )
+    assert e.value.command_output == "out\n"
+
+
+def test_time_limit(fork_servers, tmp_path):
+    (tmp_path / "test.py").write_text("while True:\n    pass\n")
+    start = time.perf_counter()
+    with pytest.raises(CommandTimeoutError):
+        fork_servers.get_command_output(
+            f"{sys.executable} test.py",
+            cwd=tmp_path,
+            limits=ResourceLimits(time=0.5),
+        )
+    assert time.perf_counter() - start < 5
+
+
+def test_python_script_args():
+    assert get_python_script_args("python3 main.py 1") == ("python3", ["main.py", "1"])
+    assert get_python_script_args("python -u main.py") is None
+    assert get_python_script_args("java Main") is None
+    assert get_python_script_args("./main") is None
+
+
+def test_evaluate(fork_servers):
+    proq = ProQ.from_str(
+        f"""---
+title: Square
+---
+
+# Problem Statement
+
+Print the square of the input.
+
+# Solution
+
+```python test.py -r '{sys.executable} test.py'
+<template>
+n = int(input())
+<sol>print(n * n)</sol><los>print(n)</los>
+</template>
+```
+
+# Public Test Cases
+
+## Input 1
+
+```
+3
+```
+
+## Output 1
+
+```
+9
+```
+
+# Private Test Cases
+
+## Input 1
+
+```
+-1
+```
+
+## Output 1
+
+```
+1
+```
+"""
+    )
+    assert proq.evaluate(fork_servers=fork_servers) == ProqCheck(True, True)
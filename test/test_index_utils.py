@@ -0,0 +1,67 @@
+import os
+import shutil
+
+import pytest
+
+from proqtor.evaluate_utils import ProqCheck
+from proqtor.index_utils import ProqIndex, parse_selector
+
+
+@pytest.fixture
+def bank(tmp_path):
+    shutil.copytree("examples/python", tmp_path / "bank")
+    return tmp_path / "bank"
+
+
+def test_incremental_update(tmp_path, bank):
+    with ProqIndex(tmp_path / "index.sqlite") as index:
+        update = index.update(bank)
+        assert (update.added, update.unchanged, update.errors) == (6, 0, [])
+        assert index.update(bank).unchanged == 6
+
+        suffix = bank / "function_type_and_modify_check_suffix.py.jinja"
+        suffix.write_text(suffix.read_text() + "\n")
+        os.utime(bank / "io_type_problems" / "sum_even_numbers.md")
+        (bank / "io_type_problems" / "pattern_printing_n.md").unlink()
+        update = index.update(bank)
+        # Only the proqs including the changed suffix are parsed again
+        assert (update.updated, update.removed, update.unchanged) == (2, 1, 3)
+
+
+def test_markdown_without_header_is_skipped(tmp_path, bank):
+    (bank / "README.md").write_text("# Question bank\n\n---\n\nThe proqs.\n")
+    proq_file = bank / "io_type_problems" / "sum_even_numbers.md"
+    with ProqIndex(tmp_path / "index.sqlite") as index:
+        update = index.update(bank)
+        assert (update.added, update.errors) == (6, [])
+        # A proq losing its header is no longer indexed
+        proq_file.write_text(proq_file.read_text().split("---", 2)[2])
+        update = index.update(bank)
+        assert (update.removed, update.errors) == (1, [])
+        assert str(proq_file) not in index.select("@lang=python")
+
+
+def test_query(tmp_path, bank):
+    with ProqIndex(tmp_path / "index.sqlite") as index:
+        index.update(bank)
+        [proq] = index.query(tag="list")
+        assert proq.title == "Sum of numbers in even indices of a list."
+        assert (proq.n_public, proq.n_private) == (3, 3)
+        assert len(list(index.query(title="SUM", lang="python"))) == 3
+        assert list(index.query(verdict="passed")) == []
+
+        index.record_verdict(proq.path, ProqCheck(True, True))
+        assert index.select("@verdict=passed") == [proq.path]
+        assert proq.path not in index.select("@verdict=none")
+
+        # A changed proq has no verdict until it is evaluated again
+        with open(proq.path, "a") as f:
+            f.write("\n")
+        index.update(bank)
+        assert index.select("@verdict=passed") == []
+
+
+def test_invalid_selector():
+    assert parse_selector("@tag=list,lang=python") == {"tag": "list", "lang": "python"}
+    with pytest.raises(ValueError, match="Invalid selector"):
+        parse_selector("@author=me")
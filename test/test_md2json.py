@@ -0,0 +1,50 @@
+import md2json
+
+content = """Preamble
+
+# First #
+
+Text with a # hash.
+
+```python
+# Not a heading
+```
+
+## Nested
+
+### Deeper
+
+# Second
+## Child
+````
+```
+# Still code
+````
+"""
+
+
+def test_sections_are_exact_slices():
+    root = md2json.get_sections(content)
+    assert root.text(content) == content
+    first, second = root.children
+    assert first.heading == "First"
+    assert first.text(content).startswith("# First #\n")
+    assert "# Not a heading" in first.body(content)
+    assert first.end == second.start
+    assert second.body(content) == content[content.index("## Child") :]
+
+    (nested,) = first.children
+    assert nested.heading == "Nested"
+    assert [section.heading for section in nested.children] == ["Deeper"]
+    assert [section.heading for section in root.fold(2)] == ["Nested", "Child"]
+    assert [section.heading for section in root.fold(3)] == ["Deeper"]
+    assert (
+        "".join(section.text(content) for section in root.fold(1))
+        == (content[content.index("# First") :])
+    )
+
+
+def test_no_headings():
+    root = md2json.get_sections("just text")
+    assert root.children == []
+    assert root.body("just text") == "just text"
@@ -0,0 +1,133 @@
+import glob
+import os
+
+import pytest
+import yaml
+
+from proqtor.core import (
+    NestedContent,
+    NestedProqLoadError,
+    ProQ,
+    ProqParseError,
+    load_nested_proq_from_file,
+)
+
+proq_string = """---
+title: Echo
+---
+
+# Problem Statement
+
+Print the **input**.
+
+```
+example
+```
+
+# Solution
+
+```python test.py -r 'python test.py'
+<template>
+<sol>print(input())</sol>
+</template>
+```
+
+# Public Test Cases
+
+## Input 1
+
+``` --time-limit 2
+a
+```
+
+## Output 1
+
+```
+a
+```
+
+# Private Test Cases
+
+## Input 1
+
+```
+b
+```
+
+## Output 1
+
+```
+b
+```
+"""
+
+
+@pytest.mark.parametrize(
+    "file_name", sorted(glob.glob("examples/**/*.md", recursive=True))
+)
+def test_round_trip(file_name):
+    proq = ProQ.from_file(file_name)
+    assert ProQ.from_str(proq.to_str()) == proq
+
+
+def test_from_str():
+    proq = ProQ.from_str(proq_string)
+    assert proq.statement == "Print the **input**.\n\n```\nexample\n```"
+    assert proq.solution.execute_config.run == "python test.py"
+    assert [(case.input, case.output) for case in proq.public_test_cases] == [
+        ("a\n", "a\n")
+    ]
+    assert proq.public_test_cases[0].time_limit == 2
+    assert proq.private_test_cases[0].input == "b\n"
+
+
+def test_missing_code_block():
+    with pytest.raises(ProqParseError, match="public test cases"):
+        ProQ.from_str(proq_string.replace("```\na\n```", "a"))
+
+
+@pytest.mark.parametrize(
+    "old,new,message",
+    (
+        ("``` --time-limit 2", "``` --time-limit abc", "'Input 1'.*invalid float"),
+        ("-r 'python test.py'", "-r", "solution.*expected one argument"),
+    ),
+)
+def test_invalid_info_string(old, new, message):
+    with pytest.raises(ProqParseError, match=message):
+        ProQ.from_str(proq_string.replace(old, new))
+
+
+def test_statement_is_kept_verbatim():
+    statement = "* one\n* two\n\nSee [the docs][docs].\n\n[docs]: https://example.com"
+    proq = ProQ.from_str(proq_string.replace("Print the **input**.", statement))
+    assert proq.statement.startswith(statement)
+
+
+def test_load_nested_proq_collects_errors(tmp_path):
+    (tmp_path / "good.md").write_text(proq_string)
+    (tmp_path / "bad.md").write_text(proq_string.replace("# Solution", "# Answer"))
+    (tmp_path / "set.yaml").write_text(
+        yaml.safe_dump(
+            {
+                "title": "Set",
+                "content": [
+                    {"title": "Good", "content": "good.md"},
+                    {"title": "Bad", "content": "bad.md"},
+                    {"title": "Missing", "content": "missing.md"},
+                ],
+            }
+        )
+    )
+    with pytest.raises(NestedProqLoadError) as e:
+        load_nested_proq_from_file(tmp_path / "set.yaml")
+    assert [os.path.basename(proq_file) for proq_file, _ in e.value.errors] == [
+        "bad.md",
+        "missing.md",
+    ]
+
+    (tmp_path / "bad.md").write_text(proq_string)
+    (tmp_path / "missing.md").write_text(proq_string)
+    nested_proq = load_nested_proq_from_file(tmp_path / "set.yaml")
+    assert [item.content.title for item in nested_proq.content] == ["Echo"] * 3
+    assert nested_proq == NestedContent[ProQ].model_validate(nested_proq.model_dump())
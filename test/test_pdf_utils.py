@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+
+import pytest
+
+from proqtor.pdf_utils import Browser, BrowserError, BrowserPool
+
+pytestmark = pytest.mark.skipif(
+    not Browser.is_supported(), reason="DevTools pipes need a posix platform"
+)
+
+
+@pytest.fixture
+def fake_chrome(tmp_path, monkeypatch):
+    fake_chrome = tmp_path / "chrome"
+    fake_chrome.write_text(
+        f"#!/bin/sh\nexec {sys.executable} "
+        f'{os.path.join(os.path.dirname(__file__), "fake_chrome.py")} "$@"\n'
+    )
+    fake_chrome.chmod(0o755)
+    monkeypatch.setenv("CHROME", str(fake_chrome))
+    monkeypatch.setenv("FAKE_CHROME_LOG", str(tmp_path / "launches.log"))
+    return tmp_path / "launches.log"
+
+
+def test_prints_many_documents_with_one_browser(fake_chrome, tmp_path):
+    documents = [(f"<p>{i}</p>", tmp_path / f"{i}.pdf") for i in range(10)]
+    with BrowserPool() as pool:
+        assert pool.print_many(documents) == [None] * 10
+    for html_content, output_file in documents:
+        assert output_file.read_bytes() == b"%PDF-fake\n" + html_content.encode()
+    (launch,) = fake_chrome.read_text().splitlines()
+    assert "--remote-debugging-pipe" in launch
+
+
+def test_browser_exit(fake_chrome, tmp_path):
+    browser = Browser()
+    browser.process.kill()
+    start = time.perf_counter()
+    with pytest.raises(BrowserError):
+        browser.print_to_pdf("<p></p>", tmp_path / "out.pdf")
+    assert time.perf_counter() - start < 5
+    browser.close()
+
+
+def test_missing_chrome(monkeypatch, tmp_path):
+    monkeypatch.setenv("CHROME", str(tmp_path / "missing"))
+    with BrowserPool() as pool:
+        (error,) = pool.print_many([("<p></p>", tmp_path / "out.pdf")])
+    assert isinstance(error, BrowserError)
+
+
+def test_pool_replaces_dead_browser(fake_chrome, tmp_path):
+    with BrowserPool() as pool:
+        pool.print_to_pdf("<p>1</p>", tmp_path / "1.pdf")
+        (browser,) = pool._browsers
+        browser.process.kill()
+        browser.process.wait()
+        close = browser.close
+        locked = []
+        browser.close = lambda: locked.append(pool._lock.locked()) or close()
+        pool.print_to_pdf("<p>2</p>", tmp_path / "2.pdf")
+        # The other printing threads are not kept waiting by the closing
+        assert locked == [False]
+        assert pool._browsers != [browser]
+    assert (tmp_path / "2.pdf").read_bytes() == b"%PDF-fake\n<p>2</p>"
+    assert len(fake_chrome.read_text().splitlines()) == 2
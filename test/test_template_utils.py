@@ -0,0 +1,48 @@
+from proqtor.template_utils import PathLoader, relative_env, render_relative
+
+
+def test_shared_includes_compile_once(tmp_path, monkeypatch):
+    (tmp_path / "shared").mkdir()
+    # Nested includes are relative to the proq, like the top level includes
+    (tmp_path / "shared" / "suffix.jinja").write_text(
+        "{% include 'inner.jinja' %}-suffix"
+    )
+    for name in ["a", "b"]:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "inner.jinja").write_text(f"inner {name}")
+
+    loads = []
+    get_source = PathLoader.get_source
+
+    def spy(self, environment, template):
+        loads.append(template)
+        return get_source(self, environment, template)
+
+    monkeypatch.setattr(PathLoader, "get_source", spy)
+    relative_env.cache.clear()
+    source = "{{ 1 + 1 }} {% include '../shared/suffix.jinja' %}"
+    for _ in range(3):
+        for name in ["a", "b"]:
+            assert render_relative(source, tmp_path / name) == (
+                f"2 inner {name}-suffix"
+            )
+    assert sorted(loads) == [
+        str(tmp_path / "a" / "inner.jinja"),
+        str(tmp_path / "b" / "inner.jinja"),
+        str(tmp_path / "shared" / "suffix.jinja"),
+    ]
+
+    (tmp_path / "a" / "inner.jinja").write_text("changed inner")
+    assert render_relative(source, tmp_path / "a") == "2 changed inner-suffix"
+    assert render_relative(source, tmp_path / "b") == "2 inner b-suffix"
+
+
+def test_autoescape_as_template_string(tmp_path):
+    from jinja2 import Environment, select_autoescape
+
+    (tmp_path / "inner.jinja").write_text("{{ '<inner>' }}")
+    source = "{{ 'a<b' }} {% include 'inner.jinja' %}"
+    assert render_relative(source, tmp_path) == "a&lt;b <inner>"
+    # The baseline rendered the proqs as template strings
+    env = Environment(autoescape=select_autoescape())
+    assert env.from_string("{{ 'a<b' }}").render() == "a&lt;b"
@@ -0,0 +1,49 @@
+import os
+import threading
+import time
+
+from proqtor.watch_utils import FileWatcher
+
+
+def touch(path, text):
+    path.write_text(text)
+    # Make the change visible on file systems with coarse timestamps
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+
+
+def test_change_affects_exactly_the_dependents(tmp_path):
+    for name in ["a.md", "b.md", "suffix.jinja"]:
+        (tmp_path / name).write_text(name)
+    watcher = FileWatcher(interval=0.01, debounce=0.05)
+    watcher.watch(str(tmp_path / "a.md"), {str(tmp_path / "suffix.jinja")})
+    watcher.watch(str(tmp_path / "b.md"))
+    assert watcher.poll() == set()
+
+    touch(tmp_path / "suffix.jinja", "edited")
+    assert watcher.wait() == [str(tmp_path / "a.md")]
+    touch(tmp_path / "b.md", "edited")
+    assert watcher.wait() == [str(tmp_path / "b.md")]
+
+    # Dropped dependencies are no longer watched
+    watcher.watch(str(tmp_path / "a.md"))
+    touch(tmp_path / "suffix.jinja", "edited again")
+    assert watcher.poll() == set()
+
+
+def test_rapid_saves_are_debounced(tmp_path):
+    proq_file = tmp_path / "a.md"
+    proq_file.write_text("")
+    watcher = FileWatcher(interval=0.01, debounce=0.2)
+    watcher.watch(str(proq_file))
+
+    def save_repeatedly():
+        for i in range(5):
+            touch(proq_file, str(i))
+            time.sleep(0.05)
+
+    saver = threading.Thread(target=save_repeatedly)
+    saver.start()
+    assert watcher.wait() == [str(proq_file)]
+    saver.join()
+    # All the saves were reported at once
+    assert watcher.poll() == set()